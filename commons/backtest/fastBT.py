@@ -32,7 +32,17 @@ class FastBT:
         else:
             self.sd = scrip_data
 
-    def prep_data(self, scrip, strategy, raw_pred_df: pd.DataFrame, sd: ScripData = None):
+    @staticmethod
+    def __from_date(df: pd.DataFrame, start_date) -> pd.DataFrame:
+        dates = pd.to_datetime(df['time'].astype(int), unit='s', utc=True).dt.tz_convert(IST).dt.date
+        return df.loc[dates >= start_date].reset_index(drop=True)
+
+    def prep_data(self, scrip, strategy, raw_pred_df: pd.DataFrame, sd: ScripData = None,
+                  tick_data: pd.DataFrame = None, base_data: pd.DataFrame = None):
+        """
+        :param tick_data: Pre-fetched 1-min data e.g. from ScripData.get_scrips_tick_data; fetched from sd if None
+        :param base_data: Pre-fetched daily data e.g. from ScripData.get_scrips_base_data; fetched from sd if None
+        """
         logger.info(f"Entering Prep data for {scrip} with {len(raw_pred_df)} predictions")
 
         if sd is None:
@@ -45,11 +55,17 @@ class FastBT:
         start_date = raw_pred_df.date.min()
 
         # Get the 1-min data
-        tick_data = sd.get_tick_data(scrip, from_date=start_date)
+        if tick_data is None:
+            tick_data = sd.get_tick_data(scrip, from_date=start_date)
+        else:
+            tick_data = self.__from_date(tick_data, start_date)
 
         # Get the Daily data (base data)
         if self.mode == "BACKTEST":
-            base_data = sd.get_base_data(scrip, from_date=start_date)
+            if base_data is None:
+                base_data = sd.get_base_data(scrip, from_date=start_date)
+            else:
+                base_data = self.__from_date(base_data, start_date)
         else:
             # For NEXT-CLOSE we won't have base date at COB
             # Last candle of the day is closing price for the day! However, time of day is 1st candle's epoch
@@ -150,6 +166,13 @@ class FastBT:
         accuracy_params = []
         valid_trades = params.loc[params.entry_order_status == 'ENTERED']
         logger.info(f"No. of valid trades: {len(valid_trades)}")
+        # Single round trip for the tick data of all the scrips
+        if len(valid_trades) > 0:
+            first_entry = int(valid_trades.entry_ts.astype(int).min())
+            first_date = pd.to_datetime(first_entry, unit='s', utc=True).tz_convert(IST).date()
+            all_tick_data = self.sd.get_scrips_tick_data(list(valid_trades.scrip.unique()), from_date=first_date)
+        else:
+            all_tick_data = {}
         for param in valid_trades.iterrows():
             _, rec = param
             df = pd.DataFrame([rec])
@@ -159,7 +182,8 @@ class FastBT:
             trade_date = datetime.datetime.fromtimestamp(int(rec.get('entry_ts')))
             trade_time = get_bod_epoch(trade_date.strftime('%Y-%m-%d'))
             df.loc[:, 'time'] = trade_time
-            merged_df = self.prep_data(scrip, strategy, raw_pred_df=df[['target', 'signal', 'time']], sd=self.sd)
+            merged_df = self.prep_data(scrip, strategy, raw_pred_df=df[['target', 'signal', 'time']], sd=self.sd,
+                                       tick_data=all_tick_data[scrip])
             accuracy_params.append({"scrip": scrip, "strategy": strategy, "merged_df": merged_df, "risk_calc": self.rc})
         if self.mode == "SERVER":
             try:
@@ -195,12 +219,18 @@ if __name__ == '__main__':
 
     f = FastBT(exec_mode="LOCAL")
     params_ = []
+    raw_preds_ = {}
     for scrip_ in cfg['steps']['scrips']:
         for strategy_ in cfg['steps']['strats']:
             file = str(os.path.join(cfg['generated'], scrip_, f'trainer.strategies.{strategy_}.{scrip_}_Raw_Pred.csv'))
-            raw_pred_df_ = pd.read_csv(file)
-            merged_df_ = f.prep_data(scrip=scrip_, strategy=MODEL_PREFIX + strategy_, raw_pred_df=raw_pred_df_)
-            params_.append({"scrip": scrip_, "strategy": strategy_, "merged_df": merged_df_})
+            raw_preds_[(scrip_, strategy_)] = pd.read_csv(file)
+    start_ = datetime.datetime.fromtimestamp(min(int(df_.time.min()) for df_ in raw_preds_.values())).date()
+    tick_data_ = f.sd.get_scrips_tick_data(cfg['steps']['scrips'], from_date=start_)
+    base_data_ = f.sd.get_scrips_base_data(cfg['steps']['scrips'], from_date=start_)
+    for (scrip_, strategy_), raw_pred_df_ in raw_preds_.items():
+        merged_df_ = f.prep_data(scrip=scrip_, strategy=MODEL_PREFIX + strategy_, raw_pred_df=raw_pred_df_,
+                                 tick_data=tick_data_[scrip_], base_data=base_data_[scrip_])
+        params_.append({"scrip": scrip_, "strategy": strategy_, "merged_df": merged_df_})
 
     bt_trades, bt_stats, bt_mtm = f.run_accuracy(params_)
     logger.info(f"bt_trades#: {len(bt_trades)}")
@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from commons.broker.RateLimiter import RateLimiter
+from commons.config.reader import cfg
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
+class HttpClient:
+    """
+    Stands in for the `requests` module of NorenApi (see install), so that every broker call gets a (connect, read)
+    timeout and an overall deadline. Both are enforced on the calling thread, unlike SIGALRM which only works on the
+    main thread. Calls share a keep-alive session, so the TCP & TLS setup is paid once per pooled connection.
+    """
+    connect_timeout: float
+    read_timeout: float
+    deadline: float
+    session: requests.Session
+    limiter: RateLimiter
+
+    def __init__(self, connect_timeout: float = None, read_timeout: float = None, deadline: float = None,
+                 pool_size: int = None, limiter: RateLimiter = None):
+        """
+        Defaults are from the shoonya-http config
+        :param connect_timeout: Seconds to establish the connection
+        :param read_timeout: Seconds between bytes of the response
+        :param deadline: Seconds for the whole request, body included
+        :param pool_size: Connections kept alive per host; defaults to max-workers
+        :param limiter: Paces the calls when set
+        """
+        conf = cfg.get('shoonya-http', {})
+        self.connect_timeout = connect_timeout if connect_timeout is not None else conf.get('connect-timeout', 5)
+        self.read_timeout = read_timeout if read_timeout is not None else conf.get('read-timeout', 10)
+        self.deadline = deadline if deadline is not None else conf.get('deadline', 30)
+        if pool_size is None:
+            pool_size = conf.get('pool-size', cfg.get('max-workers', 5))
+        self.limiter = limiter
+        self.__local = threading.local()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __getattr__(self, name):
+        # Rest of the requests module e.g. requests.exceptions
+        return getattr(requests, name)
+
+    @property
+    def last_response(self) -> requests.Response:
+        """
+        Response of the latest call on this thread, None if it failed; NorenApi only returns None on errors
+        """
+        return getattr(self.__local, 'response', None)
+
+    def send(self, method: str, url: str, deadline: float = None, **kwargs) -> requests.Response:
+        self.__local.response = None
+        if self.limiter is not None:
+            # Queued time is not part of the deadline
+            self.limiter.acquire(url)
+        deadline = self.deadline if deadline is None else deadline
+        expires_at = time.monotonic() + deadline
+        kwargs.setdefault('timeout', (min(self.connect_timeout, deadline), min(self.read_timeout, deadline)))
+
+        res = self.session.request(method, url, stream=True, **kwargs)
+        try:
+            chunks = []
+            # read1 returns whatever has arrived, so a dribbling response is caught within a read timeout
+            while chunk := res.raw.read1(CHUNK_SIZE, decode_content=True):
+                chunks.append(chunk)
+                if time.monotonic() > expires_at:
+                    raise DeadlineExceeded(f"{url} exceeded the deadline of {deadline}s")
+            res._content = b"".join(chunks)
+        except BaseException:
+            # Half read, the connection can't be reused
+            res.close()
+            raise
+        # Fully read, back to the pool for the next call
+        res.raw.release_conn()
+        if time.monotonic() > expires_at:
+            raise DeadlineExceeded(f"{url} exceeded the deadline of {deadline}s")
+        self.__local.response = res
+        return res
+
+    def post(self, url: str, data=None, json=None, deadline: float = None, **kwargs) -> requests.Response:
+        return self.send("POST", url, data=data, json=json, deadline=deadline, **kwargs)
+
+    def get(self, url: str, params=None, deadline: float = None, **kwargs) -> requests.Response:
+        return self.send("GET", url, params=params, deadline=deadline, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def install(client: HttpClient, module):
+    """
+    Routes all the HTTP calls of the module e.g. NorenRestApiPy.NorenApi through the client
+    """
+    module.requests = client
@@ -0,0 +1,80 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from commons.broker.Shoonya import BO_PROD_TYPE
+
+logger = logging.getLogger(__name__)
+
+
+class OrderClassifier:
+    """
+    DataFrame variants of Shoonya.get_order_type_order_book, get_order_type_order_update &
+    get_order_status_order_update, classifying a whole order book / batch of order updates with column operations
+    """
+
+    @staticmethod
+    def __column(df: pd.DataFrame, name: str, default: str) -> pd.Series:
+        if name not in df:
+            return pd.Series(default, index=df.index, dtype=object)
+        return df[name].fillna(default)
+
+    @staticmethod
+    def add_order_type(df: pd.DataFrame, product_column: str = 'prd') -> pd.DataFrame:
+        """
+        Adds tp_order_num & tp_order_type
+        :param product_column: prd for the order book & pcode for the order updates
+        """
+        product = OrderClassifier.__column(df, product_column, 'X')
+        remarks = OrderClassifier.__column(df, 'remarks', 'NA').astype(str)
+        sno_num = OrderClassifier.__column(df, 'snonum', 'NA')
+        sno_type = OrderClassifier.__column(df, 'snoordt', '-1')
+        is_cnc = (product == 'C').values
+        is_bo = (product == BO_PROD_TYPE).values
+
+        order_num = remarks.str.rsplit(":", n=1).str[-1].astype(object)
+        order_num[is_cnc] = -1
+
+        # Lowest precedence first
+        order_type = remarks.str.split(":", n=1).str[0].astype(object)
+        order_type[is_bo] = np.nan
+        order_type[is_bo & (sno_type == "0").values] = 'TARGET_LEG'
+        order_type[is_bo & (sno_type == "1").values] = 'SL_LEG'
+        order_type[is_bo & (sno_num == 'NA').values] = 'ENTRY_LEG'
+        order_type[is_cnc] = 'CNC'
+
+        return df.assign(tp_order_num=order_num, tp_order_type=order_type)
+
+    @staticmethod
+    def add_order_status(df: pd.DataFrame, product_column: str = 'pcode') -> pd.DataFrame:
+        """
+        Adds tp_order_status of the bracket order legs, & the order type if not there
+        """
+        if 'tp_order_type' not in df:
+            df = OrderClassifier.add_order_type(df, product_column)
+        order_type = df['tp_order_type']
+        status = OrderClassifier.__column(df, 'status', 'NA')
+        price_type = OrderClassifier.__column(df, 'prctyp', 'X')
+        entry, sl, target = order_type == 'ENTRY_LEG', order_type == 'SL_LEG', order_type == 'TARGET_LEG'
+        complete, canceled = status == 'COMPLETE', status == 'CANCELED'
+
+        order_status = np.select(
+            [entry & complete, entry & (status == 'REJECTED'),
+             sl & complete, sl & (status == 'TRIGGER_PENDING'),
+             target & complete & (price_type == 'MKT'), target & complete, target & (status == 'OPEN'),
+             (entry | sl | target) & canceled, entry | sl | target],
+            ['ENTERED', 'REJECTED',
+             'SL-HIT', 'TRIGGER_PENDING',
+             'COB-CLOSE', 'TARGET-HIT', 'OPEN',
+             'CANCELED', 'PENDING'],
+            default=None)
+        return df.assign(tp_order_status=pd.Series(order_status, index=df.index, dtype=object))
+
+    @staticmethod
+    def classify_order_book(order_book: list[dict]) -> pd.DataFrame:
+        return OrderClassifier.add_order_type(pd.DataFrame(order_book), 'prd')
+
+    @staticmethod
+    def classify_order_updates(messages: list[dict]) -> pd.DataFrame:
+        return OrderClassifier.add_order_status(pd.DataFrame(messages), 'pcode')
@@ -0,0 +1,97 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Union
+
+from commons.broker.Shoonya import BO_PROD_TYPE, Shoonya
+from commons.config.reader import cfg
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchResult(NamedTuple):
+    resp: dict  # api_place_order response; None on failure
+    latency: float  # Seconds for the broker to answer
+    sent_after: float  # Seconds from the dispatch to the call going out for the account
+    error: str = None
+
+
+class OrderDispatcher:
+    """
+    Places the same order for all the accounts in parallel, each with its own logged-in Shoonya client:
+
+        dispatcher = OrderDispatcher(['Trader-V2-Alan', 'Trader-V2-Pralhad'])
+        results = dispatcher.place_bracket_order('B', 'NSE', 'UPL-EQ', 10, 500.0, 5.0, 10.0, 'ENTRY_LEG:1')
+    """
+    brokers: dict[str, Shoonya]
+
+    def __init__(self, accts: list[str] = None, brokers: list[Shoonya] = None, max_workers: int = None):
+        """
+        :param accts: Accounts logged in (in parallel) here
+        :param brokers: Or the already logged-in clients
+        :param max_workers: Concurrent orders; defaults to one per account
+        """
+        if accts is None and brokers is None:
+            raise ValueError("OrderDispatcher needs either accts or brokers")
+        if brokers is None:
+            with ThreadPoolExecutor(max_workers=max(1, len(accts))) as executor:
+                brokers = list(executor.map(Shoonya, accts))
+        self.brokers = {broker.acct: broker for broker in brokers}
+        # Kept warm across dispatches so that no thread is started on the order path
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(self.brokers)),
+                                             thread_name_prefix="order-dispatch")
+
+    def __place(self, broker: Shoonya, dispatched_at: float, **order) -> DispatchResult:
+        start = time.perf_counter()
+        try:
+            resp = broker.api_place_order(**order)
+            error = None if resp is not None else "No response"
+        except Exception as ex:
+            resp, error = None, str(ex)
+        end = time.perf_counter()
+        return DispatchResult(resp, end - start, start - dispatched_at, error)
+
+    def place_bracket_order(self, buy_or_sell: str, exchange: str, trading_symbol: str,
+                            quantity: Union[int, dict[str, int]], price: float, book_loss_price: float,
+                            book_profit_price: float, remarks: str,
+                            price_type: str = 'LMT', trigger_price: float = None,
+                            retention: str = 'DAY') -> dict[str, DispatchResult]:
+        """
+        :param quantity: Same for all the accounts or by account; accounts with no / 0 quantity are skipped
+        :return: Account -> DispatchResult
+        """
+        quantities = quantity if isinstance(quantity, dict) else {acct: quantity for acct in self.brokers}
+        dispatched_at = time.perf_counter()
+        futures = {}
+        for acct, broker in self.brokers.items():
+            if not quantities.get(acct):
+                continue
+            futures[acct] = self.__executor.submit(self.__place, broker, dispatched_at,
+                                                   buy_or_sell=buy_or_sell, product_type=BO_PROD_TYPE,
+                                                   exchange=exchange, trading_symbol=trading_symbol,
+                                                   quantity=quantities[acct], disclose_qty=0,
+                                                   price_type=price_type, price=price,
+                                                   trigger_price=trigger_price, retention=retention,
+                                                   remarks=remarks, book_loss_price=book_loss_price,
+                                                   book_profit_price=book_profit_price)
+        results = {acct: future.result() for acct, future in futures.items()}
+
+        for acct, result in results.items():
+            log = logger.error if result.error else logger.info
+            log(f"{acct}: {trading_symbol} {remarks} sent after {result.sent_after * 1000:.1f}ms, answered in "
+                f"{result.latency * 1000:.1f}ms {result.error or ''}")
+        return results
+
+    def close(self):
+        self.__executor.shutdown()
+
+
+if __name__ == '__main__':
+    from commons.loggers.setup_logger import setup_logging
+
+    setup_logging("OrderDispatcher.log")
+
+    dispatcher = OrderDispatcher(list(cfg['shoonya'].keys()))
+    res = dispatcher.place_bracket_order('B', 'NSE', 'UPL-EQ', 1, 500.0, 5.0, 10.0, 'ENTRY_LEG:1')
+    print(res)
+    dispatcher.close()
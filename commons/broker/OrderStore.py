@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import threading
+
+from commons.broker.Shoonya import Shoonya
+
+logger = logging.getLogger(__name__)
+
+BO_LEG_TYPES = ['ENTRY_LEG', 'SL_LEG', 'TARGET_LEG']
+TERMINAL_STATUS = ['COMPLETE', 'REJECTED', 'CANCELED']
+# Fields common to the order updates & the order book rows that make up the state of an order
+STATE_FIELDS = ['status', 'qty', 'prc', 'trgprc', 'prctyp', 'fillshares', 'avgprc', 'rejreason']
+
+
+def get_state_hash(order: dict) -> str:
+    return hashlib.md5("|".join(str(order.get(field, '')) for field in STATE_FIELDS).encode()).hexdigest()
+
+
+def to_order_update(order: dict) -> dict:
+    """
+    Order book row in the shape of an order update message
+    """
+    message = dict(order)
+    if 'pcode' not in message and 'prd' in message:
+        message['pcode'] = message['prd']
+    return message
+
+
+class OrderStore:
+    """
+    Orders of an account by norenordno, with the bracket order legs grouped by their parent (snonum), kept up to date
+    from the websocket order updates & reconciled with the order book now and then:
+
+        store = OrderStore()
+        s.api_start_websocket(..., order_update_callback=store.on_order_update)
+        store.refresh(s)
+        store.get_bracket(entry_order_no)['SL_LEG']['tp_order_status']
+    """
+    orders: dict[str, dict]
+    brackets: dict[str, dict[str, str]]  # Parent -> tp_order_type -> norenordno
+    hashes: dict[str, str]
+
+    def __init__(self):
+        self.orders = {}
+        self.brackets = {}
+        self.hashes = {}
+        self.__lock = threading.RLock()
+
+    @staticmethod
+    def __classify(message: dict) -> dict:
+        order = Shoonya.get_order_type_order_update(dict(message))
+        if order['tp_order_type'] in BO_LEG_TYPES:
+            return Shoonya.get_order_status_order_update(order)
+        order['tp_order_status'] = order.get('status')
+        return order
+
+    def __apply(self, message: dict, state_hash: str) -> bool:
+        """
+        :return: True if the order changed
+        """
+        order_no = message['norenordno']
+        current = self.orders.get(order_no)
+        if current is not None:
+            if self.hashes.get(order_no) == state_hash:
+                return False
+            if current.get('status') in TERMINAL_STATUS and message.get('status') not in TERMINAL_STATUS:
+                # A late update of a closed order
+                return False
+
+        order = self.__classify(message)
+        self.orders[order_no] = order
+        self.hashes[order_no] = state_hash
+        parent = order.get('snonum', order_no)
+        self.brackets.setdefault(parent, {})[order['tp_order_type']] = order_no
+        return True
+
+    def on_order_update(self, message: dict):
+        """
+        order_update_callback of the websocket
+        """
+        if message.get('t') not in (None, 'om') or 'norenordno' not in message:
+            return
+        with self.__lock:
+            if self.__apply(message, get_state_hash(message)):
+                logger.debug(f"Order {message['norenordno']}: {self.orders[message['norenordno']]['tp_order_status']}")
+
+    def reconcile(self, order_book: list[dict]) -> list[str]:
+        """
+        Applies the rows of the order book snapshot that differ from the store
+        :return: Changed norenordno
+        """
+        changed = []
+        with self.__lock:
+            for row in order_book or []:
+                if 'norenordno' not in row:
+                    continue
+                state_hash = get_state_hash(row)
+                if self.hashes.get(row['norenordno']) == state_hash:
+                    continue
+                if self.__apply(to_order_update(row), state_hash):
+                    changed.append(row['norenordno'])
+        if changed:
+            logger.info(f"Reconciled {len(changed)} orders missed by the order updates")
+        return changed
+
+    def refresh(self, broker: Shoonya) -> list[str]:
+        return self.reconcile(broker.api_get_order_book())
+
+    def get(self, order_no: str) -> dict:
+        return self.orders.get(order_no)
+
+    def get_status(self, order_no: str) -> str:
+        """
+        :return: tp_order_status e.g. ENTERED, SL-HIT, TARGET-HIT or None for unknown orders
+        """
+        order = self.orders.get(order_no)
+        return None if order is None else order.get('tp_order_status')
+
+    def get_parent(self, order_no: str) -> str:
+        order = self.orders.get(order_no)
+        return None if order is None else order.get('snonum', order_no)
+
+    def get_bracket(self, order_no: str) -> dict[str, dict]:
+        """
+        :param order_no: Any leg of the bracket order
+        :return: tp_order_type -> order of the legs
+        """
+        with self.__lock:
+            legs = self.brackets.get(self.get_parent(order_no), {})
+            return {order_type: self.orders[leg] for order_type, leg in legs.items()}
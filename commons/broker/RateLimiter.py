@@ -0,0 +1,135 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from commons.config.reader import cfg
+
+logger = logging.getLogger(__name__)
+
+# Broker route (last part of the URL) -> endpoint class; the rest are "other"
+ENDPOINT_CLASSES = {
+    'PlaceOrder': 'order', 'ModifyOrder': 'order', 'CancelOrder': 'order', 'ExitSNOOrder': 'order',
+    'QuickAuth': 'auth',
+    'SingleOrdHist': 'status', 'OrderBook': 'status', 'TradeBook': 'status', 'PositionBook': 'status',
+    'TPSeries': 'history', 'EODChartData': 'history',
+}
+# Lower goes first, when the classes contend for the total rate
+PRIORITIES = {'order': 0, 'auth': 0, 'status': 1, 'other': 1, 'history': 2}
+DEFAULT_RATES = {
+    'total': {'rate': 20, 'burst': 20},
+    'order': {'rate': 10, 'burst': 10},
+    'auth': {'rate': 1, 'burst': 2},
+    'status': {'rate': 10, 'burst': 10},
+    'history': {'rate': 5, 'burst': 5},
+    'other': {'rate': 10, 'burst': 10},
+}
+
+
+def get_endpoint_class(url: str) -> str:
+    return ENDPOINT_CLASSES.get(url.rstrip("/").rsplit("/", 1)[-1], 'other')
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket; waiters are served in priority, then arrival order
+    """
+    rate: float
+    burst: float
+    tokens: float
+
+    def __init__(self, rate: float, burst: float = None):
+        """
+        :param rate: Tokens added per second
+        :param burst: Max tokens stored; defaults to the rate
+        """
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self.tokens = self.burst
+        self.__updated = time.monotonic()
+        self.__cond = threading.Condition()
+        self.__waiters = []
+        self.__seq = itertools.count()
+
+    def __refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+
+    def acquire(self, priority: int = 0) -> float:
+        """
+        Blocks till a token is available for the caller
+        :return: Seconds waited
+        """
+        start = time.monotonic()
+        entry = (priority, next(self.__seq))
+        with self.__cond:
+            heapq.heappush(self.__waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.__refill(now)
+                    if self.__waiters[0] != entry:
+                        self.__cond.wait()
+                    elif self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    else:
+                        self.__cond.wait((1 - self.tokens) / self.rate)
+            finally:
+                self.__waiters.remove(entry)
+                heapq.heapify(self.__waiters)
+                # The next in line recomputes its wait
+                self.__cond.notify_all()
+        return time.monotonic() - start
+
+
+class RateLimiter:
+    """
+    Paces the broker calls by endpoint class, within the class rate & the total rate across all classes, where
+    order operations go ahead of history fetches. One instance is shared by all the accounts of the process.
+    """
+    buckets: dict[str, TokenBucket]
+    metrics: dict[str, dict]
+
+    def __init__(self, rates: dict = None):
+        """
+        :param rates: endpoint class (or total) -> {rate, burst}; defaults to shoonya-rate-limits config
+        """
+        if rates is None:
+            rates = cfg.get('shoonya-rate-limits', {})
+        rates = {**DEFAULT_RATES, **rates}
+        self.buckets = {name: TokenBucket(conf['rate'], conf.get('burst')) for name, conf in rates.items()}
+        self.metrics = {}
+        self.__lock = threading.Lock()
+
+    def acquire(self, url: str) -> float:
+        """
+        Waits for the turn of the call to the url
+        :return: Seconds waited
+        """
+        endpoint_class = get_endpoint_class(url)
+        waited = self.buckets[endpoint_class].acquire()
+        waited += self.buckets['total'].acquire(PRIORITIES[endpoint_class])
+        self.__record(endpoint_class, waited)
+        if waited > 1:
+            logger.debug(f"Waited {waited:.2f}s for {endpoint_class} call {url}")
+        return waited
+
+    def __record(self, endpoint_class: str, waited: float):
+        with self.__lock:
+            metric = self.metrics.setdefault(endpoint_class,
+                                             {'calls': 0, 'waited': 0, 'total_wait': 0.0, 'max_wait': 0.0})
+            metric['calls'] += 1
+            if waited > 0.001:
+                metric['waited'] += 1
+            metric['total_wait'] += waited
+            metric['max_wait'] = max(metric['max_wait'], waited)
+
+    def get_metrics(self) -> dict[str, dict]:
+        """
+        :return: endpoint class -> calls, waited (calls that queued), total_wait, max_wait & avg_wait in seconds
+        """
+        with self.__lock:
+            return {name: {**metric, 'avg_wait': metric['total_wait'] / metric['calls']}
+                    for name, metric in self.metrics.items()}
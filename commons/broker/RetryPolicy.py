@@ -0,0 +1,248 @@
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from commons.config.reader import cfg
+
+logger = logging.getLogger(__name__)
+
+AUTH_EXPIRED = 'auth-expired'
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+# Broker answered with an error e.g. order not found, retrying won't help
+REJECTED = 'rejected'
+
+AUTH_MESSAGES = ['session expired', 'invalid session']
+THROTTLE_MESSAGES = ['too many', 'rate limit', 'limit exceeded']
+
+
+def classify(result=None, ex: Exception = None, response: requests.Response = None):
+    """
+    :param result: Returned by the NorenApi call; None on errors
+    :param ex: Raised by the call
+    :param response: HTTP response of the call, if any
+    :return: None on success else AUTH_EXPIRED, THROTTLED, TRANSIENT or REJECTED
+    """
+    if isinstance(ex, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return TRANSIENT
+    if ex is None and result is not None:
+        return None
+    if response is not None:
+        if response.status_code == 429:
+            return THROTTLED
+        if response.status_code >= 500:
+            # Also when NorenApi fails to parse the error page
+            return TRANSIENT
+    if ex is not None:
+        return REJECTED
+    if response is None:
+        return TRANSIENT
+    try:
+        message = str(json.loads(response.text).get('emsg', '')).lower()
+    except (ValueError, AttributeError):
+        return TRANSIENT
+    if any(msg in message for msg in AUTH_MESSAGES):
+        return AUTH_EXPIRED
+    if any(msg in message for msg in THROTTLE_MESSAGES):
+        return THROTTLED
+    return REJECTED
+
+
+def is_unsent(ex: Exception) -> bool:
+    """
+    :return: True if the call failed before the request went out i.e. while connecting. Connection aborted / reset
+    errors are ConnectionErrors too, but the request may have reached the broker by then
+    """
+    if isinstance(ex, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(ex, requests.exceptions.ConnectionError):
+        return False
+    cause, seen = ex.args[0] if ex.args else None, set()
+    while isinstance(cause, BaseException) and id(cause) not in seen:
+        if isinstance(cause, NewConnectionError):
+            return True
+        seen.add(id(cause))
+        cause = getattr(cause, 'reason', None) or cause.__cause__ or cause.__context__
+    return False
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures so that calls fail fast, then lets one trial call through after the reset timeout
+    """
+    name: str
+    failure_threshold: int
+    reset_timeout: float
+    failures: int
+    opened_at: float
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.__trial = False
+        self.__lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_call(self):
+        with self.__lock:
+            if self.opened_at is None:
+                return
+            if self.__trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit {self.name} is open after {self.failures} failures")
+            # Half open
+            self.__trial = True
+
+    def on_success(self):
+        with self.__lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self.__trial = False
+
+    def on_failure(self):
+        with self.__lock:
+            self.failures += 1
+            if self.__trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.error(f"Circuit {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self.__trial = False
+
+
+class SessionRefresher:
+    """
+    Coalesces the re-logins of concurrent callers that saw the same expired session into one
+    """
+    generation: int
+
+    def __init__(self, login: Callable):
+        self.login = login
+        self.generation = 0
+        self.__lock = threading.Lock()
+
+    def refresh(self, seen_generation: int):
+        """
+        :param seen_generation: generation when the failed call was made; no login if it's been refreshed since
+        """
+        with self.__lock:
+            if self.generation != seen_generation:
+                return
+            logger.warning("Session expired, logging in again")
+            self.login()
+            self.generation += 1
+
+
+class RetryPolicy:
+    """
+    Retries the broker calls with exponential backoff & full jitter by the kind of failure, behind a circuit breaker
+    per scope (e.g. account) & endpoint class
+    """
+    retries: int
+    backoff: float
+    max_backoff: float
+    breakers: dict[tuple[str, str], CircuitBreaker]
+
+    def __init__(self, retries: int = None, backoff: float = None, max_backoff: float = None,
+                 failure_threshold: int = None, reset_timeout: float = None,
+                 get_response: Callable = lambda: None):
+        """
+        Defaults are from the shoonya-retry config
+        :param retries: Retries after the first attempt
+        :param backoff: Seconds of the first backoff, doubled for every retry & for throttling
+        :param max_backoff: Cap on a backoff
+        :param failure_threshold: Consecutive failures that open the circuit of an endpoint class
+        :param reset_timeout: Seconds the circuit stays open
+        :param get_response: Returns the HTTP response of the last call on the thread, used to classify the failure
+        """
+        conf = cfg.get('shoonya-retry', {})
+        self.retries = retries if retries is not None else conf.get('retries', 3)
+        self.backoff = backoff if backoff is not None else conf.get('backoff', 0.5)
+        self.max_backoff = max_backoff if max_backoff is not None else conf.get('max-backoff', 8)
+        self.failure_threshold = failure_threshold if failure_threshold is not None else conf.get(
+            'failure-threshold', 5)
+        self.reset_timeout = reset_timeout if reset_timeout is not None else conf.get('reset-timeout', 30)
+        self.get_response = get_response
+        self.breakers = {}
+        self.__lock = threading.Lock()
+
+    def get_breaker(self, endpoint_class: str, scope: str = None) -> CircuitBreaker:
+        key = (scope, endpoint_class)
+        with self.__lock:
+            if key not in self.breakers:
+                name = endpoint_class if scope is None else f"{scope}/{endpoint_class}"
+                self.breakers[key] = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+            return self.breakers[key]
+
+    def get_delay(self, attempt: int, error: str):
+        base = self.backoff * 2 ** (attempt + (1 if error == THROTTLED else 0))
+        return random.uniform(0, min(self.max_backoff, base))
+
+    def call(self, name: str, func: Callable, endpoint_class: str, session: SessionRefresher = None,
+             idempotent: bool = True, scope: str = None):
+        """
+        :param name: For the logs
+        :param func: NorenApi call returning None on errors
+        :param endpoint_class: Shares the circuit breaker with the calls of the class in the scope
+        :param session: Re-logs in on auth errors
+        :param idempotent: When False e.g. placing orders, only failures while connecting are retried; not the
+        timeouts or dropped connections after the request may have been sent
+        :param scope: Keeps the circuit breakers apart e.g. per account, so that one failing account doesn't open them
+        for the others
+        :return: Result of the call or None once the retries are exhausted or the broker rejected it
+        :raises CircuitOpenError: When the endpoint class is failing; the last exception of the call if it raised
+        """
+        breaker = self.get_breaker(endpoint_class, scope)
+        for attempt in range(self.retries + 1):
+            breaker.before_call()
+            generation = session.generation if session is not None else 0
+            result, ex = None, None
+            try:
+                result = func()
+            except Exception as e:
+                ex = e
+            error = classify(result, ex, self.get_response())
+            if error is None or error == REJECTED:
+                # The broker is up
+                breaker.on_success()
+                if ex is not None:
+                    raise ex
+                return result
+            if error == AUTH_EXPIRED:
+                if session is None:
+                    return result
+            else:
+                breaker.on_failure()
+                if not idempotent and error == TRANSIENT and not is_unsent(ex):
+                    logger.error(f"{name}: Not retrying a call that may have gone through: {ex}")
+                    if ex is not None:
+                        raise ex
+                    return result
+
+            if attempt == self.retries or breaker.is_open:
+                logger.error(f"{name}: Failed with {error} after {attempt + 1} attempts")
+                if ex is not None:
+                    raise ex
+                return result
+
+            if error == AUTH_EXPIRED:
+                session.refresh(generation)
+            else:
+                delay = self.get_delay(attempt, error)
+                logger.warning(f"{name}: Retrying in {delay:.2f}s on {error} {ex or ''}")
+                time.sleep(delay)
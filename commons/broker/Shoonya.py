@@ -1,46 +1,45 @@
 import datetime
 import json
 import logging
-import os
-import shutil
-import signal
-import subprocess
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt
-from urllib.request import urlopen
 
 import pandas as pd
 import pyotp
+import NorenRestApiPy.NorenApi as noren_api
 import requests
 from NorenRestApiPy.NorenApi import NorenApi, FeedType
 from websocket import WebSocketConnectionClosedException
 
+from commons.broker.HttpClient import HttpClient, install
+from commons.broker.RateLimiter import RateLimiter
+from commons.broker.RetryPolicy import CircuitOpenError, RetryPolicy, SessionRefresher
+from commons.broker.SymbolMaster import SymbolMaster
 from commons.config.reader import cfg
 from commons.consts.consts import Interval
 from commons.utils.EmailAlert import send_email
-from commons.utils.Misc import get_bod_epoch
+from commons.utils.Misc import get_bod_epoch, get_bod_epochs
 
 logger = logging.getLogger(__name__)
 
 MOCK = False
-SYMBOL_MASTER = "https://api.shoonya.com/NSE_symbols.txt.zip"
 VALID_ORDER_STATUS = ['OPEN', 'TRIGGER_PENDING', 'COMPLETE', 'CANCELED']
 SCRIP_MAP = {'BAJAJ_AUTO-EQ': 'BAJAJ-AUTO-EQ', 'M_M-EQ': 'M&M-EQ'}
-REST_TIMEOUT = 10
 MAX_WORKERS = cfg.get('max-workers', 5)
 BO_PROD_TYPE = 'B'
+REST_HOST = 'https://api.shoonya.com/NorenWClientTP/'
+WS_HOST = 'wss://api.shoonya.com/NorenWSTP/'
 
 
 def get_order_type(message):
     return message.get('remarks', 'NA').split(":")[0]
 
 
-def alarm_handler(signum, frame):
-    print(f"ALARM signal received {signum} at {frame}")
-    raise Exception()
-
-
-signal.signal(signal.SIGALRM, alarm_handler)
+# Every NorenApi call, of all the accounts, is paced & gets a connect/read timeout & an overall deadline
+LIMITER = RateLimiter()
+HTTP = HttpClient(limiter=LIMITER)
+install(HTTP, noren_api)
+RETRY = RetryPolicy(get_response=lambda: HTTP.last_response)
 
 
 class LocalNorenApi(NorenApi):
@@ -70,10 +69,8 @@ class LocalNorenApi(NorenApi):
         logger.debug(payload)
 
         headers = {"Content-Type": "application/json; charset=utf-8"}
-        try:
-            res = requests.post(url, data=payload, headers=headers, timeout=REST_TIMEOUT)
-        except TimeoutError:
-            res = requests.post(url, data=payload, headers=headers, timeout=REST_TIMEOUT)
+        # Timeouts are retried by RETRY around the whole call
+        res = HTTP.post(url, data=payload, headers=headers)
         logger.debug(res)
 
         if res.status_code != 200:
@@ -93,37 +90,18 @@ class LocalNorenApi(NorenApi):
 
 class Shoonya:
     acct: str
-    api = LocalNorenApi(host='https://api.shoonya.com/NorenWClientTP/',
-                        websocket='wss://api.shoonya.com/NorenWSTP/')
+    api: LocalNorenApi
 
     def __init__(self, acct):
         self.acct = acct
+        # Own session & websocket per account
+        self.api = LocalNorenApi(host=REST_HOST, websocket=WS_HOST)
         self.creds = cfg['shoonya'][self.acct]
+        self.session = SessionRefresher(self.api_login)
         self.api_login()
         self.__generate_reminders()
-        self.symbols = self.__load_symbol_tokens()
-
-    def __load_symbol_tokens(self):
-        os.makedirs(self.acct, exist_ok=True)
-        zip_file_name = os.path.join(self.acct, 'NSE_symbols.zip')
-        token_file_name = os.path.join(self.acct, 'NSE_symbols.txt')
-        # extracting zipfile from URL
-        with urlopen(SYMBOL_MASTER) as response, open(zip_file_name, 'wb') as out_file:
-            shutil.copyfileobj(response, out_file)
-
-            # extracting required file from zipfile
-            command = f'unzip -d {self.acct} -o ' + zip_file_name
-            subprocess.call(command, shell=True)
-
-        # loading data from the file
-        data = pd.read_csv(token_file_name)
-        # deleting the files & directory
-        os.remove(zip_file_name)
-        os.remove(token_file_name)
-        os.removedirs(self.acct)
-
-        # loading data from the file
-        return data
+        self.symbol_master = SymbolMaster()
+        self.symbols = self.symbol_master.symbols
 
     def __generate_reminders(self):
         if self.creds.get('expiry_date', datetime.date.today()) <= datetime.date.today():
@@ -133,7 +111,17 @@ class Shoonya:
     def get_token(self, scrip):
         logger.debug(f"Getting token for {scrip}")
         scrip = SCRIP_MAP.get(scrip, scrip)
-        return str(self.symbols.loc[self.symbols.TradingSymbol == scrip]['Token'].iloc[0])
+        return self.symbol_master.get_token(scrip)
+
+    @staticmethod
+    def get_rate_limit_metrics():
+        """
+        :return: endpoint class -> queue wait metrics of the calls from all accounts
+        """
+        return LIMITER.get_metrics()
+
+    def __call(self, name, func, endpoint_class, idempotent=True):
+        return RETRY.call(name, func, endpoint_class, session=self.session, idempotent=idempotent, scope=self.acct)
 
     def api_login(self):
         cred = self.creds
@@ -158,7 +146,7 @@ class Shoonya:
                                      )
         except Exception as ex:
             logger.error(f"api_start_websocket: Exception {ex}")
-            self.api_login()
+            self.session.refresh(self.session.generation)
             self.api.start_websocket(subscribe_callback=subscribe_callback,
                                      socket_open_callback=socket_open_callback,
                                      socket_error_callback=socket_error_callback,
@@ -181,28 +169,30 @@ class Shoonya:
             pass
 
     def api_get_order_book(self):
+        """
+        :return: Orders of the day; None on errors
+        :raises CircuitOpenError: While the status calls of the account keep failing; else the last exception of the
+        call once the retries are exhausted
+        """
         logger.debug(f"api_get_order_book: About to call api.get_order_book")
         if MOCK:
             logger.debug("api_get_order_book: Sending Mock Response")
             return None
-        resp = self.api.get_order_book()
-        if resp is None:
-            logger.error("api_get_order_book: Retrying!")
-            self.api_login()
-            resp = self.api.get_order_book()
+        resp = self.__call("api_get_order_book", self.api.get_order_book, "status")
         logger.debug(f"api_get_order_book: Resp from api.get_order_book {resp}")
         return resp
 
     def api_get_order_hist(self, order_no):
+        """
+        :return: History of the order as DF; None on errors
+        :raises CircuitOpenError: While the status calls of the account keep failing; else the last exception of the
+        call once the retries are exhausted
+        """
         logger.debug(f"api_get_order_hist: About to call api.api_get_order_hist for {order_no}")
         if MOCK:
             logger.debug("api_get_order_hist: Sending Mock Response")
             return "COMPLETE", "NA", 123.45
-        resp = self.api.single_order_history(orderno=order_no)
-        if resp is None:
-            logger.error("api_get_order_hist: Retrying!")
-            self.api_login()
-            resp = self.api.single_order_history(orderno=order_no)
+        resp = self.__call("api_get_order_hist", lambda: self.api.single_order_history(orderno=order_no), "status")
         if resp is None:
             logger.error("api_get_order_hist: Failed on retry!")
             return None
@@ -226,46 +216,42 @@ class Shoonya:
                         retention,
                         remarks,
                         book_loss_price=0.0, book_profit_price=0.0):
+        """
+        :return: Response with the norenordno; None on errors
+        :raises CircuitOpenError: While the order calls of the account keep failing; else the exception of the call,
+        which is not retried once the order may have reached the broker
+        """
         logger.debug(f"api_place_order: About to call api.place_order with {remarks}")
         if MOCK:
             logger.debug("api_place_order: Sending Mock Response")
             return dict(json.loads('{"request_time": "09:15:01 01-01-2023", "stat": "Ok", "norenordno": "1234"}'))
-        resp = self.api.place_order(buy_or_sell=buy_or_sell,
-                                    product_type=product_type,
-                                    exchange=exchange,
-                                    tradingsymbol=SCRIP_MAP.get(trading_symbol, trading_symbol),
-                                    quantity=quantity,
-                                    discloseqty=disclose_qty,
-                                    price_type=price_type,
-                                    price=price,
-                                    trigger_price=trigger_price,
-                                    retention=retention,
-                                    remarks=remarks,
-                                    bookloss_price=book_loss_price,
-                                    bookprofit_price=book_profit_price
-                                    )
-        if resp is None:
-            logger.error(f"api_place_order: Retrying! for {remarks}")
-            self.api_login()
-            resp = self.api.place_order(buy_or_sell=buy_or_sell,
-                                        product_type=product_type,
-                                        exchange=exchange,
-                                        tradingsymbol=SCRIP_MAP.get(trading_symbol, trading_symbol),
-                                        quantity=quantity,
-                                        discloseqty=disclose_qty,
-                                        price_type=price_type,
-                                        price=price,
-                                        trigger_price=trigger_price,
-                                        retention=retention,
-                                        remarks=remarks,
-                                        bookloss_price=book_loss_price,
-                                        bookprofit_price=book_profit_price
-                                        )
+        # Not retried once it may have reached the broker, to avoid duplicate orders
+        resp = self.__call(f"api_place_order {remarks}",
+                           lambda: self.api.place_order(buy_or_sell=buy_or_sell,
+                                                        product_type=product_type,
+                                                        exchange=exchange,
+                                                        tradingsymbol=SCRIP_MAP.get(trading_symbol, trading_symbol),
+                                                        quantity=quantity,
+                                                        discloseqty=disclose_qty,
+                                                        price_type=price_type,
+                                                        price=price,
+                                                        trigger_price=trigger_price,
+                                                        retention=retention,
+                                                        remarks=remarks,
+                                                        bookloss_price=book_loss_price,
+                                                        bookprofit_price=book_profit_price
+                                                        ),
+                           "order", idempotent=False)
         logger.debug(f"api_place_order: Resp from api.place_order {resp} with {remarks}")
         return resp
 
     def api_modify_order(self, order_no, exchange, trading_symbol, new_quantity, new_price_type,
                          new_trigger_price=None):
+        """
+        :return: Response of the modification; None on errors
+        :raises CircuitOpenError: While the order calls of the account keep failing; else the last exception of the
+        call once the retries are exhausted
+        """
         logger.debug(f"api_modify_order: About to call api.modify_order for {trading_symbol} with "
                      f"{new_price_type} @ {new_trigger_price}")
 
@@ -273,49 +259,42 @@ class Shoonya:
             logger.debug("api_modify_order: Sending Mock Response")
             return dict(json.loads('{"request_time": "09:15:01 01-01-2023", "stat": "Ok", "result": "1234"}'))
 
-        resp = self.api.modify_order(orderno=order_no,
-                                     exchange=exchange,
-                                     tradingsymbol=SCRIP_MAP.get(trading_symbol, trading_symbol),
-                                     newquantity=new_quantity,
-                                     newprice_type=new_price_type,
-                                     newtrigger_price=new_trigger_price)
-        if resp is None:
-            logger.error(
-                f"api_modify_order: Retrying! for {trading_symbol} with {new_price_type} @ {new_trigger_price}")
-            self.api_login()
-            resp = self.api.modify_order(orderno=order_no,
-                                         exchange=exchange,
-                                         tradingsymbol=SCRIP_MAP.get(trading_symbol, trading_symbol),
-                                         newquantity=new_quantity,
-                                         newprice_type=new_price_type,
-                                         newtrigger_price=new_trigger_price)
+        resp = self.__call(f"api_modify_order {trading_symbol}",
+                           lambda: self.api.modify_order(orderno=order_no,
+                                                         exchange=exchange,
+                                                         tradingsymbol=SCRIP_MAP.get(trading_symbol, trading_symbol),
+                                                         newquantity=new_quantity,
+                                                         newprice_type=new_price_type,
+                                                         newtrigger_price=new_trigger_price),
+                           "order")
         logger.debug(f"api_modify_order: Resp from api.modify_order for {trading_symbol} with  "
                      f"{new_price_type} @ {new_trigger_price} : {resp}")
         return resp
 
     def api_cancel_order(self, order_no):
+        """
+        :raises CircuitOpenError: While the order calls of the account keep failing; else the last exception of the
+        call once the retries are exhausted
+        """
         logger.debug(f"api_cancel_order: About to call api.cancel_order for {order_no}")
         if MOCK:
             logger.debug("api_cancel_order: Sending Mock Response")
             return dict(json.loads('{"request_time": "09:15:01 01-01-2023", "stat": "Ok", "result": "1234"}'))
-        resp = self.api.cancel_order(order_no)
-        if resp is None:
-            logger.error(f"api_cancel_order: Retrying! for {order_no}")
-            self.api_login()
-            resp = self.api.cancel_order(order_no)
+        resp = self.__call(f"api_cancel_order {order_no}", lambda: self.api.cancel_order(order_no), "order")
         logger.debug(f"api_cancel_order: Resp from api.cancel_order {resp} for {order_no}")
         return resp
 
     def api_close_bracket_order(self, order_no):
+        """
+        :raises CircuitOpenError: While the order calls of the account keep failing; else the last exception of the
+        call once the retries are exhausted
+        """
         logger.debug(f"api_close_bracket_order: About to call api.exit_order for {order_no}")
         if MOCK:
             logger.debug("api_close_bracket_order: Sending Mock Response")
             return dict(json.loads('{"request_time": "09:15:01 01-01-2023", "stat": "Ok", "result": "1234"}'))
-        resp = self.api.exit_order(order_no, BO_PROD_TYPE)
-        if resp is None:
-            logger.error(f"api_close_bracket_order: Retrying! for {order_no}")
-            self.api_login()
-            resp = self.api.exit_order(order_no, BO_PROD_TYPE)
+        resp = self.__call(f"api_close_bracket_order {order_no}", lambda: self.api.exit_order(order_no, BO_PROD_TYPE),
+                           "order")
         logger.debug(f"api_close_bracket_order: Resp from api.exit_order {resp} for {order_no}")
         return resp
 
@@ -325,7 +304,7 @@ class Shoonya:
         df.rename(columns={"into": "open", "inth": "high", "intl": "low", "intc": "close"}, inplace=True)
         if time_format == "date":
             # Daily data comes with 00:00:00 time
-            df['time'] = df.ssboe.apply(lambda r: get_bod_epoch(str(datetime.datetime.fromtimestamp(int(r)).date())))
+            df['time'] = get_bod_epochs(df.ssboe.values)
         else:
             # Time Series data comes with UTC aware timestamps
             df.rename(columns={"time": "old_time", "ssboe": "time"}, inplace=True)
@@ -333,52 +312,55 @@ class Shoonya:
         return df[["time", "open", "high", "low", "close"]]
 
     def api_get_hist_prices(self, scrip_name, num_days: int = 7):
+        """
+        :return: Daily price records as JSON strings; None on errors
+        :raises CircuitOpenError: While the history calls of the account keep failing; else the last exception of the
+        call once the retries are exhausted
+        """
         exchange = scrip_name.split("_")[0]
         symbol = scrip_name.replace(exchange + "_", "") + "-EQ"
         symbol = SCRIP_MAP.get(symbol, symbol)
         # symbol = urllib.parse.quote(symbol)
         start_date = datetime.date.today() - datetime.timedelta(days=num_days)
-        result = None
-        try:
-            result = self.api.get_daily_price_series(exchange, symbol, startdate=get_bod_epoch(str(start_date)))
-        except Exception as ex:
-            print(ex)
-        return result
+        return self.__call(f"api_get_hist_prices {scrip_name}",
+                           lambda: self.api.get_daily_price_series(exchange, symbol,
+                                                                   startdate=get_bod_epoch(str(start_date))),
+                           "history")
 
     def get_base_data(self, scrip_name, num_days: int = 800):
-        recs = []
-        prices = None
-        while prices is None:
-            print(f"Getting base data for {scrip_name}")
-            prices = self.api_get_hist_prices(scrip_name, num_days)
-        print(len(prices))
-        for price in prices:
-            recs.append(json.loads(price))
+        logger.debug(f"Getting base data for {scrip_name}")
+        prices = self.api_get_hist_prices(scrip_name, num_days)
+        if prices is None:
+            raise ValueError(f"Unable to get base data for {scrip_name}")
+        logger.debug(f"Got {len(prices)} base data records for {scrip_name}")
+        # The records are JSON strings; parsed in one go as an array
+        recs = json.loads("[" + ",".join(prices) + "]")
 
         df = self.__format_result(recs)
         df.drop_duplicates(inplace=True)
         return scrip_name, Interval.in_daily, df
 
     def api_get_time_series(self, scrip_name, num_days: int = 7):
+        """
+        :return: 1-minute price records; None on errors
+        :raises CircuitOpenError: While the history calls of the account keep failing; else the last exception of the
+        call once the retries are exhausted
+        """
         exchange = scrip_name.split("_")[0]
         symbol = scrip_name.replace(exchange + "_", "") + "-EQ"
         token = self.get_token(symbol)
         start_date = datetime.date.today() - datetime.timedelta(days=num_days)
-        result = None
-        signal.alarm(30)
-        try:
-            result = self.api.get_time_price_series(exchange, token, starttime=get_bod_epoch(str(start_date)))
-        except Exception as ex:
-            print(ex)
-        signal.alarm(0)
-        return result
+        return self.__call(f"api_get_time_series {scrip_name}",
+                           lambda: self.api.get_time_price_series(exchange, token,
+                                                                  starttime=get_bod_epoch(str(start_date))),
+                           "history")
 
     def get_tick_data(self, scrip_name, num_days: int = 10):
-        prices = None
-        while prices is None:
-            print(f"Getting tick data for {scrip_name}")
-            prices = self.api_get_time_series(scrip_name, num_days)
-        print(len(prices))
+        logger.debug(f"Getting tick data for {scrip_name}")
+        prices = self.api_get_time_series(scrip_name, num_days)
+        if prices is None:
+            raise ValueError(f"Unable to get tick data for {scrip_name}")
+        logger.debug(f"Got {len(prices)} tick data records for {scrip_name}")
 
         df = self.__format_result(prices, time_format="datetime")
         df.drop_duplicates(inplace=True)
@@ -386,7 +368,7 @@ class Shoonya:
 
     def get_prices_data(self, scrip_names: [str], opts: [str] = None, base_num_days: int = 7, tick_num_days: int = 7):
         """
-        Gets prices data from Shoonya using Threadpool
+        Gets prices data from Shoonya using Threadpool; scrips that fail after the retries are logged & skipped
         :returns list of [ Scrip name, Interval, OHLC Data ]
         """
         if opts is None:
@@ -402,7 +384,11 @@ class Shoonya:
                     executors_list.append(executor.submit(self.get_tick_data, scrip_name, tick_num_days))
 
         for result in executors_list:
-            results.append(result.result())
+            try:
+                results.append(result.result())
+            except (CircuitOpenError, ValueError, requests.exceptions.RequestException) as ex:
+                # The other scrips proceed
+                logger.error(f"get_prices_data: Skipping {ex}")
 
         return results
 
@@ -449,12 +435,13 @@ class Shoonya:
                 message['tp_order_type'] = message.get('remarks', 'NA').split(":")[0]
         return message
 
-    def get_order_status_order_update(self, message):
+    @staticmethod
+    def get_order_status_order_update(message):
         """
         Expected Updated order if not will call get_order_type_order_update
         """
         if message.get('tp_order_type', 'X') == 'X':
-            updated_message = self.get_order_type_order_update(message)
+            updated_message = Shoonya.get_order_type_order_update(message)
         else:
             updated_message = message
 
@@ -0,0 +1,156 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+from commons.broker.Shoonya import Shoonya
+from commons.config.reader import cfg
+
+logger = logging.getLogger(__name__)
+
+REPLACE_REJECTED = 'ReplaceRejected'
+
+
+def get_rejections(order_book: list[dict], trigger_prices: dict[str, str]) -> dict[str, tuple[bool, str]]:
+    """
+    Matches the SL updates against one order book snapshot: rejected when the latest report of the order is
+    ReplaceRejected, or when it's still trigger pending at another trigger price
+    :param trigger_prices: Order no -> trigger price sent
+    :return: Order no -> (rejected, reason) of the orders found in the order book
+    """
+    result = {}
+    for row in order_book or []:
+        order_no = row.get('norenordno')
+        if order_no not in trigger_prices:
+            continue
+        if row.get('rpt') == REPLACE_REJECTED:
+            result[order_no] = (True, row.get('rejreason', 'NA'))
+        elif (row.get('status') == 'TRIGGER_PENDING' and row.get('trgprc') is not None and
+              float(row['trgprc']) != float(trigger_prices[order_no])):
+            result[order_no] = (True, row.get('rejreason', f"Trigger price still {row['trgprc']}"))
+        else:
+            result[order_no] = (False, "NA")
+    return result
+
+
+class ModifyResult(NamedTuple):
+    order_no: str
+    trigger_price: str
+    resp: dict  # api_modify_order response; None on failure
+    rejected: bool
+    reason: str
+    coalesced: int  # Updates of the order replaced by this one within the window
+
+
+class SlModifyDispatcher:
+    """
+    Coalesces the SL updates of an order within a window keeping the latest trigger price, then sends the pending ones
+    concurrently (paced by the broker rate limiter) & checks them for rejections against one order book per window;
+    only the orders missing from it fall back to their order history. api_modify_order takes the same arguments as
+    Shoonya's, so that it can stand in for the broker e.g. LiveRiskEngine(broker=dispatcher).
+    """
+    broker: Shoonya
+    window: float
+
+    def __init__(self, broker: Shoonya, window: float = 0.25, max_workers: int = None, check_rejections: bool = True,
+                 on_result: Callable[[ModifyResult], None] = None):
+        """
+        :param window: Seconds the updates are held to be coalesced
+        :param max_workers: Concurrent modifications; defaults to max-workers
+        :param check_rejections: Checks the modified orders for ReplaceRejected in the order book
+        :param on_result: Called for each sent modification
+        """
+        self.broker = broker
+        self.window = window
+        self.check_rejections = check_rejections
+        self.on_result = on_result
+        self.pending = {}  # Order no -> (api_modify_order kwargs, coalesced)
+        self.__lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers or cfg.get('max-workers', 5),
+                                             thread_name_prefix="sl-modify")
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def api_modify_order(self, order_no, exchange, trading_symbol, new_quantity, new_price_type,
+                         new_trigger_price=None):
+        """
+        Queues the modification; replaces the one pending for the order
+        """
+        order = dict(order_no=order_no, exchange=exchange, trading_symbol=trading_symbol, new_quantity=new_quantity,
+                     new_price_type=new_price_type, new_trigger_price=new_trigger_price)
+        with self.__lock:
+            _, coalesced = self.pending.get(order_no, (None, -1))
+            self.pending[order_no] = (order, coalesced + 1)
+
+    def __modify(self, order: dict):
+        try:
+            return self.broker.api_modify_order(**order)
+        except Exception as ex:
+            logger.error(f"Unable to modify {order['order_no']}: {ex}")
+            return None
+
+    def __get_rejections(self, trigger_prices: dict[str, str]) -> dict[str, tuple[bool, str]]:
+        try:
+            rejections = get_rejections(self.broker.api_get_order_book(), trigger_prices)
+        except Exception as ex:
+            logger.error(f"Unable to get the order book to check {len(trigger_prices)} SL updates: {ex}")
+            rejections = {}
+        missing = [order_no for order_no in trigger_prices if order_no not in rejections]
+        if len(missing) > 0:
+            rejections.update(zip(missing, self.__executor.map(self.__is_rejected, missing)))
+        return rejections
+
+    def __is_rejected(self, order_no: str):
+        try:
+            return self.broker.is_sl_update_rejected(order_no)
+        except Exception as ex:
+            logger.error(f"Unable to check {order_no} for rejection: {ex}")
+            return False, "NA"
+
+    def flush(self) -> list[ModifyResult]:
+        """
+        Sends the pending modifications
+        """
+        with self.__lock:
+            pending, self.pending = self.pending, {}
+        if len(pending) == 0:
+            return []
+
+        order_nos = list(pending.keys())
+        resps = list(self.__executor.map(self.__modify, [pending[order_no][0] for order_no in order_nos]))
+        sent = [order_no for order_no, resp in zip(order_nos, resps) if resp is not None]
+        rejections = {}
+        if self.check_rejections and len(sent) > 0:
+            trigger_prices = {order_no: pending[order_no][0]['new_trigger_price'] for order_no in sent}
+            rejections = self.__get_rejections(trigger_prices)
+
+        results = []
+        for order_no, resp in zip(order_nos, resps):
+            order, coalesced = pending[order_no]
+            rejected, reason = rejections.get(order_no, (False, "NA"))
+            result = ModifyResult(order_no, order['new_trigger_price'], resp, rejected, reason, coalesced)
+            if rejected:
+                logger.error(f"SL update of {order_no} to {result.trigger_price} rejected: {reason}")
+            results.append(result)
+            if self.on_result is not None:
+                self.on_result(result)
+        logger.debug(f"Sent {len(sent)} of {len(results)} SL updates; coalesced "
+                     f"{sum(result.coalesced for result in results)}")
+        return results
+
+    def __run(self):
+        while not self.__stop.wait(self.window):
+            self.flush()
+
+    def start(self):
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, daemon=True, name="sl-modify-dispatcher")
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+        self.flush()
+        self.__executor.shutdown()
@@ -0,0 +1,104 @@
+import datetime
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from urllib.request import urlopen
+
+import pandas as pd
+
+from commons.config.reader import cfg
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_MASTER_URL = "https://api.shoonya.com/NSE_symbols.txt.zip"
+DOWNLOAD_TIMEOUT = 30
+
+# Zip path -> (mtime, symbols DF, TradingSymbol -> Token); shared by all accounts in the process
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+class SymbolMaster:
+    """
+    Broker symbol master zip cached on disk for the day, shared by all accounts & processes on the host,
+    with an in-memory TradingSymbol -> Token index
+    """
+    url: str
+    path: str
+    symbols: pd.DataFrame
+    tokens: dict[str, str]
+
+    def __init__(self, cache_dir: str = None, url: str = SYMBOL_MASTER_URL):
+        if cache_dir is None:
+            cache_dir = cfg.get('symbol-master-cache-path', os.path.join(tempfile.gettempdir(), 'symbol-master'))
+        os.makedirs(cache_dir, exist_ok=True)
+        self.url = url
+        self.path = os.path.join(cache_dir, os.path.basename(url))
+        self.refresh()
+
+    def is_fresh(self):
+        """
+        Valid for the day it was downloaded on
+        """
+        return (os.path.exists(self.path) and
+                datetime.date.fromtimestamp(os.path.getmtime(self.path)) == datetime.date.today())
+
+    def __download(self):
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            # One download per host; the other processes wait & reuse it
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self.is_fresh():
+                    return
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                try:
+                    with urlopen(self.url, timeout=DOWNLOAD_TIMEOUT) as response, open(tmp_path, 'wb') as out_file:
+                        shutil.copyfileobj(response, out_file)
+                    with zipfile.ZipFile(tmp_path) as zip_file:
+                        if zip_file.testzip() is not None:
+                            raise zipfile.BadZipFile(f"Corrupt symbol master from {self.url}")
+                    os.replace(tmp_path, self.path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                logger.info(f"Downloaded symbol master from {self.url}")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __load(self):
+        with zipfile.ZipFile(self.path) as zip_file:
+            with zip_file.open(zip_file.namelist()[0]) as file:
+                symbols = pd.read_csv(file)
+        unique = symbols.drop_duplicates(subset='TradingSymbol', keep='first')
+        tokens = dict(zip(unique.TradingSymbol, unique.Token.astype(str)))
+        return symbols, tokens
+
+    def refresh(self):
+        """
+        Downloads the master if the cached one is not from today & loads it once per process
+        """
+        if not self.is_fresh():
+            try:
+                self.__download()
+            except Exception as ex:
+                if not os.path.exists(self.path):
+                    raise
+                logger.error(f"Unable to download symbol master, using the cached one: {ex}")
+
+        mtime = os.path.getmtime(self.path)
+        with _loaded_lock:
+            loaded = _loaded.get(self.path)
+            if loaded is None or loaded[0] != mtime:
+                loaded = (mtime, *self.__load())
+                _loaded[self.path] = loaded
+        _, self.symbols, self.tokens = loaded
+
+    def get_token(self, trading_symbol: str) -> str:
+        token = self.tokens.get(trading_symbol)
+        if token is None:
+            raise KeyError(f"Invalid trading symbol {trading_symbol}")
+        return token
@@ -0,0 +1,134 @@
+import datetime
+import logging
+import os
+import shutil
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from commons.config.reader import cfg
+from commons.consts.consts import Interval
+from commons.dataprovider.ScripData import ScripData
+from commons.utils.Misc import get_date_epoch, IST_OFFSET, DAY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+OHLC_COLUMNS = ["time", "open", "high", "low", "close"]
+
+
+class OHLCArrays(NamedTuple):
+    time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+
+    def __len__(self):
+        return len(self.time)
+
+    def to_df(self) -> pd.DataFrame:
+        return pd.DataFrame(self._asdict())
+
+
+class DayIndex(NamedTuple):
+    day_start: np.ndarray  # IST midnight epoch of each day
+    offset: np.ndarray  # Row of the 1st bar of each day; last entry is the total no. of rows
+
+
+class ScripArrayStore:
+    """
+    Contiguous memory mapped time/open/high/low/close column files per scrip with a day-start offset index.
+    Slices are zero-copy views, so all processes share the same pages through the OS page cache.
+
+    Layout: <store_dir>/<scrip>_<tf> is a symlink to the current version directory holding <column>.npy,
+    day_start.npy & day_offset.npy; re-saving builds a new version & swaps the symlink atomically.
+    """
+    store_dir: str
+    sd: ScripData
+
+    def __init__(self, store_dir: str = None, scrip_data: ScripData = None):
+        self.store_dir = store_dir if store_dir is not None else cfg['scrip-array-store-path']
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.sd = scrip_data
+        self.__arrays = {}
+
+    def get_path(self, scrip_name: str, time_frame: Interval = Interval.in_1_minute):
+        return os.path.join(self.store_dir, f"{scrip_name}_{time_frame.value}")
+
+    def save(self, scrip_name: str, data: pd.DataFrame, time_frame: Interval = Interval.in_1_minute):
+        df = data[OHLC_COLUMNS].sort_values(by='time').drop_duplicates(subset='time', keep='last')
+        link = self.get_path(scrip_name, time_frame)
+        version_dir = f"{link}.{os.getpid()}.{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        os.makedirs(version_dir)
+
+        time = df.time.to_numpy(dtype=np.int64)
+        np.save(os.path.join(version_dir, "time.npy"), time)
+        for col in OHLC_COLUMNS[1:]:
+            np.save(os.path.join(version_dir, f"{col}.npy"), df[col].to_numpy(dtype=np.float64))
+
+        days = (time + IST_OFFSET) // DAY_SECONDS
+        starts = np.flatnonzero(np.diff(days, prepend=days[:1] - 1)) if len(days) > 0 else np.array([], np.int64)
+        np.save(os.path.join(version_dir, "day_start.npy"), days[starts] * DAY_SECONDS - IST_OFFSET)
+        np.save(os.path.join(version_dir, "day_offset.npy"), np.append(starts, len(time)).astype(np.int64))
+
+        old_version = os.path.realpath(link) if os.path.islink(link) else None
+        tmp_link = f"{version_dir}.lnk"
+        os.symlink(os.path.basename(version_dir), tmp_link)
+        os.replace(tmp_link, link)
+        if old_version is not None:
+            # Existing maps stay valid after unlink; new readers follow the symlink
+            shutil.rmtree(old_version, ignore_errors=True)
+        self.__arrays.pop((scrip_name, time_frame), None)
+        logger.info(f"save: {scrip_name} @ TF: {time_frame.value} stored {len(time)} rows in {len(starts)} days")
+
+    def refresh(self, scrip_name: str, time_frame: Interval = Interval.in_1_minute):
+        """
+        Rebuilds the arrays from ScripData
+        """
+        if self.sd is None:
+            self.sd = ScripData()
+        df = self.sd.get_scrip_data(scrip_name=scrip_name, time_frame=time_frame)
+        self.save(scrip_name, df, time_frame=time_frame)
+
+    def load(self, scrip_name: str, time_frame: Interval = Interval.in_1_minute) -> (OHLCArrays, DayIndex):
+        key = (scrip_name, time_frame)
+        if key not in self.__arrays:
+            path = os.path.realpath(self.get_path(scrip_name, time_frame))
+            arrays = OHLCArrays(*[np.load(os.path.join(path, f"{col}.npy"), mmap_mode='r') for col in OHLC_COLUMNS])
+            index = DayIndex(np.load(os.path.join(path, "day_start.npy")),
+                             np.load(os.path.join(path, "day_offset.npy")))
+            self.__arrays[key] = (arrays, index)
+        return self.__arrays[key]
+
+    def get_scrip_data(self, scrip_name: str, time_frame: Interval = Interval.in_1_minute,
+                       from_date: str = '1900-01-01', to_date: str = None) -> OHLCArrays:
+        """
+        :param from_date: Inclusive
+        :param to_date: Exclusive
+        :return: Zero-copy views of the memory mapped columns
+        """
+        arrays, index = self.load(scrip_name, time_frame)
+        start = index.offset[np.searchsorted(index.day_start, get_date_epoch(from_date), side='left')]
+        if to_date is None:
+            end = len(arrays)
+        else:
+            end = index.offset[np.searchsorted(index.day_start, get_date_epoch(to_date), side='left')]
+        return OHLCArrays(*[col[start:end] for col in arrays])
+
+    def get_base_data(self, scrip_name: str, from_date: str = '1900-01-01', to_date: str = None) -> OHLCArrays:
+        return self.get_scrip_data(scrip_name, Interval.in_daily, from_date=from_date, to_date=to_date)
+
+    def get_tick_data(self, scrip_name: str, from_date: str = '1900-01-01', to_date: str = None) -> OHLCArrays:
+        return self.get_scrip_data(scrip_name, Interval.in_1_minute, from_date=from_date, to_date=to_date)
+
+
+if __name__ == '__main__':
+    from commons.loggers.setup_logger import setup_logging
+
+    setup_logging("ScripArrayStore.log")
+    store = ScripArrayStore()
+    scrip = 'NSE_RELIANCE'
+    store.refresh(scrip)
+    x = store.get_tick_data(scrip, from_date='2023-12-01')
+    print(len(x), x.close[:10])
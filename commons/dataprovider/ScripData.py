@@ -1,61 +1,140 @@
+import logging
+
 import pandas as pd
 
+from commons.config.reader import cfg
 from commons.consts.consts import SCRIP_HIST, IST, Interval
-from commons.dataprovider.database import DatabaseEngine
+from commons.dataprovider.ScripDataCache import ScripDataCache
+from commons.dataprovider.database import DatabaseEngine, Filter
+from commons.utils.Misc import get_date_epoch
+
+logger = logging.getLogger(__name__)
+
+SCRIP_HIST_COLUMNS = ["scrip", "time_frame", "time", "date", "open", "high", "low", "close"]
 
 
 class ScripData:
     trader_db: DatabaseEngine
+    cache: ScripDataCache
 
-    def __init__(self, trader_db: DatabaseEngine = None):
+    def __init__(self, trader_db: DatabaseEngine = None, cache: ScripDataCache = None):
         if trader_db is None:
             self.trader_db = DatabaseEngine()
         else:
             self.trader_db = trader_db
+        if cache is None and cfg.get('scrip-data-cache-path') is not None:
+            self.cache = ScripDataCache(cfg['scrip-data-cache-path'])
+        else:
+            self.cache = cache
 
     def get_scrip_data(self, scrip_name: str, time_frame: Interval = Interval.in_1_minute,
                        from_date: str = '1900-01-01'):
-        predicate = f"m.{SCRIP_HIST}.scrip == '{scrip_name}'"
-        predicate += f",m.{SCRIP_HIST}.time_frame == '{time_frame.value}'"
-        if from_date != '1900-01-01':
-            predicate += f",m.{SCRIP_HIST}.date  >= '{from_date}'"
+        if self.cache is not None:
+            df = self.__get_cached_scrip_data(scrip_name=scrip_name, time_frame=time_frame)
+            if str(from_date) != '1900-01-01':
+                df = df.loc[df.time >= get_date_epoch(from_date)].reset_index(drop=True)
+            return df
+        predicate = [Filter('scrip', '==', scrip_name), Filter('time_frame', '==', time_frame.value)]
+        if str(from_date) != '1900-01-01':
+            predicate.append(Filter('time', '>=', get_date_epoch(from_date)))
         return self.trader_db.query_df(SCRIP_HIST, predicate)
 
+    def __get_cached_scrip_data(self, scrip_name: str, time_frame: Interval):
+        """
+        Reads the full history from cache & fetches only the rows newer than the cached max time
+        """
+        predicate = [Filter('scrip', '==', scrip_name), Filter('time_frame', '==', time_frame.value)]
+        cached = self.cache.read(scrip_name, time_frame)
+        if cached is not None and len(cached) > 0:
+            predicate.append(Filter('time', '>', int(cached.time.max())))
+        new_df = self.trader_db.query_df(SCRIP_HIST, predicate)
+        return self.__update_cache(scrip_name, time_frame, cached, new_df)
+
+    def __update_cache(self, scrip_name: str, time_frame: Interval, cached: pd.DataFrame, new_df: pd.DataFrame):
+        logger.debug(f"get_scrip_data: {scrip_name} @ TF: {time_frame.value} fetched {len(new_df)} new rows")
+        if len(new_df) == 0:
+            if cached is None:
+                return new_df
+            return cached
+        if cached is None or len(cached) == 0:
+            df = new_df
+        else:
+            df = pd.concat([cached, new_df.astype(cached.dtypes.to_dict())], ignore_index=True)
+        df = df.sort_values(by='time', ignore_index=True)
+        self.cache.write(scrip_name, time_frame, df)
+        return df
+
+    def get_scrips_data(self, scrip_names: list[str], time_frames: list[Interval] = None,
+                        from_date: str = '1900-01-01') -> pd.DataFrame:
+        """
+        Batch variant of get_scrip_data - retrieves all scrips & time frames with a single scrip IN (...) query
+        :return: Long format DF with scrip & time_frame columns
+        """
+        if time_frames is None:
+            time_frames = [Interval.in_1_minute]
+        predicate = [Filter('scrip', 'in', list(scrip_names)),
+                     Filter('time_frame', 'in', [time_frame.value for time_frame in time_frames])]
+        if self.cache is None:
+            if str(from_date) != '1900-01-01':
+                predicate.append(Filter('time', '>=', get_date_epoch(from_date)))
+            df = self.trader_db.query_df(SCRIP_HIST, predicate)
+            return df.sort_values(by=['scrip', 'time_frame', 'time'], ignore_index=True)
+
+        keys = [(scrip_name, time_frame) for scrip_name in scrip_names for time_frame in time_frames]
+        cached = {key: self.cache.read(*key) for key in keys}
+        max_times = {key: int(df.time.max()) for key, df in cached.items() if df is not None and len(df) > 0}
+        if len(max_times) == len(keys):
+            # All are cached - only need rows newer than the oldest of the cached max times
+            predicate.append(Filter('time', '>', min(max_times.values())))
+        new_df = self.trader_db.query_df(SCRIP_HIST, predicate)
+        groups = {key: grp for key, grp in new_df.groupby(['scrip', 'time_frame'])}
+
+        results = []
+        for key in keys:
+            scrip_name, time_frame = key
+            key_df = groups.get((scrip_name, time_frame.value), new_df.iloc[0:0])
+            if key in max_times:
+                key_df = key_df.loc[key_df.time > max_times[key]]
+            results.append(self.__update_cache(scrip_name, time_frame, cached[key], key_df))
+        df = pd.concat(results, ignore_index=True)
+        if str(from_date) != '1900-01-01':
+            df = df.loc[df.time >= get_date_epoch(from_date)].reset_index(drop=True)
+        return df
+
+    @staticmethod
+    def __split_by_scrip(df: pd.DataFrame, scrip_names: list[str]) -> dict:
+        result = {scrip_name: grp[["time", "open", "high", "low", "close"]].reset_index(drop=True)
+                  for scrip_name, grp in df.groupby('scrip')}
+        for scrip_name in scrip_names:
+            if scrip_name not in result:
+                result[scrip_name] = pd.DataFrame(columns=["time", "open", "high", "low", "close"])
+        return result
+
     def save_scrip_data(self, data: pd.DataFrame, scrip_name: str, time_frame: Interval = Interval.in_1_minute):
         df = data.copy()
-        from_epoch = str(df.time.min())
-        predicate = f"m.{SCRIP_HIST}.scrip == '{scrip_name}'"
-        predicate += f",m.{SCRIP_HIST}.time_frame == '{time_frame.value}'"
-        predicate += f",m.{SCRIP_HIST}.time  >= '{from_epoch}'"
-        self.trader_db.delete_recs(SCRIP_HIST, predicate=predicate)
-
-        df['date'] = pd.to_datetime(df['time'].astype(int), unit='s', utc=True)
-        df['date'] = df['date'].dt.tz_convert(IST)
-
-        df['hour'] = df['date'].dt.hour
-        df['minute'] = df['date'].dt.minute
-
-        df['date'] = df['date'].dt.date
-        df['date'] = df['date'].astype(str)
-
+        from_epoch = int(df.time.min())
+        range_predicate = [Filter('scrip', '==', scrip_name),
+                           Filter('time_frame', '==', time_frame.value),
+                           Filter('time', '>=', from_epoch)]
+        self.trader_db.delete_recs(SCRIP_HIST, predicate=range_predicate)
+        if self.cache is not None:
+            self.cache.invalidate(scrip_name, time_frame, from_epoch=from_epoch)
+
+        df['time'] = df['time'].astype(int)
+        ist_time = pd.to_datetime(df['time'], unit='s', utc=True).dt.tz_convert(IST)
+
+        # Pre-open (09:00 - 09:14) & post-close (from 15:30) candles are not stored
+        pre_open = (ist_time.dt.hour == 9) & (ist_time.dt.minute <= 14)
+        post_close = (ist_time.dt.hour == 15) & (ist_time.dt.minute >= 30)
+        df = df.loc[~(pre_open | post_close)].copy()
+        if len(df) == 0:
+            return "Ok"
+
+        df['date'] = ist_time.dt.date
         df.loc[:, 'scrip'] = scrip_name
         df.loc[:, 'time_frame'] = time_frame.value
 
-        self.trader_db.bulk_insert(SCRIP_HIST, df)
-
-        predicate = f"m.{SCRIP_HIST}.scrip == '{scrip_name}'"
-        predicate += f",m.{SCRIP_HIST}.time_frame == '{time_frame.value}'"
-        predicate += f",m.{SCRIP_HIST}.time  >= '{from_epoch}'"
-        predicate += f",m.{SCRIP_HIST}.hour  == 9"
-        predicate += f",m.{SCRIP_HIST}.minute  <= 14"
-        self.trader_db.delete_recs(SCRIP_HIST, predicate=predicate)
-
-        predicate = f"m.{SCRIP_HIST}.scrip == '{scrip_name}'"
-        predicate += f",m.{SCRIP_HIST}.time_frame == '{time_frame.value}'"
-        predicate += f",m.{SCRIP_HIST}.time  >= '{from_epoch}'"
-        predicate += f",m.{SCRIP_HIST}.hour  == 15"
-        predicate += f",m.{SCRIP_HIST}.minute  >= 30"
-        self.trader_db.delete_recs(SCRIP_HIST, predicate=predicate)
+        self.trader_db.bulk_insert(SCRIP_HIST, df[SCRIP_HIST_COLUMNS])
 
         return "Ok"
 
@@ -67,6 +146,20 @@ class ScripData:
         df = self.get_scrip_data(scrip_name=scrip_name, time_frame=Interval.in_1_minute, from_date=from_date)
         return df[["time", "open", "high", "low", "close"]]
 
+    def get_scrips_base_data(self, scrip_names: list[str], from_date: str = '1900-01-01') -> dict:
+        """
+        :return: dict of scrip name & its daily OHLC DF
+        """
+        df = self.get_scrips_data(scrip_names=scrip_names, time_frames=[Interval.in_daily], from_date=from_date)
+        return self.__split_by_scrip(df, scrip_names)
+
+    def get_scrips_tick_data(self, scrip_names: list[str], from_date: str = '1900-01-01') -> dict:
+        """
+        :return: dict of scrip name & its 1-min OHLC DF
+        """
+        df = self.get_scrips_data(scrip_names=scrip_names, time_frames=[Interval.in_1_minute], from_date=from_date)
+        return self.__split_by_scrip(df, scrip_names)
+
 
 if __name__ == '__main__':
     from commons.loggers.setup_logger import setup_logging
@@ -0,0 +1,75 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from commons.consts.consts import Interval
+from commons.models.ScripHist import ScripHist
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLUMNS = [column.name for column in ScripHist.__table__.columns]
+
+
+class ScripDataCache:
+    """
+    Local Parquet copy of scrip_hist - one file per (scrip, time frame) holding the full history.
+    ScripData reads through it and fetches only rows newer than the cached max time from the DB.
+    """
+    cache_dir: str
+    columns: list[str]
+
+    def __init__(self, cache_dir: str, columns: list[str] = None):
+        """
+        :param columns: Columns of the cached DFs; files written with other columns are dropped. Defaults to ScripHist
+        """
+        self.cache_dir = cache_dir
+        self.columns = CACHE_COLUMNS if columns is None else columns
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_path(self, scrip_name: str, time_frame: Interval):
+        return os.path.join(self.cache_dir, f"{scrip_name}_{time_frame.value}.parquet")
+
+    def read(self, scrip_name: str, time_frame: Interval):
+        """
+        :return: Cached DF sorted by time or None if nothing is cached
+        """
+        path = self.get_path(scrip_name, time_frame)
+        if not os.path.exists(path):
+            return None
+        df = pd.read_parquet(path)
+        if list(df.columns) != self.columns:
+            # Written before a scrip_hist schema change; refetched from the DB in full
+            logger.info(f"read: {path} has columns {list(df.columns)}; dropping it")
+            os.remove(path)
+            return None
+        return df
+
+    def write(self, scrip_name: str, time_frame: Interval, df: pd.DataFrame):
+        """
+        Atomically replaces the cache file so that concurrent readers never see a partial file
+        """
+        path = self.get_path(scrip_name, time_frame)
+        # Per thread, so that concurrent writers of the same file never share one
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, scrip_name: str, time_frame: Interval, from_epoch: int = None):
+        """
+        Drops cached rows from from_epoch onwards (entire file if None); next read refetches them from the DB
+        """
+        path = self.get_path(scrip_name, time_frame)
+        if not os.path.exists(path):
+            return
+        if from_epoch is None:
+            os.remove(path)
+            return
+        df = self.read(scrip_name, time_frame)
+        df = df.loc[df.time < from_epoch]
+        if len(df) == 0:
+            os.remove(path)
+        else:
+            self.write(scrip_name, time_frame, df)
+        logger.debug(f"invalidate: {scrip_name} @ TF: {time_frame.value} from {from_epoch}; {len(df)} rows retained")
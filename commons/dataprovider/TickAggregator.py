@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from commons.consts.consts import Interval
+from commons.dataprovider.ScripData import ScripData
+from commons.utils.Misc import IST_OFFSET, DAY_SECONDS, BOD_SECONDS, EOD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SESSION_MINUTES = (EOD_SECONDS - BOD_SECONDS) // 60
+OHLC_COLUMNS = ["time", "open", "high", "low", "close"]
+
+
+def get_bar_time(epoch: int) -> int:
+    """
+    :return: Start of the IST session minute of the epoch or -1 outside the session
+    """
+    seconds = (epoch + IST_OFFSET) % DAY_SECONDS
+    if seconds < BOD_SECONDS or seconds >= EOD_SECONDS:
+        return -1
+    return epoch - epoch % 60
+
+
+class TickAggregator:
+    """
+    Builds 1-minute OHLC bars per token from the SNAPQUOTE websocket ticks into preallocated ring buffers & saves
+    the completed bars to ScripData in batches:
+
+        aggregator = TickAggregator({'2885': 'NSE_RELIANCE'}, scrip_data=ScripData())
+        s.api_start_websocket(subscribe_callback=aggregator.on_tick, ...)
+        s.api_subscribe(aggregator.instruments)
+        aggregator.start()
+    """
+    tokens: dict[str, int]  # Token -> row
+    scrips: list[str]
+    capacity: int
+    sd: ScripData
+
+    def __init__(self, scrips: dict[str, str], scrip_data: ScripData = None, capacity: int = SESSION_MINUTES,
+                 batch_size: int = 500, exchange: str = 'NSE'):
+        """
+        :param scrips: Token -> scrip name e.g. NSE_RELIANCE
+        :param scrip_data: Completed bars are saved here; not saved when None
+        :param capacity: Completed bars kept per token, a session by default
+        :param batch_size: Completed bars that trigger a flush on the tick
+        """
+        self.tokens = {str(token): row for row, token in enumerate(scrips.keys())}
+        self.scrips = list(scrips.values())
+        self.exchange = exchange
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.sd = scrip_data
+
+        size = len(self.scrips)
+        # Completed bars; slot = count % capacity
+        self.times = np.zeros((size, capacity), dtype=np.int64)
+        self.ohlc = np.full((size, capacity, 4), np.nan)
+        self.counts = np.zeros(size, dtype=np.int64)
+        # Bar being built
+        self.bar_time = np.full(size, -1, dtype=np.int64)
+        self.bar = np.full((size, 4), np.nan)
+        # Time of the last completed bar, later ticks of it are dropped
+        self.closed_time = np.full(size, -1, dtype=np.int64)
+        self.flushed = np.zeros(size, dtype=np.int64)
+
+        self.__lock = threading.Lock()
+        self.__flush_lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    @property
+    def instruments(self) -> list[str]:
+        return [f"{self.exchange}|{token}" for token in self.tokens]
+
+    def __close_bar(self, row: int):
+        slot = self.counts[row] % self.capacity
+        self.times[row, slot] = self.bar_time[row]
+        self.ohlc[row, slot] = self.bar[row]
+        self.counts[row] += 1
+        self.closed_time[row] = self.bar_time[row]
+        self.bar_time[row] = -1
+
+    def add_tick(self, token: str, price: float, epoch: int):
+        row = self.tokens.get(token)
+        bar_time = get_bar_time(epoch)
+        if row is None or bar_time < 0:
+            return
+        with self.__lock:
+            current = self.bar_time[row]
+            if bar_time < current or bar_time <= self.closed_time[row]:
+                # Late tick of a closed bar, also once rolled
+                return
+            if bar_time > current:
+                if current >= 0:
+                    self.__close_bar(row)
+                self.bar_time[row] = bar_time
+                self.bar[row] = price
+                return
+            bar = self.bar[row]
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+
+    def on_tick(self, message: dict):
+        """
+        subscribe_callback of the websocket; the partial (tf) updates carry lp only when it changed
+        """
+        if 'lp' not in message:
+            return
+        epoch = int(message.get('ft', time.time()))
+        self.add_tick(message.get('tk'), float(message['lp']), epoch)
+        if self.sd is not None and int((self.counts - self.flushed).sum()) >= self.batch_size:
+            self.flush()
+
+    def roll(self, now: float = None):
+        """
+        Closes the bars whose minute is over, for the tokens that had no tick since
+        """
+        now = int(time.time() if now is None else now)
+        with self.__lock:
+            for row in np.flatnonzero((self.bar_time >= 0) & (self.bar_time + 60 <= now)):
+                self.__close_bar(row)
+
+    def __get_rows(self, row: int, start: int, end: int) -> pd.DataFrame:
+        """
+        Completed bars [start, end) of the row, as far as they are still in the ring
+        """
+        start = max(start, end - self.capacity)
+        slots = np.arange(start, end) % self.capacity
+        df = pd.DataFrame(self.ohlc[row, slots], columns=OHLC_COLUMNS[1:])
+        df.insert(0, "time", self.times[row, slots])
+        return df
+
+    def get_bars(self, scrip_name: str, n_bars: int = None, current: bool = False) -> pd.DataFrame:
+        """
+        :param n_bars: Latest completed bars; all in the ring when None
+        :param current: Include the bar being built
+        """
+        row = self.scrips.index(scrip_name)
+        with self.__lock:
+            end = int(self.counts[row])
+            df = self.__get_rows(row, 0 if n_bars is None else end - n_bars, end)
+            if current and self.bar_time[row] >= 0:
+                df.loc[len(df)] = [self.bar_time[row], *self.bar[row]]
+        df['time'] = df['time'].astype(np.int64)
+        return df
+
+    def flush(self) -> int:
+        """
+        Saves the bars completed since the last flush; the bars of a failed save are retried on the next flush
+        :return: No. of bars saved
+        """
+        with self.__flush_lock:
+            with self.__lock:
+                batches = []
+                for row in np.flatnonzero(self.counts > self.flushed):
+                    end = int(self.counts[row])
+                    batches.append((row, end, self.__get_rows(row, int(self.flushed[row]), end)))
+            saved = 0
+            for row, end, df in batches:
+                scrip_name = self.scrips[row]
+                try:
+                    self.sd.save_scrip_data(df, scrip_name=scrip_name, time_frame=Interval.in_1_minute)
+                except Exception as ex:
+                    logger.error(f"Unable to save {len(df)} bars of {scrip_name}: {ex}")
+                    continue
+                with self.__lock:
+                    self.flushed[row] = end
+                saved += len(df)
+        if saved > 0:
+            logger.debug(f"Saved {saved} bars of {len(batches)} scrips")
+        return saved
+
+    def __run(self, interval: float):
+        while not self.__stop.wait(interval):
+            self.roll()
+            if self.sd is not None:
+                self.flush()
+
+    def start(self, interval: float = 5):
+        """
+        Rolls & flushes the bars every interval seconds in the background
+        """
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, args=(interval,), daemon=True, name="tick-aggregator")
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+        self.roll()
+        if self.sd is not None:
+            self.flush()
+
+
+if __name__ == '__main__':
+    from commons.broker.Shoonya import Shoonya
+    from commons.loggers.setup_logger import setup_logging
+
+    setup_logging("TickAggregator.log")
+
+    s = Shoonya('Trader-V2-Pralhad')
+    scrips_ = ['NSE_RELIANCE', 'NSE_UPL']
+    aggregator = TickAggregator({s.get_token(scrip.replace("NSE_", "") + "-EQ"): scrip for scrip in scrips_},
+                                scrip_data=ScripData())
+    s.api_start_websocket(socket_open_callback=lambda: s.api_subscribe(aggregator.instruments),
+                          subscribe_callback=aggregator.on_tick,
+                          socket_error_callback=print, order_update_callback=print)
+    aggregator.start()
+    time.sleep(180)
+    aggregator.stop()
+    print(aggregator.get_bars('NSE_RELIANCE'))
@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from commons.config.reader import cfg
+from commons.consts.consts import Interval
+from commons.utils.Misc import get_date_epoch
+
+logger = logging.getLogger(__name__)
+
+OHLC_COLUMNS = ["time", "open", "high", "low", "close"]
+ROW_GROUP_SIZE = 50000
+PARTITIONING = ds.partitioning(pa.schema([("scrip", pa.string())]), flavor="hive")
+
+
+class TvDataset:
+    """
+    Parquet dataset of the TradingView downloads, hive partitioned as <dataset_dir>/interval=<tf>/scrip=<scrip>/.
+    Each partition holds one file sorted by time, so time range filters are pushed down to the row group stats.
+    """
+    dataset_dir: str
+
+    def __init__(self, dataset_dir: str = None):
+        self.dataset_dir = dataset_dir if dataset_dir is not None else cfg['tv-dataset-path']
+        os.makedirs(self.dataset_dir, exist_ok=True)
+
+    def get_path(self, scrip_name: str, interval: Interval):
+        return os.path.join(self.dataset_dir, f"interval={interval.value}", f"scrip={scrip_name}")
+
+    def append(self, scrip_name: str, interval: Interval, data: pd.DataFrame, replace: bool = False):
+        """
+        Merges the bars into the partition; on overlapping time the new bars win.
+        :param replace: Drop the stored bars instead of merging
+        The partition file is replaced atomically so that concurrent readers never see a partial file.
+        """
+        path = self.get_path(scrip_name, interval)
+        file = os.path.join(path, "data.parquet")
+        df = data[OHLC_COLUMNS]
+        if not replace and os.path.exists(file):
+            df = pd.concat([pd.read_parquet(file, columns=OHLC_COLUMNS), df], ignore_index=True)
+        df = (df.drop_duplicates(subset='time', keep='last')
+              .sort_values(by='time', ignore_index=True)
+              .astype({"time": "int64", "open": "float64", "high": "float64", "low": "float64", "close": "float64"}))
+
+        os.makedirs(path, exist_ok=True)
+        # Dot prefixed, so that dataset discovery skips it
+        tmp_file = os.path.join(path, f".data.parquet.{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_file, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_file, file)
+        logger.debug(f"append: {scrip_name} @ TF: {interval.value} {len(data)} bars; {len(df)} stored")
+
+    def get_last_time(self, scrip_name: str, interval: Interval):
+        """
+        :return: Time of the last stored bar from the Parquet footer stats or None if nothing is stored
+        """
+        file = os.path.join(self.get_path(scrip_name, interval), "data.parquet")
+        if not os.path.exists(file):
+            return None
+        metadata = pq.ParquetFile(file).metadata
+        if metadata.num_rows == 0:
+            return None
+        stats = metadata.row_group(metadata.num_row_groups - 1).column(0).statistics
+        return int(stats.max)
+
+    def read(self, scrip_name: str = None, interval: Interval = Interval.in_daily,
+             from_date: str = None, to_date: str = None):
+        """
+        :param scrip_name: None for all scrips, in which case the scrip column is included
+        :param from_date: Inclusive
+        :param to_date: Exclusive
+        :return: DF sorted by time or None if nothing is stored
+        """
+        if scrip_name is not None:
+            # Single partition - skips discovery of the rest of the universe
+            path = self.get_path(scrip_name, interval)
+            dataset = ds.dataset(path, format="parquet") if os.path.exists(path) else None
+            columns = list(OHLC_COLUMNS)
+            sort_cols = ["time"]
+        else:
+            path = os.path.join(self.dataset_dir, f"interval={interval.value}")
+            dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING) if os.path.exists(path) else None
+            columns = ["scrip"] + OHLC_COLUMNS
+            sort_cols = ["scrip", "time"]
+        if dataset is None:
+            return None
+
+        predicate = None
+        if from_date is not None:
+            predicate = ds.field("time") >= get_date_epoch(from_date)
+        if to_date is not None:
+            upper = ds.field("time") < get_date_epoch(to_date)
+            predicate = upper if predicate is None else predicate & upper
+
+        df = dataset.to_table(columns=columns, filter=predicate).to_pandas()
+        return df.sort_values(by=sort_cols, ignore_index=True)
+
+
+if __name__ == '__main__':
+    from commons.loggers.setup_logger import setup_logging
+
+    setup_logging("TvDataset.log")
+    tv_ds = TvDataset()
+    print(tv_ds.read('NSE_RELIANCE', Interval.in_1_minute, from_date='2023-12-01'))
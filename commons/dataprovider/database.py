@@ -1,10 +1,14 @@
 import importlib
 import logging
+import operator
 import os
+import pkgutil
+import sys
+from typing import Any, NamedTuple
 
 import pandas as pd
 import sqlalchemy
-from sqlalchemy import create_engine, Engine, insert
+from sqlalchemy import create_engine, Engine, insert, select, delete
 from sqlalchemy.orm import sessionmaker
 
 from commons.config.reader import cfg
@@ -23,26 +27,117 @@ def table_repr(self):
 
 Base.__repr__ = table_repr
 
+MODELS_PACKAGE = 'commons.models'
+POSTGRES_BACKEND = 'postgres'
+EMBEDDED_BACKENDS = ['duckdb', 'sqlite']
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    'in': lambda col, val: col.in_(val),
+    'not in': lambda col, val: col.not_in(val),
+    'like': lambda col, val: col.like(val),
+}
+
+_model_registry: dict[str, dict] = {}
+
+
+class Filter(NamedTuple):
+    """
+    Structured where clause condition e.g. Filter('scrip', '==', 'NSE_RELIANCE').
+    Plain (column, op, value) tuples are accepted wherever a Filter is.
+    """
+    column: str
+    op: str
+    value: Any
+
+
+def load_models(package_name: str = MODELS_PACKAGE) -> dict:
+    """
+    Imports all modules of the package once per process & maps table name to its model class.
+    Table name is the class name which is same as the module name e.g. commons.models.ScripHist.ScripHist
+    """
+    models = _model_registry.get(package_name)
+    if models is not None:
+        return models
+
+    models = {}
+    package = importlib.import_module(package_name)
+    for module_info in pkgutil.iter_modules(package.__path__):
+        if module_info.name.startswith("__"):
+            continue
+        module_path = f'{package_name}.{module_info.name}'
+        try:
+            module = importlib.import_module(module_path)
+        except ImportError as e:
+            logger.error(f'Error importing module {module_path}: {e}')
+            continue
+        model = getattr(module, module_info.name, None)
+        if model is not None and hasattr(model, '__table__'):
+            models[module_info.name] = model
+    _model_registry[package_name] = models
+    return models
+
+
+def build_clauses(model, filters: list) -> list:
+    """
+    Converts list of (column, op, value) into SQL Alchemy expressions with bound parameters
+    """
+    clauses = []
+    for column, op, value in filters:
+        col = getattr(model, column, None)
+        assert col is not None, f"Invalid column {column} for {model.__name__}"
+        func = OPERATORS.get(op)
+        assert func is not None, f"Invalid operator {op} for {model.__name__}.{column}"
+        clauses.append(func(col, value))
+    return clauses
+
 
 class DatabaseEngine:
     cfg: dict
+    db_config: dict
+    backend: str
     engine: Engine
     tables: list
+    models: dict
 
-    _ = insert
-
-    def __init__(self):
+    def __init__(self, db_config: dict = None):
+        """
+        :param db_config: Overrides the 'database' config section e.g. {"backend": "duckdb", "path": "/x/trader.duckdb"}
+        """
         self.cfg = cfg
+        self.db_config = db_config if db_config is not None else cfg.get('database', {})
+        self.backend = self.db_config.get('backend', POSTGRES_BACKEND)
         self.engine = self.get_connection()
         self.Session = sessionmaker(bind=self.engine)
         self.session = self.Session()
-        self.package_name = 'commons.models'
-        self.tables = self.load_tables('../../', self.package_name)
+        self.package_name = MODELS_PACKAGE
+        self.models = load_models(self.package_name)
+        self.tables = [sys.modules[m.__module__] for m in self.models.values()]
+        if self.is_embedded():
+            self.create_tables()
 
     def __del__(self):
-        self.session.close()
+        if hasattr(self, 'session'):
+            self.session.close()
+
+    def is_embedded(self):
+        return self.backend in EMBEDDED_BACKENDS
 
     def get_connection(self):
+        if self.is_embedded():
+            path = self.db_config.get('path', ':memory:')
+            if path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            logger.info(f"Using embedded {self.backend} database at {path}")
+            return create_engine(f'{self.backend}:///{path}')
+        elif self.backend != POSTGRES_BACKEND:
+            raise ValueError(f"Invalid database backend {self.backend}")
+
         pg_config = self.cfg['postgres']
         username = pg_config['username']
         password = pg_config['password']
@@ -71,10 +166,27 @@ class DatabaseEngine:
 
         return result
 
-    def single_insert(self, table, data):
-        m = next((m for m in self.tables if m.__name__ == self.package_name + "." + table), None)
+    def get_model(self, table: str):
+        m = self.models.get(table)
         assert m is not None, f"Invalid table name {table}"
-        obj = eval(f"m.{table}(**data)")
+        return m
+
+    def _where(self, model, predicate):
+        """
+        :param predicate: list of (column, op, value) or legacy string as per SQL Alchemy syntax
+        :return: List of clauses for the where condition
+        """
+        if predicate is None:
+            return []
+        if isinstance(predicate, str):
+            # Legacy predicates refer the model as m.<table>.<column>
+            m = sys.modules[model.__module__]
+            return [eval(f"sqlalchemy.and_({predicate})", {"sqlalchemy": sqlalchemy, "m": m})]
+        return build_clauses(model, predicate)
+
+    def single_insert(self, table, data):
+        m = self.get_model(table)
+        obj = m(**data)
         self._insert(obj)
 
     def _insert(self, obj):
@@ -89,24 +201,24 @@ class DatabaseEngine:
         """
 
         :param table:
-        :param predicate: Where clause as per SQL Alchemy syntax
+        :param predicate: List of Filter(column, op, value); Legacy where clause as per SQL Alchemy syntax
         :return: List of objects of type <table>
         """
-        m = next((m for m in self.tables if m.__name__ == self.package_name + "." + table), None)
-        assert m is not None, f"Invalid table name {table}"
-        results = eval(f"self.session.query(m.{table}).filter({predicate}).all()")
+        m = self.get_model(table)
+        stmt = select(m).where(*self._where(m, predicate))
+        results = self.session.scalars(stmt).all()
         return results
 
     def query_df(self, table, predicate) -> pd.DataFrame:
         """
 
         :param table:
-        :param predicate: Where clause as per SQL Alchemy syntax
+        :param predicate: List of Filter(column, op, value); Legacy where clause as per SQL Alchemy syntax
         :return: Pandas DF in shape of <table>
         """
-        m = next((m for m in self.tables if m.__name__ == self.package_name + "." + table), None)
-        assert m is not None, f"Invalid table name {table}"
-        results = eval(f"pd.read_sql(self.session.query(m.{table}).filter({predicate}).statement,self.engine)")
+        m = self.get_model(table)
+        stmt = select(m).where(*self._where(m, predicate))
+        results = pd.read_sql(stmt, self.engine)
         return results
 
     def run_query(self, tbl: str, predicate: str = None):
@@ -127,36 +239,60 @@ class DatabaseEngine:
         df = pd.read_sql(query, self.engine)
         return df
 
-    def delete_recs(self, table: str, predicate: str = None):
-        m = next((m for m in self.tables if m.__name__ == self.package_name + "." + table), None)
-        assert m is not None, f"Invalid table name {table}"
-        if predicate is None:
-            delete = eval(f"self.session.query(m.{table}).delete(synchronize_session=False)")
-        else:
-            delete = eval(f"self.session.query(m.{table}).filter({predicate}).delete(synchronize_session=False)")
+    def delete_recs(self, table: str, predicate=None):
+        m = self.get_model(table)
+        stmt = delete(m).where(*self._where(m, predicate))
+        result = self.session.execute(stmt, execution_options={"synchronize_session": False})
         self.session.commit()
-        return delete
+        return result.rowcount
+
+    def create_tables(self, tables: list[str] = None):
+        """
+        Creates the model tables which don't exist yet; used for bootstrapping the embedded backends.
+        DuckDB has no SERIAL, hence surrogate keys get a sequence backed default on a copy of the table definition.
+        DuckDB also parses as Postgres but has no covering indexes, so INCLUDE columns are dropped.
+        """
+        if tables is None:
+            tables = list(self.models.keys())
+        metadata = sqlalchemy.MetaData()
+        for table in tables:
+            tbl = self.get_model(table).__table__
+            if self.backend == 'duckdb' and tbl.autoincrement_column is not None:
+                pk = tbl.autoincrement_column
+                seq = sqlalchemy.Sequence(f'{tbl.name}_{pk.name}_seq', metadata=metadata)
+                columns = []
+                for col in tbl.columns:
+                    new_col = col._copy()
+                    if col is pk:
+                        new_col.autoincrement = False
+                        new_col.server_default = sqlalchemy.DefaultClause(seq.next_value())
+                    columns.append(new_col)
+                new_tbl = sqlalchemy.Table(tbl.name, metadata, *columns)
+            else:
+                new_tbl = tbl.to_metadata(metadata)
+            if self.backend == 'duckdb':
+                for index in new_tbl.indexes:
+                    index.dialect_options['postgresql']['include'] = []
+        metadata.create_all(self.engine, checkfirst=True)
 
     def create_table(self, table):
-        m = next((m for m in self.tables if m.__name__ == self.package_name + "." + table), None)
-        assert m is not None, f"Invalid table name {table}"
-        result = eval(f"m.{table}.__table__.create(self.engine)")
+        m = self.get_model(table)
+        result = m.__table__.create(self.engine)
         print(result)
 
     def bulk_insert(self, table: str, data: pd.DataFrame):
-        m = next((m for m in self.tables if m.__name__ == self.package_name + "." + table), None)
-        assert m is not None, f"Invalid table name {table}"
+        m = self.get_model(table)
         if len(data) == 0:
             return
-        eval(f'self.session.execute(insert(m.{table}), data.to_dict("records"))')
+        self.session.execute(insert(m), data.to_dict("records"))
         self.session.commit()
 
 
 if __name__ == "__main__":
     l = DatabaseEngine()
     # l.log_entry("Order", {"order_date": "2023-01-01", "price": 123.45, "direction": "BUY"})
-    x = l.query("Order", "m.Order.order_id > 1")
+    x = l.query("Order", [Filter("order_id", ">", 1)])
     print(x)
     # l.create_table(table='TrainingResult')
-    x = l.delete_recs(table='TrainingResult', predicate="m.TrainingResult.training_date == '2023-08-06'")
+    x = l.delete_recs(table='TrainingResult', predicate=[Filter("training_date", "==", '2023-08-06')])
     print(x)
@@ -0,0 +1,78 @@
+import argparse
+import logging
+
+import pandas as pd
+from sqlalchemy import select
+
+from commons.dataprovider.database import DatabaseEngine, POSTGRES_BACKEND, EMBEDDED_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 100000
+
+
+def sync_table(source: DatabaseEngine, target: DatabaseEngine, table: str, predicate: list = None,
+               chunk_size: int = CHUNK_SIZE):
+    """
+    Replaces rows matching the predicate in target with the ones from source.
+    Surrogate (autoincrement) keys are not copied - target generates its own.
+    :return: No. of rows copied
+    """
+    m = source.get_model(table)
+    skip_col = m.__table__.autoincrement_column
+    target.delete_recs(table, predicate=predicate)
+
+    stmt = select(m).where(*source._where(m, predicate))
+    count = 0
+    for chunk in pd.read_sql(stmt, source.engine, chunksize=chunk_size):
+        if skip_col is not None:
+            chunk = chunk.drop(columns=[skip_col.name])
+        chunk = chunk.astype(object).where(pd.notnull(chunk), None)
+        target.bulk_insert(table, chunk)
+        count += len(chunk)
+        logger.debug(f"sync_table: {table} copied {count} rows")
+    logger.info(f"sync_table: {table} copied {count} rows from {source.backend} to {target.backend}")
+    return count
+
+
+def has_column(source: DatabaseEngine, table: str, column: str) -> bool:
+    return column in source.get_model(table).__table__.columns
+
+
+def sync_tables(source: DatabaseEngine, target: DatabaseEngine, tables: list[str] = None, predicate: list = None,
+                chunk_size: int = CHUNK_SIZE, scrips: list[str] = None):
+    """
+    Copies the tables from source to target e.g. Postgres to the embedded DuckDB.
+    :param scrips: Restricts the tables having a scrip column to these scrips; the others are copied in full.
+    Defaults tables to the ones having a scrip column.
+    :return: dict of table name & no. of rows copied
+    """
+    if tables is None:
+        tables = list(source.models.keys())
+        if scrips:
+            tables = [table for table in tables if has_column(source, table, "scrip")]
+    target.create_tables(tables)
+    result = {}
+    for table in tables:
+        table_predicate = predicate
+        if scrips and has_column(source, table, "scrip"):
+            table_predicate = (predicate or []) + [("scrip", "in", scrips)]
+        result[table] = sync_table(source, target, table, predicate=table_predicate, chunk_size=chunk_size)
+    return result
+
+
+if __name__ == '__main__':
+    from commons.loggers.setup_logger import setup_logging
+
+    setup_logging("dbsync.log")
+
+    parser = argparse.ArgumentParser(description="Export tables from Postgres into an embedded database")
+    parser.add_argument("--backend", default="duckdb", choices=EMBEDDED_BACKENDS)
+    parser.add_argument("--path", required=True, help="Embedded database file")
+    parser.add_argument("--tables", nargs="*", help="Model names e.g. ScripHist LogStore; Defaults to all")
+    parser.add_argument("--scrips", nargs="*", help="Restrict to these scrips (tables having a scrip column)")
+    args = parser.parse_args()
+
+    src = DatabaseEngine(db_config={"backend": POSTGRES_BACKEND})
+    tgt = DatabaseEngine(db_config={"backend": args.backend, "path": args.path})
+    print(sync_tables(src, tgt, tables=args.tables, scrips=args.scrips))
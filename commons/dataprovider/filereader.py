@@ -1,55 +1,230 @@
 import fnmatch
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
-import os
 
 from commons.config.reader import cfg as config
+from commons.consts.consts import Interval
+from commons.dataprovider.TvDataset import TvDataset
+from commons.utils.Misc import get_date_epoch
 
+logger = logging.getLogger(__name__)
 
-def _file_combiner(data_dir_path: [str], scrip_name: str = None):
-    csv_files = []
+MANIFEST_FILE_NAME = '.manifest.json'
+FILE_PATTERNS = ['*.csv', '*.parquet']
+MAX_WORKERS = config.get('max-workers', 5)
+# Combined DFs kept; 0 disables the cache
+CACHE_SIZE = config.get('filereader-cache-size', 32)
+
+# (data dirs, scrip) -> (files signature, combined DF), least recently used first
+_combined_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _parse_file_name(file_name: str):
+    """
+    TradingView archives are named "{scrip}, {freq}.csv" (or .parquet)
+    :return: scrip, freq
+    """
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    if "," not in name:
+        return None, None
+    scrip, freq = name.split(",", 1)
+    return scrip, freq.strip()
+
+
+def _scan_dir(path: str) -> dict:
+    dirs = {}
+    files = {}
+    for root, _, file_names in os.walk(path):
+        dirs[root] = os.stat(root).st_mtime_ns
+        for pattern in FILE_PATTERNS:
+            for file_name in fnmatch.filter(file_names, pattern):
+                scrip, freq = _parse_file_name(file_name)
+                files[os.path.join(root, file_name)] = {"scrip": scrip, "freq": freq}
+    return {"dirs": dirs, "files": files}
+
+
+def _is_stale(manifest: dict) -> bool:
+    for directory, mtime in manifest.get("dirs", {}).items():
+        try:
+            if os.stat(directory).st_mtime_ns != mtime:
+                return True
+        except FileNotFoundError:
+            return True
+    return len(manifest.get("dirs", {})) == 0
+
+
+def _get_manifest(path: str) -> dict:
+    """
+    Files per scrip & timeframe of a data dir; persisted in the dir and re-scanned only when a directory changes
+    """
+    manifest_file = os.path.join(path, MANIFEST_FILE_NAME)
+    try:
+        with open(manifest_file, 'r') as file:
+            manifest = json.load(file)
+        if not _is_stale(manifest):
+            return manifest
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError:
+        logger.warning(f"Corrupt manifest for {path}; re-scanning")
+
+    try:
+        # Created ahead of the scan & then only rewritten in place, so that it never changes the dir mtime itself
+        open(manifest_file, 'a').close()
+    except OSError:
+        pass
+    manifest = _scan_dir(path)
+    try:
+        with open(manifest_file, 'w') as file:
+            json.dump(manifest, file)
+    except OSError as ex:
+        logger.warning(f"Unable to save manifest for {path}: {ex}")
+    return manifest
+
+
+def _get_files(data_dir_path: [str], scrip_name: str = None) -> list[str]:
+    files = []
     for path in data_dir_path:
-        for root, dirs, files in os.walk(path):
-            for filename in fnmatch.filter(files, '*.csv'):
-                csv_files.append(os.path.join(root, filename))
+        for file, entry in _get_manifest(path)["files"].items():
+            if scrip_name is None or entry["scrip"] == scrip_name:
+                files.append(file)
+    return files
+
+
+def _read_file(file: str) -> pd.DataFrame:
+    if file.endswith('.parquet'):
+        return pd.read_parquet(file)
+    return pd.read_csv(file, engine='pyarrow')
 
-    if scrip_name is not None:
-        csv_files = list(filter(lambda file: scrip_name + "," in file, csv_files))
-    if len(csv_files) == 0:
+
+def _file_combiner(data_dir_path: [str], scrip_name: str = None):
+    """
+    Combines all CSV / Parquet files (of the scrip) across the dirs; on overlapping time the oldest (by ctime) file
+    wins.
+    Files are read in parallel & the result is cached (LRU of CACHE_SIZE) till any of the files changes.
+    """
+    files = _get_files(data_dir_path, scrip_name)
+    if len(files) == 0:
         return None
-    csv_files.sort(key=os.path.getctime)
-    result = pd.DataFrame()
-
-    for file in csv_files:
-        if len(result) == 0:
-            result = pd.read_csv(file)
-        else:
-            curr_df = pd.read_csv(file)
-            columns_to_merge = list(result.columns.intersection(curr_df.columns))
-            result = pd.merge(result, curr_df, on='time', how='outer', suffixes=('_1', '_2'))
-            filtered_column_list = [col for col in columns_to_merge if col != "time"]
-
-            for col in filtered_column_list:
-                result[col] = result[col + '_1'].fillna(result[col + '_2'])
-                result.drop(col + '_1', axis=1, inplace=True)
-                result.drop(col + '_2', axis=1, inplace=True)
+
+    key = (tuple(data_dir_path), scrip_name)
+    signature = []
+    for file in files:
+        stat = os.stat(file)
+        signature.append((stat.st_ctime, file, stat.st_mtime_ns, stat.st_size))
+    signature.sort()
+    with _cache_lock:
+        cached = _combined_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            _combined_cache.move_to_end(key)
+            return cached[1].copy()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        frames = list(executor.map(_read_file, [entry[1] for entry in signature]))
+    result = pd.concat(frames, ignore_index=True)
+    if len(frames) > 1:
+        result = result.drop_duplicates(subset='time', keep='first')
+        result = result.sort_values(by='time', ignore_index=True)
+    if CACHE_SIZE > 0:
+        with _cache_lock:
+            _combined_cache[key] = (signature, result)
+            _combined_cache.move_to_end(key)
+            while len(_combined_cache) > CACHE_SIZE:
+                _combined_cache.popitem(last=False)
+        return result.copy()
     return result
 
 
-def get_base_data(scrip_name: str = None):
+def _get_dataset():
+    """
+    :return: TvDataset when tv-dataset-path is configured, else None i.e. read the CSV archive
+    """
+    if config.get('tv-dataset-path') is None:
+        return None
+    return TvDataset(config['tv-dataset-path'])
+
+
+def _filter_dates(df: pd.DataFrame, from_date: str = None, to_date: str = None):
+    if df is None:
+        return None
+    if from_date is not None:
+        df = df.loc[df.time >= get_date_epoch(from_date)]
+    if to_date is not None:
+        df = df.loc[df.time < get_date_epoch(to_date)]
+    return df.reset_index(drop=True)
+
+
+def _get_data(data_dir_path: [str], interval: Interval, scrip_name: str = None, from_date: str = None,
+              to_date: str = None):
+    dataset = _get_dataset()
+    if dataset is not None:
+        return dataset.read(scrip_name, interval, from_date=from_date, to_date=to_date)
+    return _filter_dates(_file_combiner(data_dir_path, scrip_name), from_date, to_date)
+
+
+def get_base_data(scrip_name: str = None, from_date: str = None, to_date: str = None):
+    """
+    :param from_date: Inclusive
+    :param to_date: Exclusive
+    """
     path = config['base-data-dir-path']
-    ret_df = _file_combiner(path, scrip_name)
+    ret_df = _get_data(path, Interval.in_daily, scrip_name, from_date, to_date)
     return ret_df
 
 
-def get_tick_data(scrip_name: str = None):
+def get_tick_data(scrip_name: str = None, from_date: str = None, to_date: str = None):
+    """
+    :param from_date: Inclusive
+    :param to_date: Exclusive
+    """
     path = config['low-tf-data-dir-path']
-    ret_df = _file_combiner(path, scrip_name)
+    ret_df = _get_data(path, Interval.in_1_minute, scrip_name, from_date, to_date)
     return ret_df
 
 
+def ingest_archive(dataset: TvDataset = None, data_dir_path: [str] = None):
+    """
+    Loads the "{scrip}, {freq}.csv" archive into the Parquet dataset; files of a scrip & timeframe are combined
+    with the same precedence as _file_combiner
+    :return: No. of (scrip, freq) partitions written
+    """
+    if dataset is None:
+        dataset = _get_dataset() or TvDataset()
+    if data_dir_path is None:
+        data_dir_path = config['base-data-dir-path'] + config['low-tf-data-dir-path']
+    files = {}
+    for path in data_dir_path:
+        for file, entry in _get_manifest(path)["files"].items():
+            if entry["scrip"] is not None:
+                files.setdefault((entry["scrip"], entry["freq"]), []).append(file)
+
+    count = 0
+    for (scrip, freq), scrip_files in sorted(files.items()):
+        try:
+            interval = Interval(freq)
+        except ValueError:
+            logger.warning(f"ingest_archive: Skipping {scrip} @ unknown TF: {freq}")
+            continue
+        scrip_files.sort(key=os.path.getctime)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            frames = list(executor.map(_read_file, scrip_files))
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset='time', keep='first')
+        dataset.append(scrip, interval, df, replace=True)
+        count += 1
+        logger.info(f"ingest_archive: {scrip} @ TF: {freq} {len(df)} bars from {len(scrip_files)} files")
+    return count
+
+
 # Example usage:
 if __name__ == '__main__':
+    # print(ingest_archive())
     print(get_base_data('NSE_RELIANCE'))
     tick_df = get_tick_data('NSE_RELIANCE')
     tick_df.to_clipboard()
@@ -1,21 +1,74 @@
+import copy
 import json
 import logging
+import os
 import random
-import re
 import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple, Callable
 
 import pandas as pd
 import requests
-from websocket import create_connection
+from websocket import create_connection, WebSocketTimeoutException
 
 from commons.config.reader import cfg
 from commons.consts.consts import Interval
+from commons.dataprovider.TvDataset import TvDataset
+from commons.dataprovider.tvprotocol import create_message, is_heartbeat, prepend_header, decode, FrameParser, \
+    SeriesColumns
+from commons.utils.Misc import DAY_SECONDS, BOD_SECONDS, EOD_SECONDS
 
 logger = logging.getLogger(__name__)
 
 base_path = cfg['base-data-dir-path']
 tick_path = cfg['low-tf-data-dir-path']
 
+# "wss://data.tradingview.com/socket.io/websocket",
+# "wss://prodata.tradingview.com/socket.io/websocket?from=chart%2FoX5LrQtf%2F&date=2023_07_25-17_28&type=chart",
+WS_URL = "wss://prodata.tradingview.com/socket.io/websocket"
+# Series requested concurrently over the one chart session
+MAX_SERIES = 10
+INTERVAL_SECONDS = {"1": 60, "3": 180, "5": 300, "15": 900, "30": 1800, "45": 2700, "1H": 3600, "2H": 7200,
+                    "3H": 10800, "4H": 14400, "1D": 86400, "1W": 604800, "1M": 2678400}
+SESSION_SECONDS = EOD_SECONDS - BOD_SECONDS
+QUOTE_FIELDS = ["ch", "chp", "current_session", "description", "local_description", "language", "exchange",
+                "fractional", "is_tradable", "lp", "lp_time", "minmov", "minmove2", "original_name", "pricescale",
+                "pro_name", "short_name", "type", "update_mode", "volume", "currency_code", "rchp", "rtc"]
+
+
+def get_gap_bars(last_time: int, freq: Interval, now: float = None) -> int:
+    """
+    Bars needed to cover the period after last_time; intraday ones are capped at a session per calendar day
+    """
+    now = time.time() if now is None else now
+    seconds = INTERVAL_SECONDS[freq.value]
+    gap = max(0, int(now) - last_time)
+    bars = -(-gap // seconds)
+    if seconds < DAY_SECONDS:
+        bars = min(bars, (gap // DAY_SECONDS + 1) * -(-SESSION_SECONDS // seconds))
+    return bars
+
+
+def _get_csv_last_time(file: str):
+    if not os.path.exists(file):
+        return None
+    times = pd.read_csv(file, usecols=["time"], engine="pyarrow").time
+    return None if len(times) == 0 else int(times.max())
+
+
+def _merge_csv(file: str, data: pd.DataFrame):
+    """
+    Merges the bars into the CSV (new bars win on the same time) & replaces it atomically
+    """
+    if os.path.exists(file):
+        data = pd.concat([pd.read_csv(file, engine="pyarrow"), data], ignore_index=True)
+    data = data.drop_duplicates(subset="time", keep="last").sort_values(by="time")
+    tmp_file = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    data.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, file)
+
 
 class TvDatafeed:
     __sign_in_url = 'https://www.tradingview.com/accounts/signin/'
@@ -28,15 +81,31 @@ class TvDatafeed:
             self,
             username: str = None,
             password: str = None,
+            dataset: TvDataset = None,
+            ws_url: str = WS_URL,
     ) -> None:
         """Create TvDatafeed object
 
         Args:
             username (str, optional): tradingview username. Defaults to None.
             password (str, optional): tradingview password. Defaults to None.
+            dataset (TvDataset, optional): get_tv_data appends here instead of writing CSVs.
+                Defaults to tv-dataset-path if configured.
+            ws_url (str, optional): data websocket e.g. a local tvreplay server. Defaults to WS_URL.
         """
 
         self.ws_debug = False
+        self.ws_url = ws_url
+        self.ws = None
+        self.__parser = FrameParser()
+        self.session = None
+        self.chart_session = None
+        self.__series_seq = 0
+        self.errors = {}
+
+        if dataset is None and cfg.get('tv-dataset-path') is not None:
+            dataset = TvDataset(cfg['tv-dataset-path'])
+        self.dataset = dataset
 
         self.token = self.__auth(username, password)
 
@@ -46,10 +115,6 @@ class TvDatafeed:
                 "you are using nologin method, data you access may be limited"
             )
 
-        # self.ws = self.__create_connection()
-        # self.session = self.__generate_session()
-        # self.chart_session = self.__generate_chart_session()
-
     def __auth(self, username, password):
 
         if username is None or password is None:
@@ -71,22 +136,32 @@ class TvDatafeed:
 
     def __create_connection(self):
         logging.debug("creating websocket connection")
-        return create_connection(
-            # "wss://data.tradingview.com/socket.io/websocket",
-            "wss://prodata.tradingview.com/socket.io/websocket",
-            # "wss://prodata.tradingview.com/socket.io/websocket?from=chart%2FoX5LrQtf%2F&date=2023_07_25-17_28&type=chart",
-            headers=self.__ws_headers, timeout=self.__ws_timeout
-        )
+        return create_connection(self.ws_url, headers=self.__ws_headers, timeout=self.__ws_timeout)
 
-    @staticmethod
-    def __filter_raw_message(text):
-        try:
-            found = re.search('"m":"(.+?)",', text).group(1)
-            found2 = re.search('"p":(.+?"}"])}', text).group(1)
+    def __connect(self):
+        """
+        Opens the socket & sets up the auth, chart & quote sessions once; reused by all later downloads
+        """
+        if self.ws is not None and self.ws.connected:
+            return
+        self.ws = self.__create_connection()
+        self.__parser = FrameParser()
+        self.session = self.__generate_session()
+        self.chart_session = self.__generate_chart_session()
 
-            return found, found2
-        except AttributeError:
-            logger.error("error in filter_raw_message")
+        self.__send_message("set_auth_token", [self.token])
+        self.__send_message("chart_create_session", [self.chart_session, ""])
+        self.__send_message("quote_create_session", [self.session])
+        self.__send_message("quote_set_fields", [self.session] + QUOTE_FIELDS)
+        self.__send_message("switch_timezone", [self.chart_session, "exchange"])
+
+    def close(self):
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception as e:
+                logger.debug(e)
+        self.ws = None
 
     @staticmethod
     def __generate_session():
@@ -104,64 +179,40 @@ class TvDatafeed:
                                 for i in range(string_length))
         return "cs_" + random_string
 
-    @staticmethod
-    def __prepend_header(st):
-        return "~m~" + str(len(st)) + "~m~" + st
-
-    @staticmethod
-    def __construct_message(func, param_list):
-        return json.dumps({"m": func, "p": param_list}, separators=(",", ":"))
-
-    def __create_message(self, func, paramList):
-        return self.__prepend_header(self.__construct_message(func, paramList))
-
     def __send_message(self, func, args):
-        m = self.__create_message(func, args)
+        m = create_message(func, args)
         if self.ws_debug:
             print(m)
         self.ws.send(m)
 
+    def __recv_messages(self):
+        """
+        :return: Decoded messages of the next websocket message; heartbeats are echoed back
+        """
+        result = self.ws.recv()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Recv: {len(result)} chars")
+        messages = []
+        for payload in self.__parser.feed(result):
+            if is_heartbeat(payload):
+                self.ws.send(prepend_header(payload))
+                continue
+            message = decode(payload)
+            if message is not None:
+                messages.append(message)
+        return messages
+
     @staticmethod
-    def __create_df(raw_data, symbol):
-        try:
-            out = re.search('"s":\[(.+?)\}\]', raw_data).group(1)
-            x = out.split(',{"')
-            data = list()
-            volume_data = True
-
-            for xi in x:
-                xi = re.split("\[|:|,|\]", xi)
-                # ts = datetime.datetime.fromtimestamp(float(xi[4]))
-
-                # row = [ts]
-                row = [int(float(xi[4]))]  # Storing as ts like rest of ecosystem.
-
-                for i in range(5, 10):
-
-                    # skip converting volume data if does not exists
-                    if not volume_data and i == 9:
-                        row.append(0.0)
-                        continue
-                    try:
-                        row.append(float(xi[i]))
-
-                    except ValueError:
-                        volume_data = False
-                        row.append(0.0)
-                        logger.debug('no volume data')
-
-                data.append(row)
-
-            data = pd.DataFrame(
-                data, columns=["time", "open",
-                               "high", "low", "close", "volume"]
-            ).set_index("time")
-            data.insert(0, "symbol", value=symbol)
-            return data
-        except AttributeError:
-            logger.error("no data, please check the exchange and symbol")
+    def __create_df(columns: SeriesColumns, symbol):
+        if len(columns) == 0:
+            logger.error(f"no data for {symbol}, please check the exchange and symbol")
             return pd.DataFrame()
 
+        # Storing time as ts like rest of ecosystem
+        data = columns.to_df().set_index("time")
+        data.insert(0, "symbol", value=symbol)
+        return data
+
     @staticmethod
     def __format_symbol(symbol, exchange, contract: int = None):
 
@@ -178,6 +229,137 @@ class TvDatafeed:
 
         return symbol
 
+    def __get_series(self, symbols: list[str], interval: str, n_bars: int, extended_session: bool,
+                     timeout: float = None):
+        """
+        Requests one series per symbol over the shared chart session & routes the frames by series id
+        :param symbols: Formatted symbols i.e. EXCHANGE:SYMBOL
+        :param timeout: Seconds for all the series to complete; incomplete ones are dropped
+        :return: list of DF & list of error (None if completed) in the order of symbols
+        """
+        self.__connect()
+        series = {}
+        symbol_series = {}
+        for symbol in symbols:
+            self.__series_seq += 1
+            series_id = f"s{self.__series_seq}"
+            symbol_id = f"symbol_{self.__series_seq}"
+            series[series_id] = SeriesColumns(n_bars)
+            symbol_series[symbol_id] = series_id
+
+            self.__send_message(
+                "quote_add_symbols", [self.session, symbol, {"flags": ["force_permission"]}]
+            )
+            self.__send_message(
+                "resolve_symbol",
+                [
+                    self.chart_session,
+                    symbol_id,
+                    '={"symbol":"'
+                    + symbol
+                    + '","adjustment":"splits","session":'
+                    + ('"regular"' if not extended_session else '"extended"')
+                    + "}",
+                ],
+            )
+            self.__send_message(
+                "create_series",
+                [self.chart_session, series_id, series_id, symbol_id, interval, n_bars],
+            )
+
+        logger.debug(f"getting data for {symbols}...")
+        deadline = None if timeout is None else time.time() + timeout
+        errors = {}
+        pending = set(series.keys())
+        while len(pending) > 0:
+            try:
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"series not completed in {timeout}s")
+                    self.ws.settimeout(min(remaining, self.__ws_timeout))
+                messages = self.__recv_messages()
+            except (TimeoutError, WebSocketTimeoutException) as e:
+                logger.error(e)
+                for series_id in pending:
+                    errors[series_id] = str(e)
+                    self.__send_message("remove_series", [self.chart_session, series_id])
+                break
+            except Exception as e:
+                logger.error(e)
+                errors.update({series_id: str(e) for series_id in pending})
+                self.close()
+                break
+
+            for message in messages:
+                func, params = message["m"], message.get("p", [])
+                if func in ("timescale_update", "du"):
+                    for series_id, data in params[1].items():
+                        if series_id in pending:
+                            series[series_id].add(data.get("s", []))
+                elif func in ("series_completed", "series_error", "symbol_error"):
+                    series_id = symbol_series.get(params[1], params[1])
+                    if series_id in pending:
+                        if func != "series_completed":
+                            logger.error(f"{func}: {params}")
+                            errors[series_id] = f"{func}: {params[2:]}"
+                        pending.discard(series_id)
+                        self.__send_message("remove_series", [self.chart_session, series_id])
+                elif func in ("critical_error", "protocol_error"):
+                    logger.error(f"{func}: {params}")
+                    errors.update({series_id: f"{func}: {params}" for series_id in pending})
+                    self.close()
+                    pending.clear()
+
+        if self.ws is not None:
+            self.ws.settimeout(self.__ws_timeout)
+        return ([self.__create_df(columns, symbol) for symbol, columns in zip(symbols, series.values())],
+                [errors.get(series_id) for series_id in series.keys()])
+
+    def get_hists(
+            self,
+            symbols: list[str],
+            exchange: str = "NSE",
+            interval: Interval = Interval.in_daily,
+            n_bars: int = 10,
+            fut_contract: int = None,
+            extended_session: bool = False,
+            timeout: float = None,
+    ) -> dict[str, pd.DataFrame]:
+        """get historical data of several symbols over one connection
+
+        Args:
+            symbols (list[str]): symbol names, EXCHANGE:SYMBOL or SYMBOL of exchange
+            timeout (float, optional): seconds for each batch of MAX_SERIES series to complete. Defaults to None.
+            others: as in get_hist; up to MAX_SERIES series are in flight at a time
+
+        Returns:
+            dict[str, pd.Dataframe]: symbol & dataframe with sohlcv as columns; empty dataframe if failed,
+                with the reason in self.errors
+        """
+        tv_symbols = [self.__format_symbol(symbol=symbol, exchange=exchange, contract=fut_contract)
+                      for symbol in symbols]
+        result = {}
+        self.errors = {}
+        for i in range(0, len(symbols), MAX_SERIES):
+            data, errors = self.__get_series(tv_symbols[i:i + MAX_SERIES], interval.value, n_bars,
+                                             extended_session, timeout=timeout)
+            result.update(zip(symbols[i:i + MAX_SERIES], data))
+            self.errors.update({symbol: error for symbol, error in zip(symbols[i:i + MAX_SERIES], errors)
+                                if error is not None})
+        return result
+
+    def clone(self):
+        """
+        :return: Feed sharing the auth token & dataset with its own session; websockets aren't thread safe
+        """
+        feed = copy.copy(self)
+        feed.ws = None
+        feed.session = None
+        feed.chart_session = None
+        feed.errors = {}
+        return feed
+
     def get_hist(
             self,
             symbol: str,
@@ -200,95 +382,8 @@ class TvDatafeed:
         Returns:
             pd.Dataframe: dataframe with sohlcv as columns
         """
-        symbol = self.__format_symbol(
-            symbol=symbol, exchange=exchange, contract=fut_contract
-        )
-
-        interval = interval.value
-
-        self.ws = self.__create_connection()
-        self.session = self.__generate_session()
-        self.chart_session = self.__generate_chart_session()
-
-        self.__send_message("set_auth_token", [self.token])
-        self.__send_message("chart_create_session", [self.chart_session, ""])
-        self.__send_message("quote_create_session", [self.session])
-        self.__send_message(
-            "quote_set_fields",
-            [
-                self.session,
-                "ch",
-                "chp",
-                "current_session",
-                "description",
-                "local_description",
-                "language",
-                "exchange",
-                "fractional",
-                "is_tradable",
-                "lp",
-                "lp_time",
-                "minmov",
-                "minmove2",
-                "original_name",
-                "pricescale",
-                "pro_name",
-                "short_name",
-                "type",
-                "update_mode",
-                "volume",
-                "currency_code",
-                "rchp",
-                "rtc",
-            ],
-        )
-
-        self.__send_message(
-            "quote_add_symbols", [self.session, symbol,
-                                  {"flags": ["force_permission"]}]
-        )
-        self.__send_message("quote_fast_symbols", [self.session, symbol])
-
-        self.__send_message(
-            "resolve_symbol",
-            [
-                self.chart_session,
-                "symbol_1",
-                '={"symbol":"'
-                + symbol
-                + '","adjustment":"splits","session":'
-                + ('"regular"' if not extended_session else '"extended"')
-                + "}",
-            ],
-        )
-        self.__send_message(
-            "create_series",
-            [self.chart_session, "s1", "s1", "symbol_1", interval, n_bars],
-        )
-        self.__send_message("switch_timezone", [
-            self.chart_session, "exchange"])
-
-        raw_data = ""
-
-        logger.debug(f"getting data for {symbol}...")
-        while True:
-            try:
-                result = self.ws.recv()
-                logger.debug(f"Recv: {result}")
-                raw_data = raw_data + result + "\n"
-            except Exception as e:
-                logger.error(e)
-                self.ws = self.__create_connection()
-                break
-
-            if "series_completed" in result:
-                break
-
-        # Added following 2 lines to enable next retrieval
-        # self.session = self.__generate_session()
-        # self.chart_session = self.__generate_chart_session()
-
-        return self.__create_df(raw_data, symbol)
+        return self.get_hists([symbol], exchange=exchange, interval=interval, n_bars=n_bars,
+                              fut_contract=fut_contract, extended_session=extended_session)[symbol]
 
     def search_symbol(self, text: str, exchange: str = ''):
         url = self.__search_url.format(text, exchange)
@@ -306,51 +401,172 @@ class TvDatafeed:
 
     def get_tv_data(self, symbols: list[str], start: int = 10000, freq: Interval = Interval.in_daily,
                     path: [str] = base_path):
+        """
+        :return: dict of symbol & reason for the symbols that could not be downloaded
+        """
+        def save(symbol: str, data: pd.DataFrame):
+            if self.dataset is not None:
+                self.dataset.append(symbol, freq, data)
+            else:
+                data.to_csv(f"{path[0]}{symbol}, {freq.value}.csv", index=False)
+
+        return TvDownloader(self).download(symbols, n_bars=start, freq=freq, callback=save).failed
+
+    def sync_tv_data(self, symbols: list[str], freq: Interval = Interval.in_daily, max_bars: int = 10000,
+                     overlap: int = None, path: [str] = base_path):
+        """
+        Downloads only the bars after the last stored one, plus overlap bars, & merges them into the dataset or CSV.
+        Symbols not stored yet get max_bars.
+        :return: dict of symbol & reason for the symbols that could not be downloaded
+        """
+        if overlap is None:
+            overlap = cfg.get('tv-download', {}).get('sync-overlap', 5)
+        now = time.time()
+        groups = {}
         for symbol in symbols:
-            print(f"Downloading: {symbol}; TF: {freq}")
-            data = pd.DataFrame()
-            loop_cnt = 0
-            while len(data) == 0:
-                data = self.get_hist(
-                    "_".join(symbol.split("_")[1:]),
-                    symbol.split("_")[0],
-                    interval=freq,
-                    n_bars=start,
-                    extended_session=False,
-                )
-                loop_cnt += 1
-                assert loop_cnt < 10, f"Unable to download data for {symbol}; TF: {freq} after 10 retries!"
-
-            data.reset_index(inplace=True)
-            data = data[["time", "open", "high", "low", "close"]]
-
-            data = data.reindex(columns=["time", "open", "high", "low", "close"])
-            data.to_csv(f"{path[0]}{symbol}, {freq.value}.csv", index=False)
+            if self.dataset is not None:
+                last_time = self.dataset.get_last_time(symbol, freq)
+            else:
+                last_time = _get_csv_last_time(f"{path[0]}{symbol}, {freq.value}.csv")
+            if last_time is None:
+                n_bars = max_bars
+            else:
+                # Rounded up to a power of 2, so that symbols with similar gaps share the batches
+                n_bars = min(max_bars, 1 << (get_gap_bars(last_time, freq, now) + overlap - 1).bit_length())
+            groups.setdefault(n_bars, []).append(symbol)
+
+        def save(symbol: str, data: pd.DataFrame):
+            if self.dataset is not None:
+                self.dataset.append(symbol, freq, data)
+            else:
+                _merge_csv(f"{path[0]}{symbol}, {freq.value}.csv", data)
+
+        failed = {}
+        for n_bars, group in sorted(groups.items()):
+            logger.info(f"sync_tv_data: {len(group)} symbols; TF: {freq} with {n_bars} bars")
+            failed.update(TvDownloader(self).download(group, n_bars=n_bars, freq=freq, callback=save).failed)
+        return failed
 
     def retrieve_tv_data(self, symbols: list[str], start: int = 10000,
                          freq: Interval = Interval.in_daily):
-        result = {}
-        for symbol in symbols:
-            logger.info(f"Downloading: {symbol}; TF: {freq}")
-            data = pd.DataFrame()
-            loop_cnt = 0
-            while len(data) == 0:
-                data = self.get_hist(
-                    "_".join(symbol.split("_")[1:]),
-                    symbol.split("_")[0],
-                    interval=freq,
-                    n_bars=start,
-                    extended_session=False,
-                )
-                loop_cnt += 1
-                assert loop_cnt < 10, f"Unable to download data for {symbol}; TF: {freq} after 10 retries!"
-
-            data.reset_index(inplace=True)
-            data = data[["time", "open", "high", "low", "close"]]
-
-            data = data.reindex(columns=["time", "open", "high", "low", "close"])
-            result[symbol] = data
+        return TvDownloader(self).download(symbols, n_bars=start, freq=freq).data
+
+
+class DownloadResult(NamedTuple):
+    data: dict[str, pd.DataFrame]
+    failed: dict[str, str]  # Symbol & reason of the last attempt
+
+
+class TvDownloader:
+    """
+    Downloads "EXCHANGE_SYMBOL" symbols over up to `workers` concurrent sessions, each multiplexing a batch of
+    MAX_SERIES series. Failed symbols are retried with exponential backoff & jitter and reported, not raised.
+    """
+    feed: TvDatafeed
+    workers: int
+    retries: int
+    backoff: float
+    max_backoff: float
+    timeout: float
+
+    def __init__(self, feed: TvDatafeed, workers: int = None, retries: int = None, backoff: float = None,
+                 max_backoff: float = None, timeout: float = None):
+        """
+        :param feed: Template for the per thread feeds; see TvDatafeed.clone
+        :param timeout: Seconds for a batch of series to complete
+        Defaults are from the tv-download config
+        """
+        conf = cfg.get('tv-download', {})
+        self.feed = feed
+        self.workers = workers if workers is not None else conf.get('workers', 4)
+        self.retries = retries if retries is not None else conf.get('retries', 5)
+        self.backoff = backoff if backoff is not None else conf.get('backoff', 1.0)
+        self.max_backoff = max_backoff if max_backoff is not None else conf.get('max-backoff', 30.0)
+        self.timeout = timeout if timeout is not None else conf.get('timeout', 120.0)
+        self.__local = threading.local()
+        self.__feeds = []
+        self.__lock = threading.Lock()
 
+    @staticmethod
+    def tv_symbol(symbol: str):
+        """
+        NSE_BANDHANBNK -> NSE:BANDHANBNK
+        """
+        return symbol.replace("_", ":", 1)
+
+    def __get_feed(self) -> TvDatafeed:
+        feed = getattr(self.__local, 'feed', None)
+        if feed is None:
+            feed = self.feed.clone()
+            self.__local.feed = feed
+            with self.__lock:
+                self.__feeds.append(feed)
+        return feed
+
+    def get_delay(self, attempt: int):
+        """
+        Exponential backoff with equal jitter i.e. uniform in [delay / 2, delay]
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def __fetch(self, symbols: list[str], n_bars: int, freq: Interval):
+        feed = self.__get_feed()
+        data = {}
+        failed = {}
+        pending = list(symbols)
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                delay = self.get_delay(attempt)
+                logger.warning(f"Retry #{attempt} of {pending}; TF: {freq} in {delay:.2f}s")
+                time.sleep(delay)
+            tv_symbols = [self.tv_symbol(symbol) for symbol in pending]
+            try:
+                res = feed.get_hists(tv_symbols, interval=freq, n_bars=n_bars, timeout=self.timeout)
+                errors = feed.errors
+            except Exception as e:
+                logger.error(f"Download of {pending} failed: {e}")
+                feed.close()
+                res = {}
+                errors = {tv_symbol: str(e) for tv_symbol in tv_symbols}
+
+            failed = {}
+            for symbol, tv_symbol in zip(pending, tv_symbols):
+                df = res.get(tv_symbol)
+                if df is not None and len(df) > 0:
+                    data[symbol] = df.reset_index().reindex(columns=["time", "open", "high", "low", "close"])
+                else:
+                    failed[symbol] = errors.get(tv_symbol) or "no data"
+            pending = list(failed.keys())
+            if len(pending) == 0:
+                break
+        return data, failed
+
+    def download(self, symbols: list[str], n_bars: int = 10000, freq: Interval = Interval.in_daily,
+                 callback: Callable[[str, pd.DataFrame], None] = None) -> DownloadResult:
+        """
+        :param callback: Called on the calling thread with (symbol, DF) as each batch completes
+        """
+        result = DownloadResult({}, {})
+        batches = [symbols[i:i + MAX_SERIES] for i in range(0, len(symbols), MAX_SERIES)]
+        logger.info(f"Downloading: {len(symbols)} symbols; TF: {freq} in {len(batches)} batches")
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.__fetch, batch, n_bars, freq) for batch in batches]
+                for future in as_completed(futures):
+                    data, failed = future.result()
+                    result.failed.update(failed)
+                    for symbol, df in data.items():
+                        result.data[symbol] = df
+                        if callback is not None:
+                            callback(symbol, df)
+        finally:
+            for feed in self.__feeds:
+                feed.close()
+
+        if len(result.failed) > 0:
+            logger.error(f"Unable to download TF: {freq} for {result.failed}")
+        logger.info(f"Downloaded: {len(result.data)} of {len(symbols)} symbols; TF: {freq}")
         return result
 
 
@@ -0,0 +1,139 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+FRAME_MARKER = "~m~"
+HEARTBEAT_MARKER = "~h~"
+MESSAGE_PREFIX = '{"m":"'
+BAR_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+# Messages needed for series downloads; the rest e.g. quote updates are skipped without decoding
+SERIES_FUNCS = {"timescale_update", "du", "series_completed", "series_error", "symbol_error", "critical_error",
+                "protocol_error"}
+
+
+def prepend_header(st: str) -> str:
+    return FRAME_MARKER + str(len(st)) + FRAME_MARKER + st
+
+
+def construct_message(func: str, param_list: list) -> str:
+    return json.dumps({"m": func, "p": param_list}, separators=(",", ":"))
+
+
+def create_message(func: str, param_list: list) -> str:
+    return prepend_header(construct_message(func, param_list))
+
+
+class FrameParser:
+    """
+    Incremental "~m~<len>~m~<payload>" splitter; only an incomplete trailing frame is carried over to the next feed
+    """
+
+    def __init__(self):
+        self.__pending = ""
+
+    def feed(self, text: str) -> list[str]:
+        """
+        :return: Complete payloads, heartbeats included as "~h~<n>"
+        """
+        buffer = self.__pending + text if self.__pending else text
+        frames = []
+        pos = 0
+        while buffer.startswith(FRAME_MARKER, pos):
+            len_end = buffer.find(FRAME_MARKER, pos + len(FRAME_MARKER))
+            if len_end < 0:
+                break
+            start = len_end + len(FRAME_MARKER)
+            end = start + int(buffer[pos + len(FRAME_MARKER):len_end])
+            if end > len(buffer):
+                break
+            frames.append(buffer[start:end])
+            pos = end
+        self.__pending = buffer[pos:]
+        return frames
+
+
+def split_frames(text: str) -> list[str]:
+    return FrameParser().feed(text)
+
+
+def is_heartbeat(payload: str) -> bool:
+    return payload.startswith(HEARTBEAT_MARKER)
+
+
+def decode(payload: str, funcs: set = None):
+    """
+    :param funcs: Message names to decode, defaults to SERIES_FUNCS
+    :return: Decoded message or None if it is not one of funcs
+    """
+    if funcs is None:
+        funcs = SERIES_FUNCS
+    if payload.startswith(MESSAGE_PREFIX):
+        func_end = payload.find('"', len(MESSAGE_PREFIX))
+        if payload[len(MESSAGE_PREFIX):func_end] not in funcs:
+            return None
+    message = json_loads(payload)
+    if not isinstance(message, dict) or message.get("m") not in funcs:
+        return None
+    return message
+
+
+class SeriesColumns:
+    """
+    Preallocated bar columns of a series. Bars are placed by their index "i", so re-sent bars overwrite in place
+    """
+    time: np.ndarray
+    values: np.ndarray  # open, high, low, close, volume
+    size: int
+
+    def __init__(self, capacity: int):
+        capacity = max(capacity, 1)
+        self.time = np.full(capacity, -1, dtype=np.int64)
+        self.values = np.zeros((capacity, len(BAR_COLUMNS) - 1), dtype=np.float64)
+        self.size = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.time[:self.size] >= 0))
+
+    def __grow(self, capacity: int):
+        time = np.full(capacity, -1, dtype=np.int64)
+        time[:len(self.time)] = self.time
+        values = np.zeros((capacity, self.values.shape[1]), dtype=np.float64)
+        values[:len(self.values)] = self.values
+        self.time, self.values = time, values
+
+    def add(self, bars: list[dict]):
+        """
+        :param bars: "s" entries of timescale_update / du i.e. {"i": index, "v": [time, o, h, l, c, v]}
+        """
+        if len(bars) == 0:
+            return
+        index = np.fromiter((bar["i"] for bar in bars), dtype=np.int64, count=len(bars))
+        rows = [bar["v"] for bar in bars]
+        try:
+            data = np.array(rows, dtype=np.float64).reshape(len(rows), len(BAR_COLUMNS))
+        except ValueError:
+            # Volume is missing for some symbols
+            data = np.array([row[:len(BAR_COLUMNS)] + [0.0] * (len(BAR_COLUMNS) - len(row)) for row in rows],
+                            dtype=np.float64)
+
+        last = int(index.max()) + 1
+        if last > len(self.time):
+            self.__grow(max(last, 2 * len(self.time)))
+        self.time[index] = data[:, 0]
+        self.values[index] = data[:, 1:]
+        self.size = max(self.size, last)
+
+    def to_df(self) -> pd.DataFrame:
+        filled = self.time[:self.size] >= 0
+        data = pd.DataFrame(self.values[:self.size][filled], columns=BAR_COLUMNS[1:])
+        data.insert(0, "time", self.time[:self.size][filled])
+        data["volume"] = data["volume"].fillna(0.0)
+        return data
@@ -0,0 +1,277 @@
+import argparse
+import base64
+import hashlib
+import logging
+import socketserver
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from commons.consts.consts import Interval
+from commons.dataprovider.TvDataset import TvDataset
+from commons.dataprovider.tvfeed import INTERVAL_SECONDS, TvDatafeed, TvDownloader
+from commons.dataprovider.tvprotocol import FrameParser, create_message, is_heartbeat, json_loads
+
+logger = logging.getLogger(__name__)
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class ReplayConnection(socketserver.BaseRequestHandler):
+    """
+    One client websocket (RFC 6455, text frames only) speaking the ~m~ framing. Each create_series is answered on
+    its own thread after the server latency, so that series multiplexed on a session overlap like the real feed.
+    """
+    server: "TvReplayServer"
+
+    def setup(self):
+        self.send_lock = threading.Lock()
+        self.symbols = {}
+        self.closed = False
+
+    def handle(self):
+        if not self.__handshake():
+            return
+        parser = FrameParser()
+        while not self.closed:
+            message = self.__recv_message()
+            if message is None:
+                break
+            for payload in parser.feed(message):
+                if not is_heartbeat(payload):
+                    self.__on_message(json_loads(payload))
+
+    def __recv_exact(self, size: int):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def __handshake(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        key = None
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            # Tolerates malformed header lines
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip()
+        if key is None:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.request.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                              f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return True
+
+    def __recv_message(self):
+        """
+        :return: Text of the next (reassembled) message or None once closed
+        """
+        fragments = []
+        while True:
+            header = self.__recv_exact(2)
+            if header is None:
+                return None
+            fin, opcode = header[0] & 0x80, header[0] & 0x0F
+            size = header[1] & 0x7F
+            if size == 126:
+                size = struct.unpack("!H", self.__recv_exact(2))[0]
+            elif size == 127:
+                size = struct.unpack("!Q", self.__recv_exact(8))[0]
+            mask = self.__recv_exact(4) if header[1] & 0x80 else None
+            payload = self.__recv_exact(size) if size > 0 else b""
+            if payload is None:
+                return None
+            if mask is not None:
+                payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+
+            if opcode == OP_CLOSE:
+                self.__send_frame(OP_CLOSE, payload[:2])
+                self.closed = True
+                return None
+            if opcode == OP_PING:
+                self.__send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            fragments.append(payload)
+            if fin:
+                return b"".join(fragments).decode("utf-8")
+
+    def __send_frame(self, opcode: int, payload: bytes):
+        size = len(payload)
+        if size < 126:
+            header = struct.pack("!BB", 0x80 | opcode, size)
+        elif size < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, size)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, size)
+        with self.send_lock:
+            try:
+                self.request.sendall(header + payload)
+            except OSError:
+                self.closed = True
+
+    def send(self, func: str, params: list):
+        self.__send_frame(OP_TEXT, create_message(func, params).encode("utf-8"))
+
+    def __on_message(self, message: dict):
+        func, params = message.get("m"), message.get("p", [])
+        if func == "resolve_symbol":
+            self.symbols[params[1]] = json_loads(params[2][1:])["symbol"]
+            self.send("symbol_resolved", [params[0], params[1], {"name": self.symbols[params[1]]}])
+        elif func == "create_series":
+            threading.Thread(target=self.__send_series, args=params[:6], daemon=True).start()
+
+    def __send_series(self, chart_session: str, series_id: str, _, symbol_id: str, interval: str, n_bars: int):
+        time.sleep(self.server.latency)
+        symbol = self.symbols.get(symbol_id)
+        bars = self.server.get_bars(symbol, interval, n_bars) if symbol is not None else None
+        if bars is None:
+            self.send("symbol_error", [chart_session, symbol_id, "invalid symbol"])
+            return
+        for start in range(0, len(bars), self.server.chunk_size):
+            chunk = [{"i": start + i, "v": v} for i, v in enumerate(bars[start:start + self.server.chunk_size])]
+            self.send("timescale_update", [chart_session, {series_id: {"s": chunk, "t": series_id}}])
+        self.send("series_completed", [chart_session, series_id, "streaming"])
+
+
+class TvReplayServer(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for the TradingView data websocket serving recorded (dataset) or synthetic bars, so that
+    TvDatafeed can be tested & benchmarked without network access:
+
+        with TvReplayServer(bars=5000, latency=0.2) as server:
+            TvDatafeed(ws_url=server.url).get_hist("RELIANCE", n_bars=5000)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, bars: int = None, latency: float = 0.0,
+                 chunk_size: int = 1000, missing: list[str] = None, dataset: TvDataset = None,
+                 end_time: int = None):
+        """
+        :param bars: Max bars served per series; defaults to the requested n_bars
+        :param latency: Seconds before a series starts streaming
+        :param chunk_size: Bars per timescale_update frame
+        :param missing: Symbols (EXCHANGE:SYMBOL) answered with symbol_error
+        :param dataset: Serves the recorded bars of EXCHANGE_SYMBOL from here, instead of synthetic ones
+        :param end_time: Time of the last synthetic bar; defaults to now
+        """
+        super().__init__((host, port), ReplayConnection)
+        self.bars = bars
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.missing = set(missing or [])
+        self.dataset = dataset
+        self.end_time = int(time.time()) if end_time is None else end_time
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}/socket.io/websocket"
+
+    def get_bars(self, symbol: str, interval: str, n_bars: int):
+        """
+        :return: list of [time, open, high, low, close, volume] or None for unknown symbols
+        """
+        if symbol in self.missing:
+            return None
+        if self.bars is not None:
+            n_bars = min(n_bars, self.bars)
+        if self.dataset is not None:
+            df = self.dataset.read(symbol.replace(":", "_", 1), Interval(interval))
+            if df is None:
+                return None
+            df = df.tail(n_bars).assign(volume=0.0)
+            return df[["time", "open", "high", "low", "close", "volume"]].astype(float).values.tolist()
+
+        # Drawn backwards from the last bar with a stream per column, so the bars don't depend on n_bars
+        seconds = INTERVAL_SECONDS[interval]
+        seed = zlib.crc32(symbol.encode())
+        steps = np.random.default_rng([seed, 0]).normal(0, 0.001, n_bars)
+        # One bar more for the open of the 1st one
+        closes = (100 * np.exp(-np.concatenate([[0], np.cumsum(steps)])))[::-1]
+        close = closes[1:]
+        spread = close * np.random.default_rng([seed, 1]).uniform(0, 0.002, n_bars)[::-1]
+        volume = np.random.default_rng([seed, 2]).integers(100, 10000, n_bars)[::-1]
+        df = pd.DataFrame({"time": self.end_time - self.end_time % seconds - seconds * np.arange(n_bars)[::-1],
+                           "open": closes[:-1], "high": close + spread,
+                           "low": close - spread, "close": close, "volume": volume})
+        df[["open", "high", "low", "close"]] = df[["open", "high", "low", "close"]].round(2)
+        return df.astype(float).values.tolist()
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        logger.info(f"TvReplayServer listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def benchmark(url: str, symbols: int, n_bars: int, freq: Interval = Interval.in_1_minute, workers: int = None):
+    """
+    Downloads the synthetic symbols SYM0..SYMn via TvDownloader & logs the timing
+    """
+    start = time.time()
+    res = TvDownloader(TvDatafeed(ws_url=url), workers=workers).download(
+        [f"NSE_SYM{i}" for i in range(symbols)], n_bars=n_bars, freq=freq)
+    elapsed = time.time() - start
+    bars = sum(len(df) for df in res.data.values())
+    logger.info(f"benchmark: {len(res.data)} symbols, {bars} bars in {elapsed:.2f}s; {len(res.failed)} failed")
+    return elapsed
+
+
+if __name__ == '__main__':
+    from commons.loggers.setup_logger import setup_logging
+
+    setup_logging("tvreplay.log")
+
+    parser = argparse.ArgumentParser(description="Local TradingView websocket replay server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--bars", type=int, help="Max bars per series")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before a series starts streaming")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Bars per timescale_update frame")
+    parser.add_argument("--dataset", help="TvDataset dir to replay recorded bars from")
+    parser.add_argument("--benchmark", type=int, help="Download this many symbols against the server & exit")
+    parser.add_argument("--n-bars", type=int, default=5000, help="Bars per symbol for --benchmark")
+    parser.add_argument("--workers", type=int, help="Concurrent sessions for --benchmark")
+    args = parser.parse_args()
+
+    replay = TvReplayServer(args.host, args.port, bars=args.bars, latency=args.latency, chunk_size=args.chunk_size,
+                            dataset=TvDataset(args.dataset) if args.dataset else None)
+    if args.benchmark:
+        with replay:
+            print(f"{benchmark(replay.url, args.benchmark, args.n_bars, workers=args.workers):.2f}s")
+    else:
+        print(f"Serving on {replay.url}")
+        try:
+            replay.serve_forever()
+        except KeyboardInterrupt:
+            replay.server_close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric
+from sqlalchemy import Column, Integer, String, Numeric, JSON
 from sqlalchemy.dialects.postgresql import JSONB
 
 from commons.dataprovider.database import Base
@@ -10,7 +10,7 @@ class LogStore(Base):
     log_id = Column(Integer, primary_key=True)
     log_key = Column(String)
     log_type = Column(String)
-    log_data = Column(JSONB)
+    log_data = Column(JSON().with_variant(JSONB, 'postgresql'))
     acct = Column(String)
     log_date = Column(String)
     log_time = Column(Integer)
\ No newline at end of file
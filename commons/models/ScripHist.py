@@ -1,21 +1,23 @@
-# models.py
+from sqlalchemy import Column, String, BigInteger, Date, Float, Index
 
-from sqlalchemy import Column, String, Integer, Numeric
-from sqlalchemy.ext.declarative import declarative_base
-
-Base = declarative_base()
+from commons.dataprovider.database import Base
 
 
 class ScripHist(Base):
+    """
+    Partitioned by time_frame & month on Postgres - see resources/database/scrip_hist_partitioned.sql
+    """
     __tablename__ = "scrip_hist"
+    __table_args__ = (
+        Index('scrip_hist_scrip_tf_time_idx', 'scrip', 'time_frame', 'time',
+              postgresql_include=['open', 'high', 'low', 'close']),
+    )
 
-    scrip = Column(String, primary_key=True, index=True)
-    time = Column(Integer, primary_key=True, index=True)
-    time_frame = Column(String, primary_key=True, index=True)
-    date = Column(String)
-    open = Column(Numeric)
-    high = Column(Numeric)
-    low = Column(Numeric)
-    close = Column(Numeric)
-    hour = Column(Integer)
-    minute = Column(Integer)
+    scrip = Column(String, primary_key=True)
+    time_frame = Column(String, primary_key=True)
+    time = Column(BigInteger, primary_key=True)
+    date = Column(Date)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
@@ -0,0 +1,268 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_all
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from commons.broker.Shoonya import Shoonya
+from commons.broker.SlModifyDispatcher import SlModifyDispatcher, ModifyResult
+from commons.config.reader import cfg
+
+logger = logging.getLogger(__name__)
+
+SL_PRICE_TYPE = 'SL-LMT'
+
+
+class SlUpdate(NamedTuple):
+    order_no: str  # SL leg
+    scrip: str
+    new_sl: float
+    ltp: float
+
+
+class LtpBuffer:
+    """
+    Latest LTPs per token in a ring buffer of depth ticks
+    """
+    tokens: dict[str, int]  # Token -> row
+
+    def __init__(self, tokens: list[str], depth: int = 64):
+        self.tokens = {str(token): row for row, token in enumerate(tokens)}
+        self.depth = depth
+        self.prices = np.full((len(self.tokens), depth), np.nan)
+        self.counts = np.zeros(len(self.tokens), dtype=np.int64)
+
+    def add(self, rows: np.ndarray, prices: np.ndarray):
+        for row, price in zip(rows, prices):
+            self.prices[row, self.counts[row] % self.depth] = price
+            self.counts[row] += 1
+
+    @property
+    def latest(self) -> np.ndarray:
+        """
+        :return: LTP by row; nan till the first tick
+        """
+        return self.prices[np.arange(len(self.counts)), (self.counts - 1) % self.depth]
+
+    def get_history(self, token: str) -> np.ndarray:
+        """
+        :return: Up to depth latest LTPs of the token, oldest first
+        """
+        row = self.tokens[str(token)]
+        count = int(self.counts[row])
+        slots = np.arange(max(0, count - self.depth), count) % self.depth
+        return self.prices[row, slots]
+
+
+class LiveRiskEngine:
+    """
+    Holds the open bracket orders as arrays & on each tick batch evaluates the trailing SL of all of them at once,
+    the same way as get_new_sl does for one order, emitting only the SL moves:
+
+        engine = LiveRiskEngine(tokens, broker=s)
+        engine.add_order({...get_new_sl order..., 'token': '2885', 'open_qty': 10})
+        s.api_start_websocket(subscribe_callback=engine.on_tick, ...)
+
+    With a broker the modifications are sent from worker threads, off the websocket thread, one at a time per order.
+    The SL of an order is saved only once its modification goes through, so a failed one is retried on a later tick.
+    """
+    ltps: LtpBuffer
+    order_nos: list[str]
+
+    def __init__(self, tokens: list[str], broker: Shoonya = None, on_sl_update: Callable[[SlUpdate], None] = None,
+                 depth: int = 64, capacity: int = 64, max_workers: int = None):
+        """
+        :param tokens: Subscribed tokens
+        :param broker: SL moves are sent with api_modify_order, unless on_sl_update is set. A SlModifyDispatcher
+        reports the outcome through its on_result.
+        :param on_sl_update: Called for every SL move, which is then saved right away
+        :param depth: LTPs kept per token
+        :param capacity: Initial no. of orders, grows as needed
+        :param max_workers: Concurrent modifications; defaults to max-workers
+        """
+        self.ltps = LtpBuffer(tokens, depth)
+        self.broker = broker if on_sl_update is None else None
+        self.on_sl_update = on_sl_update
+        self.order_nos = []
+        self.orders = {}  # SL order no -> (index, order)
+        self.__alloc(capacity)
+        self.size = 0
+        self.__lock = threading.RLock()
+        self.__executor = None
+        self.__futures = set()
+        if isinstance(self.broker, SlModifyDispatcher):
+            self.__chain_result(self.broker)
+        elif self.broker is not None:
+            self.__executor = ThreadPoolExecutor(max_workers=max_workers or cfg.get('max-workers', 5),
+                                                 thread_name_prefix="sl-trail")
+
+    def __alloc(self, capacity: int):
+        def grow(array, fill):
+            new = np.full(capacity, fill, dtype=array.dtype if array is not None else type(fill))
+            if array is not None:
+                new[:len(array)] = array
+            return new
+
+        get = self.__dict__.get
+        self.row = grow(get('row'), np.int64(0))
+        self.sl = grow(get('sl'), np.float64(np.nan))
+        self.sl_range = grow(get('sl_range'), np.float64(0))
+        self.trail_sl = grow(get('trail_sl'), np.float64(0))
+        self.tick = grow(get('tick'), np.float64(0.05))
+        self.direction = grow(get('direction'), np.int64(1))
+        self.active = grow(get('active'), np.bool_(False))
+        self.sending = grow(get('sending'), np.bool_(False))
+
+    def add_order(self, order: dict):
+        """
+        :param order: SL leg as for get_new_sl (sl_order_id, scrip, signal, sl_price, sl_range, trail_sl, tick) with
+        the token & open_qty
+        """
+        with self.__lock:
+            if self.size == len(self.sl):
+                self.__alloc(2 * len(self.sl))
+            idx = self.size
+            self.size += 1
+            self.row[idx] = self.ltps.tokens[str(order['token'])]
+            self.sl[idx] = float(order['sl_price'])
+            self.sl_range[idx] = float(order['sl_range'])
+            self.trail_sl[idx] = float(order['trail_sl'])
+            self.tick[idx] = float(order['tick'])
+            self.direction[idx] = 1 if int(order['signal']) == 1 else -1
+            self.active[idx] = True
+            self.sending[idx] = False
+            self.order_nos.append(str(order['sl_order_id']))
+            self.orders[str(order['sl_order_id'])] = (idx, order)
+
+    def remove_order(self, order_no: str):
+        """
+        Stops trailing e.g. once the SL or target is hit
+        """
+        with self.__lock:
+            idx, _ = self.orders.pop(str(order_no), (None, None))
+            if idx is not None:
+                self.active[idx] = False
+
+    def get_sl(self, order_no: str) -> float:
+        idx, _ = self.orders[str(order_no)]
+        return float(self.sl[idx])
+
+    def evaluate(self, updated: np.ndarray = None) -> list[SlUpdate]:
+        """
+        :param updated: Rows of the tokens with new LTPs; all when None
+        :return: SL moves; applied to the orders right away without a broker, else once sent
+        """
+        with self.__lock:
+            size = self.size
+            mask = self.active[:size] & ~self.sending[:size]
+            if updated is not None:
+                mask &= np.isin(self.row[:size], updated)
+            ltp = self.ltps.latest[self.row[:size]]
+            mask &= ~np.isnan(ltp)
+            mask &= np.abs(ltp - self.sl[:size]) > self.sl_range[:size] + self.trail_sl[:size]
+            idx = np.flatnonzero(mask)
+            if len(idx) == 0:
+                return []
+            tick = self.tick[idx]
+            new_sl = np.round(np.round((ltp[idx] - self.direction[idx] * self.sl_range[idx]) / tick) * tick, 2)
+            if self.broker is None:
+                self.sl[idx] = new_sl
+            else:
+                self.sending[idx] = True
+            return [SlUpdate(self.order_nos[i], self.orders[self.order_nos[i]][1]['scrip'], float(sl), float(price))
+                    for i, sl, price in zip(idx, new_sl, ltp[idx])]
+
+    def on_ticks(self, messages: list[dict]) -> list[SlUpdate]:
+        """
+        Buffers the LTPs of the websocket ticks & moves the SLs of the orders of those tokens
+        """
+        tokens = self.ltps.tokens
+        ticks = [(tokens[message['tk']], float(message['lp'])) for message in messages
+                 if 'lp' in message and message.get('tk') in tokens]
+        if len(ticks) == 0:
+            return []
+        rows, prices = np.array(ticks).T
+        rows = rows.astype(np.int64)
+        with self.__lock:
+            self.ltps.add(rows, prices)
+            updates = self.evaluate(np.unique(rows))
+        for update in updates:
+            if self.on_sl_update is not None:
+                self.on_sl_update(update)
+            elif self.__executor is not None:
+                future = self.__executor.submit(self.__modify, update)
+                self.__futures.add(future)
+                future.add_done_callback(self.__futures.discard)
+            elif self.broker is not None:
+                # SlModifyDispatcher only queues it
+                self.__modify(update)
+        return updates
+
+    def on_tick(self, message: dict) -> list[SlUpdate]:
+        """
+        subscribe_callback of the websocket
+        """
+        return self.on_ticks([message])
+
+    def __complete(self, order_no: str, new_sl: float = None):
+        """
+        Saves the SL of the sent modification, or leaves the previous one for the next tick to retry when new_sl is None
+        """
+        with self.__lock:
+            idx, _ = self.orders.get(order_no, (None, None))
+            if idx is None:
+                return
+            self.sending[idx] = False
+            if new_sl is not None:
+                self.sl[idx] = new_sl
+
+    def __modify(self, update: SlUpdate):
+        try:
+            _, order = self.orders[update.order_no]
+            exchange = update.scrip.split("_")[0]
+            trading_symbol = update.scrip.replace(exchange + "_", "") + "-EQ"
+            resp = self.broker.api_modify_order(order_no=update.order_no, exchange=exchange,
+                                                trading_symbol=trading_symbol, new_quantity=order['open_qty'],
+                                                new_price_type=SL_PRICE_TYPE,
+                                                new_trigger_price=format(update.new_sl, ".2f"))
+        except Exception as ex:
+            logger.error(f"Unable to move SL of {update.order_no} to {update.new_sl}: {ex}")
+            self.__complete(update.order_no)
+            return
+        if isinstance(self.broker, SlModifyDispatcher):
+            return
+        if resp is None:
+            logger.error(f"Unable to move SL of {update.order_no} to {update.new_sl}")
+            self.__complete(update.order_no)
+        else:
+            self.__complete(update.order_no, update.new_sl)
+
+    def on_modify_result(self, result: ModifyResult):
+        """
+        on_result of the SlModifyDispatcher
+        """
+        if result.resp is None or result.rejected:
+            self.__complete(result.order_no)
+        else:
+            self.__complete(result.order_no, float(result.trigger_price))
+
+    def __chain_result(self, dispatcher: SlModifyDispatcher):
+        on_result = dispatcher.on_result
+
+        def chained(result: ModifyResult):
+            self.on_modify_result(result)
+            if on_result is not None:
+                on_result(result)
+
+        dispatcher.on_result = chained
+
+    def wait(self):
+        """
+        Waits for the modifications being sent
+        """
+        wait_all(list(self.__futures))
+
+    def stop(self):
+        if self.__executor is not None:
+            self.__executor.shutdown()
@@ -3,7 +3,7 @@ import logging
 import pandas as pd
 
 from commons.consts.consts import LOG_STORE_MODEL
-from commons.dataprovider.database import DatabaseEngine
+from commons.dataprovider.database import DatabaseEngine, Filter
 from commons.utils.Misc import get_epoch
 
 logger = logging.getLogger(__name__)
@@ -44,7 +44,7 @@ class LogService:
             "log_date": log_date,
             "acct": acct
         }
-        self.trader_db.delete_recs(table=LOG_STORE_MODEL, predicate=f"m.{LOG_STORE_MODEL}.log_key == '{log_key}'")
+        self.trader_db.delete_recs(table=LOG_STORE_MODEL, predicate=[Filter('log_key', '==', log_key)])
         self.trader_db.single_insert(LOG_STORE_MODEL, rec)
 
     def get_log_entry_df(self, log_type: str, keys: list[str], acct, log_date):
@@ -52,7 +52,7 @@ class LogService:
         key_list.append(log_date)
         key_list.append(acct)
         log_key = "_".join(key_list)
-        ret = self.trader_db.query_df(table=LOG_STORE_MODEL, predicate=f"m.{LOG_STORE_MODEL}.log_key == '{log_key}'")
+        ret = self.trader_db.query_df(table=LOG_STORE_MODEL, predicate=[Filter('log_key', '==', log_key)])
         if len(ret) == 0:
 
             return None
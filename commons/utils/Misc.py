@@ -9,6 +9,12 @@ from commons.consts.consts import IST
 
 logger = logging.getLogger(__name__)
 
+IST_OFFSET = 19800
+DAY_SECONDS = 86400
+# 09:15 & 15:30 IST in seconds of the day
+BOD_SECONDS = 33300
+EOD_SECONDS = 55800
+
 
 def get_bod_epoch(date_string: str):
     date_format = '%Y-%m-%d %H:%M:%S'
@@ -18,6 +24,25 @@ def get_bod_epoch(date_string: str):
     return trade_time
 
 
+def get_bod_epochs(epochs) -> np.ndarray:
+    """
+    Vectorized get_bod_epoch for the IST dates of the epochs
+    :param epochs: Array like of epochs (int or numeric strings)
+    :return: Epochs of 09:15 IST on the same IST day
+    """
+    epochs = np.asarray(epochs).astype(np.int64)
+    return (epochs + IST_OFFSET) // DAY_SECONDS * DAY_SECONDS - IST_OFFSET + BOD_SECONDS
+
+
+def get_date_epoch(date) -> int:
+    """
+    :param date: 'YYYY-MM-DD' or date
+    :return: Epoch of IST midnight for the date
+    """
+    date = pd.Timestamp(str(date)).date()
+    return int(IST.localize(datetime.datetime.combine(date, datetime.time())).timestamp())
+
+
 def get_epoch(date_string: str):
     if date_string == '0':
         return int(time.time())
@@ -170,17 +170,7 @@ CREATE TABLE public.log_store(
 );
 
 
-CREATE TABLE public.scrip_hist(
-	scrip varchar NOT NULL,
-	time int4 NOT NULL,
-	time_frame varchar NOT NULL,
-	date varchar NOT NULL,
-	open float4 NULL,
-	high float4 NULL,
-	low float4 NULL,
-	close float4 NULL,
-	CONSTRAINT scrip_hist_pk PRIMARY KEY (scrip, timestamp, time_frame)
-);
+-- public.scrip_hist definition: see scrip_hist_partitioned.sql
 
 
 
@@ -0,0 +1,58 @@
+-- public.scrip_hist migration to the partitioned layout
+
+-- * Typed columns: time int8 (epoch), date as date, OHLC as float8; hour / minute dropped
+-- * Partitioned by LIST (time_frame); 1-min data further by RANGE (time) per IST month
+-- * Covering index on (scrip, time_frame, time) INCLUDE OHLC for index-only range scans
+
+BEGIN;
+
+ALTER TABLE public.scrip_hist RENAME TO scrip_hist_old;
+ALTER TABLE public.scrip_hist_old RENAME CONSTRAINT scrip_hist_pk TO scrip_hist_old_pk;
+
+CREATE TABLE public.scrip_hist (
+	scrip varchar NOT NULL,
+	time_frame varchar NOT NULL,
+	"time" int8 NOT NULL,
+	"date" date NOT NULL,
+	"open" float8 NULL,
+	high float8 NULL,
+	low float8 NULL,
+	"close" float8 NULL,
+	CONSTRAINT scrip_hist_pk PRIMARY KEY (scrip, time_frame, "time")
+) PARTITION BY LIST (time_frame);
+
+CREATE TABLE public.scrip_hist_1d PARTITION OF public.scrip_hist FOR VALUES IN ('1D');
+CREATE TABLE public.scrip_hist_1 PARTITION OF public.scrip_hist FOR VALUES IN ('1') PARTITION BY RANGE ("time");
+CREATE TABLE public.scrip_hist_default PARTITION OF public.scrip_hist DEFAULT;
+CREATE TABLE public.scrip_hist_1_default PARTITION OF public.scrip_hist_1 DEFAULT;
+
+-- Creates the 1-min partition for the IST month of month_start e.g. scrip_hist_1_202312
+CREATE OR REPLACE FUNCTION public.scrip_hist_add_month(month_start date) RETURNS void AS $$
+DECLARE
+	from_epoch int8 := extract(epoch FROM (date_trunc('month', month_start)::timestamp AT TIME ZONE 'Asia/Kolkata'));
+	to_epoch int8 := extract(epoch FROM ((date_trunc('month', month_start) + interval '1 month')::timestamp AT TIME ZONE 'Asia/Kolkata'));
+BEGIN
+	EXECUTE format('CREATE TABLE IF NOT EXISTS public.scrip_hist_1_%s PARTITION OF public.scrip_hist_1 FOR VALUES FROM (%s) TO (%s)',
+		to_char(month_start, 'YYYYMM'), from_epoch, to_epoch);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT public.scrip_hist_add_month(m::date)
+FROM generate_series(date '2015-01-01', date_trunc('month', now()) + interval '12 months', interval '1 month') AS m;
+
+-- Partitioned index - created on every partition
+CREATE INDEX scrip_hist_scrip_tf_time_idx ON public.scrip_hist (scrip, time_frame, "time") INCLUDE ("open", high, low, "close");
+
+INSERT INTO public.scrip_hist (scrip, time_frame, "time", "date", "open", high, low, "close")
+SELECT scrip, time_frame, "time", "date"::date, "open", high, low, "close"
+FROM public.scrip_hist_old;
+
+COMMIT;
+
+ANALYZE public.scrip_hist;
+
+-- Once verified
+-- DROP TABLE public.scrip_hist_old;
+
+-- Add next month's partition ahead of time e.g. from cron on the 1st of each month
+-- SELECT public.scrip_hist_add_month((date_trunc('month', now()) + interval '1 month')::date);
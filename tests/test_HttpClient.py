@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from tests.Utils import *
+from commons.broker.HttpClient import DeadlineExceeded, HttpClient
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """
+    Answers after the delay of the path e.g. /0.5, in a dribble of bytes when ?dribble
+    """
+    protocol_version = "HTTP/1.1"
+    clients = set()
+
+    def do_POST(self):
+        self.clients.add(self.client_address)
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        path, _, query = self.path.partition("?")
+        delay = float(path.strip("/"))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if query == "dribble":
+            self.send_header("Content-Length", "10")
+            self.end_headers()
+            for _ in range(10):
+                time.sleep(delay / 10)
+                self.wfile.write(b"1")
+                self.wfile.flush()
+            return
+        time.sleep(delay)
+        body = b'{"stat": "Ok"}'
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_post(self):
+        client = HttpClient(connect_timeout=1, read_timeout=1, deadline=2)
+        res = client.post(f"{self.url}/0", data="jData={}")
+        self.assertEqual(200, res.status_code)
+        self.assertEqual({"stat": "Ok"}, res.json())
+        # Rest of the requests module as used by NorenApi
+        self.assertIs(requests.exceptions, client.exceptions)
+
+    def test_keep_alive(self):
+        client = HttpClient(connect_timeout=1, read_timeout=1, deadline=2, pool_size=4)
+        SlowHandler.clients.clear()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for _ in range(3):
+                results = list(executor.map(lambda _: client.post(f"{self.url}/0.1", data="").status_code, range(4)))
+                self.assertEqual([200] * 4, results)
+        # 12 calls over the 4 pooled connections
+        self.assertLessEqual(len(SlowHandler.clients), 4)
+        client.close()
+
+    def test_read_timeout(self):
+        client = HttpClient(connect_timeout=1, read_timeout=0.2, deadline=5)
+        self.assertRaises(requests.exceptions.Timeout, client.post, f"{self.url}/1", data="")
+
+    def test_deadline(self):
+        # Each byte is within the read timeout, the whole response isn't
+        client = HttpClient(connect_timeout=1, read_timeout=1, deadline=0.5)
+        start = time.monotonic()
+        self.assertRaises(DeadlineExceeded, client.post, f"{self.url}/2?dribble", data="")
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_threads(self):
+        client = HttpClient(connect_timeout=1, read_timeout=0.3, deadline=1)
+
+        def call(delay):
+            try:
+                return client.post(f"{self.url}/{delay}", data="").status_code
+            except requests.exceptions.Timeout:
+                return "timeout"
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(call, [0, 1] * 4))
+        self.assertEqual([200, "timeout"] * 4, results)
+        self.assertLess(time.monotonic() - start, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from tests.Utils import *
+from commons.broker.SlModifyDispatcher import SlModifyDispatcher
+from commons.service.LiveRiskEngine import LiveRiskEngine, LtpBuffer
+from commons.utils.Misc import get_new_sl
+
+TOKENS = [str(token) for token in range(10)]
+
+
+def get_bandhan():
+    return {"sl_order_id": "23112400485195", "scrip": "NSE_BANDHANBNK", "signal": 1, "token": "2263",
+            "sl_price": 218.15, "sl_range": 2.0, "trail_sl": 1.0, "tick": 0.05, "open_qty": 1}
+
+
+def get_order(idx: int, rng: np.random.Generator):
+    signal = 1 if idx % 2 == 0 else -1
+    entry = round(float(rng.uniform(100, 1000)), 2)
+    sl_range = round(entry * 0.01, 2)
+    return {"sl_order_id": f"SL{idx}", "scrip": f"NSE_SCRIP{idx}", "signal": signal, "token": TOKENS[idx % 10],
+            "sl_price": round(entry - signal * sl_range, 2), "sl_range": sl_range,
+            "trail_sl": round(sl_range / 2, 2), "tick": 0.05, "open_qty": 5}
+
+
+class TestLiveRiskEngine(unittest.TestCase):
+
+    def test_ltp_buffer(self):
+        ltps = LtpBuffer(['1', '2'], depth=3)
+        self.assertTrue(np.isnan(ltps.latest).all())
+        ltps.add(np.array([0, 0, 1, 0, 0]), np.array([1.0, 2.0, 10.0, 3.0, 4.0]))
+        self.assertEqual([4.0, 10.0], ltps.latest.tolist())
+        self.assertEqual([2.0, 3.0, 4.0], ltps.get_history('1').tolist())
+
+    def test_matches_get_new_sl(self):
+        rng = np.random.default_rng(7)
+        orders = [get_order(idx, rng) for idx in range(40)]
+        engine = LiveRiskEngine(TOKENS, capacity=4)
+        for order in orders:
+            engine.add_order(order)
+
+        for _ in range(20):
+            # One price per token per batch, near the orders of the token
+            prices = {token: orders[int(token)]['sl_price'] * float(rng.uniform(0.97, 1.03)) for token in TOKENS}
+            expected = {}
+            for order in orders:
+                ltp = prices[order['token']]
+                new_sl = float(get_new_sl(order, ltp))
+                if new_sl != 0.0:
+                    expected[order['sl_order_id']] = new_sl
+                    order['sl_price'] = new_sl
+            updates = engine.on_ticks([{'t': 'tk', 'tk': token, 'lp': str(price)} for token, price in prices.items()])
+            self.assertEqual(expected, {update.order_no: update.new_sl for update in updates})
+        for order in orders:
+            self.assertAlmostEqual(order['sl_price'], engine.get_sl(order['sl_order_id']))
+
+    def test_modify(self):
+        broker = MagicMock()
+        engine = LiveRiskEngine(['2263'], broker=broker)
+        engine.add_order(get_bandhan())
+        engine.on_tick({'tk': '2263', 'lp': '220.5'})
+        engine.wait()
+        broker.api_modify_order.assert_not_called()
+
+        engine.on_ticks([{'tk': '2263', 'lp': '221.0'}, {'tk': '2263', 'lp': '221.3'}, {'tk': '9999', 'lp': '1'}])
+        engine.wait()
+        broker.api_modify_order.assert_called_once_with(order_no="23112400485195", exchange="NSE",
+                                                        trading_symbol="BANDHANBNK-EQ", new_quantity=1,
+                                                        new_price_type="SL-LMT", new_trigger_price="219.30")
+        self.assertEqual(219.3, engine.get_sl("23112400485195"))
+        engine.remove_order("23112400485195")
+        self.assertEqual([], engine.on_tick({'tk': '2263', 'lp': '300'}))
+        engine.stop()
+
+    def test_modify_failed(self):
+        broker = MagicMock()
+        broker.api_modify_order.side_effect = [Exception("Timeout"), None, {"stat": "Ok"}]
+        engine = LiveRiskEngine(['2263'], broker=broker)
+        engine.add_order(get_bandhan())
+        for _ in range(3):
+            self.assertEqual(1, len(engine.on_tick({'tk': '2263', 'lp': '221.3'})))
+            engine.wait()
+            if broker.api_modify_order.call_count < 3:
+                # Not saved, so the next tick retries
+                self.assertEqual(218.15, engine.get_sl("23112400485195"))
+        self.assertEqual(219.3, engine.get_sl("23112400485195"))
+        self.assertEqual([], engine.on_tick({'tk': '2263', 'lp': '221.3'}))
+        engine.stop()
+
+    def test_in_flight(self):
+        broker = MagicMock()
+        sent = threading.Event()
+        broker.api_modify_order.side_effect = lambda **order: sent.wait(timeout=2) and {"stat": "Ok"}
+        engine = LiveRiskEngine(['2263'], broker=broker)
+        engine.add_order(get_bandhan())
+        self.assertEqual(1, len(engine.on_tick({'tk': '2263', 'lp': '221.3'})))
+        # The tick thread is not held up & the order is not sent again while in flight
+        self.assertEqual([], engine.on_tick({'tk': '2263', 'lp': '222.3'}))
+        sent.set()
+        engine.wait()
+        self.assertEqual(1, broker.api_modify_order.call_count)
+        self.assertEqual(219.3, engine.get_sl("23112400485195"))
+        engine.stop()
+
+    def test_dispatcher(self):
+        broker = MagicMock()
+        broker.api_modify_order.return_value = {"stat": "Ok"}
+        broker.is_sl_update_rejected.side_effect = [(True, "16448: undefined error code !!"), (False, "NA")]
+        dispatcher = SlModifyDispatcher(broker, max_workers=1)
+        engine = LiveRiskEngine(['2263'], broker=dispatcher)
+        engine.add_order(get_bandhan())
+        engine.on_tick({'tk': '2263', 'lp': '221.3'})
+        self.assertTrue(dispatcher.flush()[0].rejected)
+        self.assertEqual(218.15, engine.get_sl("23112400485195"))
+        engine.on_tick({'tk': '2263', 'lp': '221.3'})
+        self.assertFalse(dispatcher.flush()[0].rejected)
+        self.assertEqual(219.3, engine.get_sl("23112400485195"))
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,19 @@
+import pandas as pd
+
 from tests.Utils import *
-from commons.utils.Misc import remove_outliers
+from commons.utils.Misc import get_bod_epoch, get_bod_epochs, get_date_epoch, remove_outliers
 
 
 def test_remove_outliers():
     data = read_file_df("misc/weight-height.csv")
     result = remove_outliers(data['Height'], lower_cutoff=25, higher_cutoff=75)
     assert 9992, len(result)
+
+
+def test_get_bod_epochs():
+    dates = pd.date_range('2023-01-01', '2023-12-31', freq='D')
+    expected = [get_bod_epoch(str(date.date())) for date in dates]
+    # IST midnight, as the daily bars come, & any time of the IST day
+    midnight = [get_date_epoch(date.date()) for date in dates]
+    assert expected == get_bod_epochs(midnight).tolist()
+    assert expected == get_bod_epochs([str(epoch + 86399) for epoch in midnight]).tolist()
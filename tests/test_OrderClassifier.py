@@ -0,0 +1,43 @@
+import copy
+
+import pandas as pd
+
+from tests.Utils import *
+from commons.broker.OrderClassifier import OrderClassifier
+from commons.broker.Shoonya import Shoonya
+
+
+def nulls_as_none(df: pd.DataFrame):
+    # The fixtures have null for the keys missing in some orders
+    return df.astype(object).where(df.notna(), None)
+
+
+class TestOrderClassifier(unittest.TestCase):
+
+    def test_order_book(self):
+        result = OrderClassifier.classify_order_book(read_file("bo/order-book-cob.json"))
+        expected = pd.DataFrame(read_file("bo/expected/order-book-cob-order-type.json"))
+        pd.testing.assert_frame_equal(result, expected, check_like=True)
+
+    def test_order_updates(self):
+        messages = read_file("bo/bo-entry-order-update.json")
+        result = OrderClassifier.add_order_type(pd.DataFrame(messages), 'pcode')
+        expected = pd.DataFrame(read_file("bo/expected/bo-order-update-order-type.json"))
+        pd.testing.assert_frame_equal(nulls_as_none(result), nulls_as_none(expected), check_like=True)
+
+    def test_order_status(self):
+        messages = read_file("order-update/bo-entry-order-update.json")
+        for name in ["sl-hit-order", "target-hit-order", "rejection-order", "canceled-order"]:
+            messages.append(read_file(f"order-update/{name}.json"))
+        messages.append({**messages[-2], "pcode": "C"})
+
+        result = OrderClassifier.classify_order_updates(messages)
+        expected = [Shoonya.get_order_status_order_update(copy.deepcopy(message)).get('tp_order_status')
+                    if message['pcode'] != 'C' else None for message in messages]
+        self.assertEqual(expected, result.tp_order_status.tolist())
+        self.assertEqual(["PENDING", "PENDING", "PENDING", "ENTERED"], result.tp_order_status.tolist()[:4])
+        self.assertEqual(["SL-HIT", "TARGET-HIT", "REJECTED", "CANCELED", None], result.tp_order_status.tolist()[-5:])
+
+
+if __name__ == "__main__":
+    unittest.main()
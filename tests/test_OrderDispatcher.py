@@ -0,0 +1,69 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from tests.Utils import *
+from commons.broker.OrderDispatcher import OrderDispatcher
+from commons.broker.Shoonya import BO_PROD_TYPE, Shoonya
+
+ACCTS = ['Trader-V2-Alan', 'Trader-V2-Pralhad', 'Trader-V2-Sundar', 'Trader-V2-Mahi']
+
+
+def get_broker(acct: str, barrier: threading.Barrier = None, fail: bool = False):
+    broker = MagicMock(spec=Shoonya)
+    broker.acct = acct
+
+    def place_order(**order):
+        if barrier is not None:
+            # Only passes once all the accounts are in flight together
+            barrier.wait(timeout=2)
+        time.sleep(0.1)
+        if fail:
+            raise ConnectionError("Broker down")
+        return {"stat": "Ok", "norenordno": f"{acct}-{order['quantity']}"}
+
+    broker.api_place_order.side_effect = place_order
+    return broker
+
+
+class TestOrderDispatcher(unittest.TestCase):
+
+    def test_parallel(self):
+        barrier = threading.Barrier(len(ACCTS))
+        brokers = [get_broker(acct, barrier) for acct in ACCTS]
+        dispatcher = OrderDispatcher(brokers=brokers)
+        start = time.perf_counter()
+        res = dispatcher.place_bracket_order('B', 'NSE', 'UPL-EQ', 10, 500.0, 5.0, 10.0, 'ENTRY_LEG:1')
+        self.assertLess(time.perf_counter() - start, 0.3)
+        dispatcher.close()
+
+        self.assertEqual(ACCTS, list(res.keys()))
+        for acct, result in res.items():
+            self.assertEqual(f"{acct}-10", result.resp['norenordno'])
+            self.assertIsNone(result.error)
+            self.assertGreaterEqual(result.latency, 0.1)
+            self.assertLess(result.sent_after, 0.05)
+        order = brokers[0].api_place_order.call_args.kwargs
+        self.assertEqual(BO_PROD_TYPE, order['product_type'])
+        self.assertEqual(5.0, order['book_loss_price'])
+
+    def test_quantity_by_account(self):
+        brokers = [get_broker(ACCTS[0]), get_broker(ACCTS[1], fail=True), get_broker(ACCTS[2])]
+        dispatcher = OrderDispatcher(brokers=brokers)
+        res = dispatcher.place_bracket_order('S', 'NSE', 'UPL-EQ', {ACCTS[0]: 5, ACCTS[1]: 3, ACCTS[2]: 0},
+                                             500.0, 5.0, 10.0, 'ENTRY_LEG:1')
+        dispatcher.close()
+
+        self.assertEqual([ACCTS[0], ACCTS[1]], list(res.keys()))
+        self.assertEqual(f"{ACCTS[0]}-5", res[ACCTS[0]].resp['norenordno'])
+        self.assertIsNone(res[ACCTS[1]].resp)
+        self.assertEqual("Broker down", res[ACCTS[1]].error)
+        brokers[2].api_place_order.assert_not_called()
+
+    def test_no_accounts(self):
+        with self.assertRaises(ValueError):
+            OrderDispatcher()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+from tests.Utils import *
+from commons.broker.OrderStore import OrderStore
+
+ENTRY = "23112400485194"
+SL = "23112400485195"
+TARGET = "23112400485196"
+
+
+class TestOrderStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = OrderStore()
+        for message in read_file("order-update/bo-entry-order-update.json"):
+            self.store.on_order_update(message)
+
+    def test_order_updates(self):
+        self.assertEqual("ENTERED", self.store.get_status(ENTRY))
+        self.assertEqual("TRIGGER_PENDING", self.store.get_status(SL))
+        self.assertEqual("OPEN", self.store.get_status(TARGET))
+        self.assertEqual(ENTRY, self.store.get_parent(SL))
+        bracket = self.store.get_bracket(TARGET)
+        self.assertEqual({"ENTRY_LEG": ENTRY, "SL_LEG": SL, "TARGET_LEG": TARGET},
+                         {order_type: order['norenordno'] for order_type, order in bracket.items()})
+        self.assertIsNone(self.store.get_status("X"))
+
+        self.store.on_order_update(read_file("order-update/sl-hit-order.json"))
+        self.assertEqual("SL-HIT", self.store.get_status(SL))
+        # Late update of the closed order
+        self.store.on_order_update({**read_file("order-update/sl-hit-order.json"), "status": "TRIGGER_PENDING"})
+        self.assertEqual("SL-HIT", self.store.get_status(SL))
+
+    def test_reconcile(self):
+        order_book = read_file("bo/order-book-cob.json")
+        changed = self.store.reconcile(order_book)
+        self.assertEqual(len(order_book), len(changed))
+        # Closed at market
+        self.assertEqual("COB-CLOSE", self.store.get_status("23112400574752"))
+        self.assertEqual("CANCELED", self.store.get_status("23112400574751"))
+        self.assertEqual("ENTERED", self.store.get_status("23112400574750"))
+        self.assertEqual("COMPLETE", self.store.get_status("23112400251924"))
+        self.assertEqual(3, len(self.store.get_bracket("23112400574750")))
+        # The orders of the updates are kept
+        self.assertEqual("OPEN", self.store.get_status(TARGET))
+
+        # Nothing changed since
+        self.assertEqual([], self.store.reconcile(order_book))
+        order_book[0] = {**order_book[0], "status": "REJECTED"}
+        self.assertEqual([order_book[0]['norenordno']], self.store.reconcile(order_book))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from tests.Utils import *
+from commons.broker.RateLimiter import RateLimiter, TokenBucket, get_endpoint_class
+
+HOST = "https://api.shoonya.com/NorenWClientTP"
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_get_endpoint_class(self):
+        self.assertEqual("order", get_endpoint_class(f"{HOST}/PlaceOrder"))
+        self.assertEqual("status", get_endpoint_class(f"{HOST}/SingleOrdHist"))
+        self.assertEqual("history", get_endpoint_class(f"{HOST}/TPSeries"))
+        self.assertEqual("other", get_endpoint_class(f"{HOST}/Limits"))
+
+    def test_bucket(self):
+        bucket = TokenBucket(rate=20, burst=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+        for _ in range(10):
+            bucket.acquire()
+        self.assertAlmostEqual(0.5, time.monotonic() - start, delta=0.15)
+
+    def test_priority(self):
+        bucket = TokenBucket(rate=10, burst=1)
+        bucket.acquire()
+        served = []
+
+        def acquire(name, priority):
+            bucket.acquire(priority)
+            served.append(name)
+
+        threads = [threading.Thread(target=acquire, args=(f"history{i}", 2)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        threads.append(threading.Thread(target=acquire, args=("order", 0)))
+        threads[-1].start()
+        for thread in threads:
+            thread.join()
+        # Ahead of the history calls queued before it
+        self.assertEqual(["order", "history0", "history1", "history2"], served)
+
+    def test_threads(self):
+        limiter = RateLimiter({'history': {'rate': 20, 'burst': 2}})
+        start = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire, args=(f"{HOST}/TPSeries",)) for _ in range(12)]
+        threads.append(threading.Thread(target=limiter.acquire, args=(f"{HOST}/PlaceOrder",)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.monotonic() - start, 0.45)
+
+        metrics = limiter.get_metrics()
+        self.assertEqual(12, metrics['history']['calls'])
+        self.assertEqual(10, metrics['history']['waited'])
+        self.assertAlmostEqual(0.5, metrics['history']['max_wait'], delta=0.15)
+        self.assertEqual(1, metrics['order']['calls'])
+        self.assertLess(metrics['order']['max_wait'], 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
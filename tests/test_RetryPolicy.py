@@ -0,0 +1,144 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from tests.Utils import *
+from commons.broker.RetryPolicy import (AUTH_EXPIRED, REJECTED, THROTTLED, TRANSIENT, CircuitBreaker,
+                                        CircuitOpenError, RetryPolicy, SessionRefresher, classify,
+                                        is_unsent)
+
+
+def get_response(status_code: int = 200, text: str = '{"stat": "Not_Ok", "emsg": "Error"}'):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = text.encode()
+    return response
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.response = None
+        self.policy = RetryPolicy(retries=3, backoff=0.001, max_backoff=0.01, failure_threshold=3,
+                                  reset_timeout=0.2, get_response=lambda: self.response)
+
+    def test_classify(self):
+        self.assertIsNone(classify([{"stat": "Ok"}]))
+        self.assertEqual(TRANSIENT, classify(ex=requests.exceptions.ReadTimeout()))
+        self.assertEqual(TRANSIENT, classify(ex=ValueError(), response=get_response(502, "<html>")))
+        self.assertEqual(REJECTED, classify(ex=KeyError()))
+        self.assertEqual(THROTTLED, classify(response=get_response(429)))
+        self.assertEqual(AUTH_EXPIRED,
+                         classify(response=get_response(text='{"stat":"Not_Ok","emsg":"Session Expired :  Invalid '
+                                                             'Session Key"}')))
+        self.assertEqual(REJECTED, classify(response=get_response(text='{"stat":"Not_Ok","emsg":"no data"}')))
+
+    def test_transient(self):
+        func = MagicMock(side_effect=[requests.exceptions.ConnectionError(), None, "ok"])
+        self.response = None
+        self.assertEqual("ok", self.policy.call("test", func, "status"))
+        self.assertEqual(3, func.call_count)
+
+    def test_exhausted(self):
+        policy = RetryPolicy(retries=3, backoff=0.001, failure_threshold=10)
+        func = MagicMock(side_effect=requests.exceptions.ReadTimeout())
+        self.assertRaises(requests.exceptions.ReadTimeout, policy.call, "test", func, "history")
+        self.assertEqual(4, func.call_count)
+
+    def test_rejected(self):
+        self.response = get_response(text='{"stat":"Not_Ok","emsg":"Order not found"}')
+        func = MagicMock(return_value=None)
+        self.assertIsNone(self.policy.call("test", func, "order"))
+        self.assertEqual(1, func.call_count)
+
+    def test_not_idempotent(self):
+        func = MagicMock(side_effect=requests.exceptions.ReadTimeout())
+        self.assertRaises(requests.exceptions.ReadTimeout, self.policy.call, "test", func, "order", idempotent=False)
+        self.assertEqual(1, func.call_count)
+        # Never reached the broker
+        func = MagicMock(side_effect=[requests.exceptions.ConnectTimeout(), "ok"])
+        self.assertEqual("ok", self.policy.call("test", func, "order", idempotent=False))
+        refused = MaxRetryError(None, "/PlaceOrder", NewConnectionError(None, "Connection refused"))
+        func = MagicMock(side_effect=[requests.exceptions.ConnectionError(refused), "ok"])
+        self.assertEqual("ok", self.policy.call("test", func, "order", idempotent=False))
+
+    def test_not_idempotent_aborted(self):
+        # Pooled keep-alive connection dropped after the order was sent
+        aborted = requests.exceptions.ConnectionError(ProtocolError('Connection aborted.',
+                                                                    ConnectionResetError(104, 'reset by peer')))
+        func = MagicMock(side_effect=[aborted, "ok"])
+        self.assertRaises(requests.exceptions.ConnectionError, self.policy.call, "test", func, "order",
+                          idempotent=False)
+        self.assertEqual(1, func.call_count)
+        self.assertFalse(is_unsent(requests.exceptions.ConnectionError('Connection aborted.')))
+        # Idempotent calls are still retried
+        func = MagicMock(side_effect=[aborted, "ok"])
+        self.assertEqual("ok", self.policy.call("test", func, "status"))
+
+    def test_relogin_coalesced(self):
+        login = MagicMock()
+        session = SessionRefresher(login)
+        expired = get_response(text='{"stat":"Not_Ok","emsg":"Session Expired :  Invalid Session Key"}')
+        local = threading.local()
+        policy = RetryPolicy(retries=2, backoff=0.001, get_response=lambda: getattr(local, 'response', None))
+        barrier = threading.Barrier(5)
+
+        def func():
+            if session.generation == 0:
+                barrier.wait()
+                local.response = expired
+                return None
+            local.response = None
+            return "ok"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(policy.call("test", func, "status", session)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(["ok"] * 5, results)
+        self.assertEqual(1, login.call_count)
+
+    def test_circuit_breaker(self):
+        func = MagicMock(side_effect=requests.exceptions.ConnectionError())
+        self.assertRaises(requests.exceptions.ConnectionError, self.policy.call, "test", func, "history")
+        # Opened after 3 failures
+        self.assertEqual(3, func.call_count)
+        self.assertRaises(CircuitOpenError, self.policy.call, "test", func, "history")
+        self.assertEqual(3, func.call_count)
+        # The other endpoint classes proceed
+        self.assertEqual("ok", self.policy.call("test", lambda: "ok", "order"))
+
+        time.sleep(0.25)
+        self.assertEqual("ok", self.policy.call("test", lambda: "ok", "history"))
+        self.assertIsNone(self.policy.get_breaker("history").opened_at)
+
+    def test_circuit_breaker_scope(self):
+        func = MagicMock(side_effect=requests.exceptions.ConnectionError())
+        self.assertRaises(requests.exceptions.ConnectionError, self.policy.call, "test", func, "order", scope="Acct1")
+        self.assertRaises(CircuitOpenError, self.policy.call, "test", func, "order", scope="Acct1")
+        # The other accounts' orders proceed
+        self.assertEqual("ok", self.policy.call("test", lambda: "ok", "order", scope="Acct2"))
+        self.assertEqual("ok", self.policy.call("test", lambda: "ok", "order"))
+        self.assertTrue(self.policy.get_breaker("order", "Acct1").is_open)
+        self.assertEqual("Acct1/order", self.policy.get_breaker("order", "Acct1").name)
+
+    def test_half_open(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+        breaker.on_failure()
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+        time.sleep(0.06)
+        breaker.before_call()
+        # Only one trial call
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+        breaker.on_failure()
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import tempfile
+
+import numpy as np
+
+from tests.Utils import *
+from commons.dataprovider.ScripArrayStore import ScripArrayStore
+from commons.utils.Misc import get_date_epoch
+
+
+class TestScripArrayStore(unittest.TestCase):
+    scrip = 'NSE_ACME'
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ScripArrayStore(store_dir=self.tmp_dir.name)
+        # 3 days of 375 1-min bars each from 09:15 IST
+        times = [get_date_epoch(day) + 33300 + 60 * i for day in ['2023-11-15', '2023-11-16', '2023-11-17']
+                 for i in range(375)]
+        self.data = pd.DataFrame({"time": times, "open": 1.0, "high": 2.0, "low": 0.5,
+                                  "close": np.arange(len(times), dtype=float)})
+        self.store.save(self.scrip, self.data)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_tick_data(self):
+        res = self.store.get_tick_data(self.scrip)
+        self.assertEqual(len(self.data), len(res))
+        pd.testing.assert_frame_equal(self.data, res.to_df())
+
+        res = self.store.get_tick_data(self.scrip, from_date='2023-11-16')
+        self.assertEqual(750, len(res))
+        self.assertEqual(get_date_epoch('2023-11-16') + 33300, res.time[0])
+
+        res = self.store.get_tick_data(self.scrip, from_date='2023-11-16', to_date='2023-11-17')
+        self.assertEqual(375, len(res))
+        self.assertEqual(0, len(self.store.get_tick_data(self.scrip, from_date='2023-11-18')))
+
+    def test_zero_copy(self):
+        arrays, _ = self.store.load(self.scrip)
+        res = self.store.get_tick_data(self.scrip, from_date='2023-11-17')
+        self.assertIsInstance(res.close, np.memmap)
+        self.assertTrue(np.shares_memory(arrays.close, res.close))
+
+    def test_resave(self):
+        self.store.get_tick_data(self.scrip)
+        self.store.save(self.scrip, self.data.iloc[:10])
+        self.assertEqual(10, len(self.store.get_tick_data(self.scrip)))
+        self.assertEqual(2, len(os.listdir(self.tmp_dir.name)))
+
+
+if __name__ == "__main__":
+    unittest.main()
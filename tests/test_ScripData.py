@@ -0,0 +1,67 @@
+import tempfile
+from unittest.mock import patch
+
+from tests.Utils import *
+from commons.consts.consts import Interval
+from commons.dataprovider.ScripData import ScripData
+from commons.dataprovider.ScripDataCache import ScripDataCache
+from commons.dataprovider.database import DatabaseEngine
+
+
+class TestScripDataBatch(unittest.TestCase):
+    scrips = ['NSE_A', 'NSE_B', 'NSE_C']
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseEngine(db_config={"backend": "duckdb",
+                                            "path": os.path.join(self.tmp_dir.name, "trader.duckdb")})
+        self.sd = ScripData(trader_db=self.db)
+        for idx, scrip in enumerate(self.scrips[:2]):
+            bars = pd.DataFrame([{"time": 1700020800 + 60 * i, "open": idx, "high": idx, "low": idx, "close": idx}
+                                 for i in range(4 + idx)])
+            self.sd.save_scrip_data(bars, scrip)
+            self.sd.save_scrip_data(bars.iloc[:1], scrip, time_frame=Interval.in_daily)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_batch(self, sd: ScripData):
+        with patch.object(self.db, 'query_df', wraps=self.db.query_df) as query_df:
+            ticks = sd.get_scrips_tick_data(self.scrips)
+            self.assertEqual(1, query_df.call_count)
+        self.assertEqual(set(self.scrips), set(ticks.keys()))
+        self.assertEqual([4, 5, 0], [len(ticks[scrip]) for scrip in self.scrips])
+        for scrip in self.scrips[:2]:
+            pd.testing.assert_frame_equal(sd.get_tick_data(scrip).sort_values(by='time', ignore_index=True),
+                                          ticks[scrip], check_dtype=False)
+
+        base = sd.get_scrips_base_data(self.scrips, from_date='2023-11-15')
+        self.assertEqual([1, 1, 0], [len(base[scrip]) for scrip in self.scrips])
+
+        df = sd.get_scrips_data(self.scrips, time_frames=[Interval.in_1_minute, Interval.in_daily])
+        self.assertEqual(11, len(df))
+
+    def test_batch(self):
+        self.assert_batch(self.sd)
+
+    def test_batch_cached(self):
+        sd = ScripData(trader_db=self.db, cache=ScripDataCache(os.path.join(self.tmp_dir.name, "cache")))
+        self.assert_batch(sd)
+        # Everything is now cached; next batch only asks for newer rows
+        with patch.object(self.db, 'query_df', wraps=self.db.query_df) as query_df:
+            sd.get_scrips_tick_data(self.scrips[:2])
+            self.assertIn(('time', '>', 1700020800 + 60 * 3), query_df.call_args.args[1])
+
+
+    def test_market_hours(self):
+        # 09:14, 09:15, 15:29 & 15:30 IST
+        bars = pd.DataFrame([{"time": t, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0}
+                             for t in [1700019840, 1700019900, 1700042340, 1700042400]])
+        self.sd.save_scrip_data(bars, 'NSE_D')
+        res = self.sd.get_scrip_data('NSE_D')
+        self.assertEqual([1700019900, 1700042340], sorted(res.time.tolist()))
+        self.assertEqual('2023-11-15', str(res.date.iloc[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
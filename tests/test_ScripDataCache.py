@@ -0,0 +1,83 @@
+import tempfile
+from unittest.mock import patch
+
+from tests.Utils import *
+from commons.consts.consts import Interval
+from commons.dataprovider.ScripData import ScripData
+from commons.dataprovider.ScripDataCache import ScripDataCache
+from commons.dataprovider.database import DatabaseEngine
+
+
+class TestScripDataCache(unittest.TestCase):
+    scrip = 'DUMMY'
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = DatabaseEngine(db_config={"backend": "duckdb",
+                                            "path": os.path.join(self.tmp_dir.name, "trader.duckdb")})
+        self.cache = ScripDataCache(os.path.join(self.tmp_dir.name, "cache"))
+        self.sd = ScripData(trader_db=self.db, cache=self.cache)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def get_bars(start: int, count: int, close: float = 100.0):
+        return pd.DataFrame([{"time": 1700020800 + 60 * i, "open": close, "high": close, "low": close,
+                              "close": close} for i in range(start, start + count)])
+
+    def test_read_through(self):
+        self.sd.save_scrip_data(self.get_bars(0, 5), self.scrip)
+        first = self.sd.get_tick_data(self.scrip)
+        self.assertEqual(5, len(first))
+        self.assertEqual(5, len(self.cache.read(self.scrip, Interval.in_1_minute)))
+
+        with patch.object(self.db, 'query_df', wraps=self.db.query_df) as query_df:
+            second = self.sd.get_tick_data(self.scrip)
+            predicate = query_df.call_args.args[1]
+        self.assertIn(('time', '>', int(first.time.max())), predicate)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_incremental_and_invalidate(self):
+        self.sd.save_scrip_data(self.get_bars(0, 5), self.scrip)
+        self.sd.get_tick_data(self.scrip)
+
+        self.sd.save_scrip_data(self.get_bars(5, 3), self.scrip)
+        self.assertEqual(8, len(self.sd.get_tick_data(self.scrip)))
+
+        # Rewrite of an existing range must replace the cached rows
+        self.sd.save_scrip_data(self.get_bars(3, 2, close=101.0), self.scrip)
+        res = self.sd.get_tick_data(self.scrip)
+        self.assertEqual(5, len(res))
+        self.assertEqual([100.0] * 3 + [101.0] * 2, res.close.astype(float).tolist())
+        pd.testing.assert_frame_equal(res, ScripData(trader_db=self.db).get_tick_data(self.scrip)
+                                      .sort_values(by='time', ignore_index=True), check_dtype=False)
+
+    def test_from_date(self):
+        self.sd.save_scrip_data(self.get_bars(0, 5), self.scrip, time_frame=Interval.in_daily)
+        self.assertEqual(5, len(self.sd.get_base_data(self.scrip, from_date='2023-11-15')))
+        self.assertEqual(0, len(self.sd.get_base_data(self.scrip, from_date='2023-11-16')))
+
+    def test_stale_schema(self):
+        self.sd.save_scrip_data(self.get_bars(0, 5), self.scrip)
+        # Cache written before date became a Date & hour / minute were dropped
+        old = self.sd.get_tick_data(self.scrip).assign(date='2023-11-15', hour=9, minute=15)
+        self.cache.write(self.scrip, Interval.in_1_minute, old.iloc[:3])
+        self.assertIsNone(self.cache.read(self.scrip, Interval.in_1_minute))
+        self.assertFalse(os.path.exists(self.cache.get_path(self.scrip, Interval.in_1_minute)))
+
+        self.cache.write(self.scrip, Interval.in_1_minute, old.iloc[:3])
+        res = self.sd.get_tick_data(self.scrip)
+        self.assertEqual(5, len(res))
+        self.assertNotIn('hour', res)
+
+    def test_save_outside_session(self):
+        # 09:00 - 09:14 IST only
+        pre_open = self.get_bars(0, 15)
+        pre_open['time'] = pre_open['time'] - 1700020800 + 1700019000
+        self.assertEqual("Ok", self.sd.save_scrip_data(pre_open, self.scrip))
+        self.assertEqual(0, len(self.sd.get_tick_data(self.scrip)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -121,21 +121,21 @@ class TestShoonya(unittest.TestCase):
         result = self.s.get_order_status_order_update(canceled)
         self.assertEqual(result.get('tp_order_status', 'X'), "CANCELED")
 
-    @patch('commons.broker.Shoonya.Shoonya.api.single_order_history')
-    def test_is_sl_update_rejected(self, mock_order_hist_api):
-        api_resp = read_file(name="order-hist/sl-update-no-rejection-order-hist.json")
+    def test_is_sl_update_rejected(self):
+        with patch.object(self.s.api, 'single_order_history') as mock_order_hist_api:
+            api_resp = read_file(name="order-hist/sl-update-no-rejection-order-hist.json")
 
-        mock_order_hist_api.side_effect = [api_resp]
-        res = self.s.is_sl_update_rejected("X")
+            mock_order_hist_api.side_effect = [api_resp]
+            res = self.s.is_sl_update_rejected("X")
 
-        self.assertEqual(res, (False, "NA"))
+            self.assertEqual(res, (False, "NA"))
 
-        api_resp = read_file(name="order-hist/sl-update-rejection-order-hist.json")
+            api_resp = read_file(name="order-hist/sl-update-rejection-order-hist.json")
 
-        mock_order_hist_api.side_effect = [api_resp]
-        res = self.s.is_sl_update_rejected("X")
+            mock_order_hist_api.side_effect = [api_resp]
+            res = self.s.is_sl_update_rejected("X")
 
-        self.assertEqual(res, (True, '16448: undefined error code !!'))
+            self.assertEqual(res, (True, '16448: undefined error code !!'))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from tests.Utils import *
+from commons.broker.SlModifyDispatcher import SlModifyDispatcher, get_rejections
+from commons.broker.Shoonya import Shoonya
+
+
+def get_broker(rejected: set = None):
+    broker = MagicMock(spec=Shoonya)
+    barrier = threading.Barrier(2)
+
+    def modify_order(**order):
+        # Both the orders are in flight together
+        barrier.wait(timeout=2)
+        return {"stat": "Ok", "result": order['order_no']}
+
+    broker.api_modify_order.side_effect = modify_order
+    broker.api_get_order_book.return_value = [
+        {"norenordno": "1", "status": "TRIGGER_PENDING", "rpt": "Replaced", "trgprc": "218.30"},
+        {"norenordno": "2", "status": "TRIGGER_PENDING", "rpt": "ReplaceRejected", "trgprc": "295.00",
+         "rejreason": "16448: undefined error code !!"}]
+    broker.is_sl_update_rejected.side_effect = lambda order_no: (
+        (True, '16448: undefined error code !!') if order_no in (rejected or set()) else (False, "NA"))
+    return broker
+
+
+def modify(dispatcher, order_no, trigger_price):
+    dispatcher.api_modify_order(order_no=order_no, exchange="NSE", trading_symbol="UPL-EQ", new_quantity=1,
+                                new_price_type="SL-LMT", new_trigger_price=trigger_price)
+
+
+class TestSlModifyDispatcher(unittest.TestCase):
+
+    def test_coalesce(self):
+        broker = get_broker(rejected={"2"})
+        dispatcher = SlModifyDispatcher(broker, max_workers=2)
+        for trigger_price in ["218.10", "218.20", "218.30"]:
+            modify(dispatcher, "1", trigger_price)
+        modify(dispatcher, "2", "300.00")
+
+        results = {result.order_no: result for result in dispatcher.flush()}
+        self.assertEqual(2, broker.api_modify_order.call_count)
+        self.assertEqual("218.30", results["1"].trigger_price)
+        self.assertEqual(2, results["1"].coalesced)
+        self.assertFalse(results["1"].rejected)
+        self.assertTrue(results["2"].rejected)
+        self.assertEqual('16448: undefined error code !!', results["2"].reason)
+        # One order book for the window
+        broker.api_get_order_book.assert_called_once()
+        broker.is_sl_update_rejected.assert_not_called()
+
+        self.assertEqual([], dispatcher.flush())
+        dispatcher.stop()
+
+    def test_background(self):
+        broker = get_broker()
+        results = []
+        dispatcher = SlModifyDispatcher(broker, window=0.05, max_workers=2, check_rejections=False,
+                                        on_result=results.append).start()
+        modify(dispatcher, "1", "218.10")
+        modify(dispatcher, "2", "300.00")
+        time.sleep(0.3)
+        dispatcher.stop()
+        self.assertEqual({"1", "2"}, {result.order_no for result in results})
+        broker.is_sl_update_rejected.assert_not_called()
+
+    def test_order_book_missing(self):
+        broker = get_broker(rejected={"3"})
+        dispatcher = SlModifyDispatcher(broker, max_workers=2)
+        modify(dispatcher, "1", "218.30")
+        modify(dispatcher, "3", "300.00")
+        results = {result.order_no: result for result in dispatcher.flush()}
+        self.assertFalse(results["1"].rejected)
+        # Not in the order book, so from its order history
+        self.assertTrue(results["3"].rejected)
+        broker.is_sl_update_rejected.assert_called_once_with("3")
+        dispatcher.stop()
+
+    def test_get_rejections(self):
+        order_book = [{"norenordno": "1", "status": "TRIGGER_PENDING", "trgprc": "218.30"},
+                      {"norenordno": "2", "status": "TRIGGER_PENDING", "trgprc": "295.00"},
+                      {"norenordno": "3", "status": "COMPLETE", "trgprc": "100.00"},
+                      {"norenordno": "4", "status": "TRIGGER_PENDING", "rpt": "ReplaceRejected",
+                       "rejreason": "Invalid price"},
+                      {"norenordno": "5", "status": "OPEN"}]
+        res = get_rejections(order_book, {"1": "218.3", "2": "300.00", "3": "110.00", "4": "1.00"})
+        self.assertEqual({"1": (False, "NA"), "2": (True, "Trigger price still 295.00"), "3": (False, "NA"),
+                          "4": (True, "Invalid price")}, res)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import tempfile
+import time
+import zipfile
+from unittest.mock import patch
+
+from tests.Utils import *
+from commons.broker import SymbolMaster as symbol_master
+from commons.broker.SymbolMaster import SymbolMaster
+
+
+class TestSymbolMaster(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        zip_path = os.path.join(self.tmp_dir.name, "NSE_symbols.txt.zip")
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr("NSE_symbols.txt", "Exchange,Token,LotSize,Symbol,TradingSymbol,Instrument,TickSize,\n"
+                                                 "NSE,2885,1,RELIANCE,RELIANCE-EQ,EQ,0.05,\n"
+                                                 "NSE,11532,1,UPL,UPL-EQ,EQ,0.05,\n"
+                                                 "NSE,99999,1,UPL,UPL-EQ,EQ,0.05,\n")
+        self.url = f"file://{zip_path}"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cache(self):
+        with patch.object(symbol_master, 'urlopen', wraps=symbol_master.urlopen) as urlopen:
+            master = SymbolMaster(self.cache_dir, url=self.url)
+            self.assertEqual("2885", master.get_token("RELIANCE-EQ"))
+            self.assertEqual("11532", master.get_token("UPL-EQ"))
+            self.assertEqual(3, len(master.symbols))
+            self.assertRaises(KeyError, master.get_token, "XYZ-EQ")
+
+            # Shared by the next account
+            other = SymbolMaster(self.cache_dir, url=self.url)
+            self.assertIs(master.tokens, other.tokens)
+            self.assertEqual(1, urlopen.call_count)
+
+            # Expires the next day
+            yesterday = time.time() - 86400
+            os.utime(master.path, (yesterday, yesterday))
+            SymbolMaster(self.cache_dir, url=self.url)
+            self.assertEqual(2, urlopen.call_count)
+        self.assertEqual(["NSE_symbols.txt.zip", "NSE_symbols.txt.zip.lock"], sorted(os.listdir(self.cache_dir)))
+
+    def test_stale_fallback(self):
+        master = SymbolMaster(self.cache_dir, url=self.url)
+        yesterday = time.time() - 86400
+        os.utime(master.path, (yesterday, yesterday))
+        missing_url = f"file://{self.tmp_dir.name}/missing/NSE_symbols.txt.zip"
+        stale = SymbolMaster(self.cache_dir, url=missing_url)
+        self.assertEqual("2885", stale.get_token("RELIANCE-EQ"))
+        self.assertRaises(Exception, SymbolMaster, os.path.join(self.tmp_dir.name, "empty"), missing_url)
+
+    def test_corrupt(self):
+        corrupt_path = os.path.join(self.tmp_dir.name, "corrupt.zip")
+        with zipfile.ZipFile(corrupt_path, "w", zipfile.ZIP_STORED) as zip_file:
+            zip_file.writestr("NSE_symbols.txt", "Exchange,Token,LotSize,Symbol,TradingSymbol,Instrument,TickSize,\n")
+        with open(corrupt_path, "r+b") as file:
+            data = file.read()
+            file.seek(data.index(b"Exchange"))
+            file.write(b"X")
+        self.assertRaises(zipfile.BadZipFile, SymbolMaster, self.cache_dir, f"file://{corrupt_path}")
+        # Nothing is cached
+        self.assertEqual(["corrupt.zip.lock"], os.listdir(self.cache_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
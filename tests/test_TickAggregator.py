@@ -0,0 +1,99 @@
+from unittest.mock import MagicMock
+
+from tests.Utils import *
+from commons.consts.consts import Interval
+from commons.dataprovider.TickAggregator import TickAggregator, get_bar_time
+
+# 2023-11-24 09:15 IST
+OPEN_TIME = 1700797500
+
+
+class TestTickAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.sd = MagicMock()
+        self.aggregator = TickAggregator({'2885': 'NSE_RELIANCE', '11532': 'NSE_UPL'}, scrip_data=self.sd,
+                                         capacity=4, batch_size=100)
+
+    def tick(self, token: str, price: float, epoch: int):
+        self.aggregator.on_tick({'t': 'tf', 'e': 'NSE', 'tk': token, 'lp': str(price), 'ft': str(epoch)})
+
+    def test_get_bar_time(self):
+        self.assertEqual(-1, get_bar_time(OPEN_TIME - 1))
+        self.assertEqual(OPEN_TIME, get_bar_time(OPEN_TIME + 59))
+        self.assertEqual(OPEN_TIME + 22440, get_bar_time(OPEN_TIME + 22499))
+        self.assertEqual(-1, get_bar_time(OPEN_TIME + 22500))
+
+    def test_bars(self):
+        self.tick('2885', 100, OPEN_TIME - 10)
+        for price, offset in [(100, 1), (102, 20), (99, 40), (101, 59), (101.5, 61), (100.5, 119)]:
+            self.tick('2885', price, OPEN_TIME + offset)
+        self.aggregator.on_tick({'t': 'tf', 'tk': '2885', 'v': '100'})
+        self.tick('9999', 500, OPEN_TIME)
+
+        df = self.aggregator.get_bars('NSE_RELIANCE')
+        self.assertEqual([[OPEN_TIME, 100, 102, 99, 101]], df.values.tolist())
+        df = self.aggregator.get_bars('NSE_RELIANCE', current=True)
+        self.assertEqual([OPEN_TIME + 60, 101.5, 101.5, 100.5, 100.5], df.values.tolist()[-1])
+        # Late tick of a closed bar
+        self.tick('2885', 90, OPEN_TIME + 30)
+        self.assertEqual(1, len(self.aggregator.get_bars('NSE_RELIANCE')))
+
+        self.aggregator.roll(now=OPEN_TIME + 120)
+        self.assertEqual(2, len(self.aggregator.get_bars('NSE_RELIANCE')))
+        self.assertEqual(0, len(self.aggregator.get_bars('NSE_UPL')))
+
+        # Late tick of a rolled bar, as ft lags the local clock
+        for price, offset in [(500, 0), (501, 30)]:
+            self.tick('11532', price, OPEN_TIME + offset)
+        self.aggregator.roll(now=OPEN_TIME + 61)
+        self.tick('11532', 490, OPEN_TIME + 59)
+        df = self.aggregator.get_bars('NSE_UPL', current=True)
+        self.assertEqual([[OPEN_TIME, 500, 501, 500, 501]], df.values.tolist())
+
+    def test_ring(self):
+        for minute in range(7):
+            self.tick('11532', 500 + minute, OPEN_TIME + minute * 60)
+        df = self.aggregator.get_bars('NSE_UPL')
+        self.assertEqual([OPEN_TIME + minute * 60 for minute in range(2, 6)], df.time.tolist())
+        self.assertEqual([504, 505], self.aggregator.get_bars('NSE_UPL', n_bars=2).close.tolist())
+
+    def test_flush(self):
+        for minute in range(3):
+            self.tick('2885', 100 + minute, OPEN_TIME + minute * 60)
+            self.tick('11532', 500 + minute, OPEN_TIME + minute * 60)
+        self.assertEqual(4, self.aggregator.flush())
+        self.assertEqual(2, self.sd.save_scrip_data.call_count)
+        args = self.sd.save_scrip_data.call_args_list[0]
+        self.assertEqual('NSE_RELIANCE', args.kwargs['scrip_name'])
+        self.assertEqual(Interval.in_1_minute, args.kwargs['time_frame'])
+        self.assertEqual([OPEN_TIME, OPEN_TIME + 60], args.args[0].time.tolist())
+
+        # Only the new ones
+        self.tick('2885', 103, OPEN_TIME + 180)
+        self.assertEqual(1, self.aggregator.flush())
+        self.assertEqual([OPEN_TIME + 120], self.sd.save_scrip_data.call_args.args[0].time.tolist())
+        self.assertEqual(0, self.aggregator.flush())
+
+    def test_flush_failed(self):
+        for minute in range(3):
+            self.tick('2885', 100 + minute, OPEN_TIME + minute * 60)
+        self.sd.save_scrip_data.side_effect = [Exception("DB down"), None]
+        self.assertEqual(0, self.aggregator.flush())
+        # Retried with the bars completed since
+        self.tick('2885', 103, OPEN_TIME + 180)
+        self.assertEqual(3, self.aggregator.flush())
+        self.assertEqual([OPEN_TIME + minute * 60 for minute in range(3)],
+                         self.sd.save_scrip_data.call_args.args[0].time.tolist())
+        self.assertEqual(0, self.aggregator.flush())
+
+    def test_batch(self):
+        aggregator = TickAggregator({'2885': 'NSE_RELIANCE'}, scrip_data=self.sd, batch_size=2)
+        for minute in range(3):
+            aggregator.on_tick({'tk': '2885', 'lp': '100', 'ft': str(OPEN_TIME + minute * 60)})
+        self.assertEqual(1, self.sd.save_scrip_data.call_count)
+        self.assertEqual(2, len(self.sd.save_scrip_data.call_args.args[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
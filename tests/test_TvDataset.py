@@ -0,0 +1,61 @@
+import tempfile
+from unittest.mock import patch
+
+from tests.Utils import *
+from commons.consts.consts import Interval
+from commons.dataprovider import filereader
+from commons.dataprovider.TvDataset import TvDataset
+
+
+class TestTvDataset(unittest.TestCase):
+    day = 86400
+    start = 1699986600  # 2023-11-15 IST midnight
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dataset = TvDataset(os.path.join(self.tmp_dir.name, "dataset"))
+        filereader._combined_cache.clear()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_bars(self, days: list, close: float):
+        return pd.DataFrame({"time": [self.start + self.day * d for d in days], "open": close, "high": close,
+                             "low": close, "close": close})
+
+    def test_append_read(self):
+        self.assertIsNone(self.dataset.read("NSE_X"))
+        self.dataset.append("NSE_X", Interval.in_daily, self.get_bars([0, 1, 2], 10.0))
+        self.dataset.append("NSE_X", Interval.in_daily, self.get_bars([2, 3], 20.0))
+        self.dataset.append("NSE_Y", Interval.in_daily, self.get_bars([0], 30.0))
+        self.dataset.append("NSE_X", Interval.in_1_minute, self.get_bars([0], 40.0))
+
+        res = self.dataset.read("NSE_X", Interval.in_daily)
+        self.assertEqual(["time", "open", "high", "low", "close"], list(res.columns))
+        self.assertEqual([10.0, 10.0, 20.0, 20.0], res.close.tolist())
+        res = self.dataset.read("NSE_X", Interval.in_daily, from_date='2023-11-16', to_date='2023-11-18')
+        self.assertEqual([self.start + self.day, self.start + 2 * self.day], res.time.tolist())
+
+        res = self.dataset.read(interval=Interval.in_daily, to_date='2023-11-16')
+        self.assertEqual(["NSE_X", "NSE_Y"], res.scrip.tolist())
+        self.assertIsNone(self.dataset.read("NSE_Y", Interval.in_1_minute))
+
+    def test_filereader(self):
+        base_dir = os.path.join(self.tmp_dir.name, "base")
+        os.makedirs(base_dir)
+        self.get_bars([0, 1], 10.0).to_csv(os.path.join(base_dir, "NSE_X, 1D.csv"), index=False)
+        self.get_bars([5], 10.0).to_csv(os.path.join(base_dir, "NSE_X, 7X.csv"), index=False)
+        self.assertEqual(1, filereader.ingest_archive(self.dataset, [base_dir]))
+
+        with patch.dict(filereader.config, {'base-data-dir-path': [base_dir]}):
+            csv_res = filereader.get_base_data("NSE_X", from_date='2023-11-16', to_date='2023-11-20')
+            with patch.dict(filereader.config, {'tv-dataset-path': self.dataset.dataset_dir}), \
+                    patch.object(filereader, '_file_combiner') as file_combiner:
+                ds_res = filereader.get_base_data("NSE_X", from_date='2023-11-16', to_date='2023-11-20')
+                file_combiner.assert_not_called()
+        self.assertEqual([self.start + self.day], ds_res.time.tolist())
+        pd.testing.assert_frame_equal(csv_res.astype(float), ds_res.astype(float))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import tempfile
+
+from sqlalchemy import select
+
+from tests.Utils import *
+from commons.consts.consts import SCRIP_HIST, LOG_STORE_MODEL, Interval
+from commons.dataprovider.ScripData import ScripData
+from commons.dataprovider.database import DatabaseEngine, Filter, load_models, build_clauses
+from commons.dataprovider.dbsync import sync_tables
+from commons.service.LogService import LogService
+
+
+class TestDatabaseEngine(unittest.TestCase):
+    db = DatabaseEngine()
+
+    def test_load_models(self):
+        models = load_models()
+        self.assertIs(models, load_models())
+        self.assertIn(SCRIP_HIST, models)
+        self.assertIn(LOG_STORE_MODEL, models)
+        self.assertNotIn("models", models)
+
+    def test_invalid_table(self):
+        with self.assertRaises(AssertionError):
+            self.db.get_model("NoSuchTable")
+
+    def test_build_clauses_bound_params(self):
+        m = self.db.get_model(SCRIP_HIST)
+        clauses = build_clauses(m, [Filter('scrip', '==', "NSE_X'; --"), ('time', '>=', 1000),
+                                    ('time_frame', 'in', ['1', '1D'])])
+        compiled = select(m).where(*clauses).compile(self.db.engine)
+        self.assertNotIn("NSE_X", str(compiled))
+        self.assertIn("NSE_X'; --", compiled.params.values())
+        self.assertIn(1000, compiled.params.values())
+
+    def test_build_clauses_invalid(self):
+        m = self.db.get_model(SCRIP_HIST)
+        with self.assertRaises(AssertionError):
+            build_clauses(m, [('no_column', '==', 1)])
+        with self.assertRaises(AssertionError):
+            build_clauses(m, [('scrip', '~', 1)])
+
+    def test_legacy_predicate(self):
+        m = self.db.get_model(SCRIP_HIST)
+        legacy = self.db._where(m, f"m.{SCRIP_HIST}.scrip == 'X',m.{SCRIP_HIST}.time >= 10")
+        structured = self.db._where(m, [('scrip', '==', 'X'), ('time', '>=', 10)])
+        self.assertEqual(str(select(m).where(*legacy)), str(select(m).where(*structured)))
+
+
+class TestEmbeddedDatabase(unittest.TestCase):
+    rec = [
+        {"time": 1700000100, "open": 100.1, "high": 100.2, "low": 100.0, "close": 100.3},
+        {"time": 1700000160, "open": 100.1, "high": 100.2, "low": 100.0, "close": 100.3}
+    ]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_db(self, backend, name):
+        return DatabaseEngine(db_config={"backend": backend, "path": os.path.join(self.tmp_dir.name, name)})
+
+    def test_scrip_data(self):
+        for backend in ["duckdb", "sqlite"]:
+            sd = ScripData(trader_db=self.get_db(backend, f"{backend}.db"))
+            data = pd.DataFrame(self.rec)
+            sd.save_scrip_data(data=data, scrip_name='DUMMY', time_frame=Interval.in_1_minute)
+            res = sd.get_tick_data('DUMMY')
+            pd.testing.assert_frame_equal(data, res.astype(data.dtypes.to_dict()))
+
+    def test_log_service(self):
+        for backend in ["duckdb", "sqlite"]:
+            ls = LogService(trader_db=self.get_db(backend, f"{backend}.db"))
+            ls.log_entry("Params", ["COB"], "Acct", "2023-12-01", {"a": 1})
+            ls.log_entry("Params", ["COB"], "Acct", "2023-12-01", {"a": 2})
+            self.assertEqual({"a": 2}, ls.get_log_entry_data("Params", ["COB"], "Acct", "2023-12-01"))
+
+    def test_sync_tables(self):
+        source = self.get_db("sqlite", "source.db")
+        ScripData(trader_db=source).save_scrip_data(data=pd.DataFrame(self.rec), scrip_name='DUMMY')
+        LogService(trader_db=source).log_entry("Params", ["COB"], "Acct", "2023-12-01", {"a": 1})
+        target = self.get_db("duckdb", "target.duckdb")
+        res = sync_tables(source, target, tables=[SCRIP_HIST, LOG_STORE_MODEL])
+        self.assertEqual({SCRIP_HIST: 2, LOG_STORE_MODEL: 1}, res)
+        self.assertEqual(2, len(ScripData(trader_db=target).get_tick_data('DUMMY')))
+        LogService(trader_db=target).log_entry("Params", ["COB"], "Acct2", "2023-12-01", {"a": 1})
+        self.assertEqual(2, len(target.query_df(LOG_STORE_MODEL, [Filter('log_type', '==', 'Params')])))
+
+    def test_sync_tables_scrips(self):
+        source = self.get_db("sqlite", "source.db")
+        ScripData(trader_db=source).save_scrip_data(data=pd.DataFrame(self.rec), scrip_name='DUMMY')
+        ScripData(trader_db=source).save_scrip_data(data=pd.DataFrame(self.rec), scrip_name='OTHER')
+        LogService(trader_db=source).log_entry("Params", ["COB"], "Acct", "2023-12-01", {"a": 1})
+        target = self.get_db("duckdb", "target.duckdb")
+        res = sync_tables(source, target, scrips=['DUMMY'])
+        self.assertEqual(2, res[SCRIP_HIST])
+        self.assertNotIn(LOG_STORE_MODEL, res)
+        self.assertNotIn("BacktestTrade", res)
+        res = sync_tables(source, target, tables=[SCRIP_HIST, LOG_STORE_MODEL], scrips=['DUMMY'])
+        self.assertEqual({SCRIP_HIST: 2, LOG_STORE_MODEL: 1}, res)
+        self.assertEqual(0, len(ScripData(trader_db=target).get_tick_data('OTHER')))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
-from unittest.mock import patch
+import datetime
+from unittest.mock import MagicMock, patch
 
 from tests.Utils import *
 from commons.backtest.fastBT import FastBT
@@ -40,6 +41,34 @@ class TestFastBT(unittest.TestCase):
         pd.testing.assert_frame_equal(expected_bod_df, actual_bod)
         pd.testing.assert_frame_equal(expected_cob_df, actual_cob)
 
+    @patch('commons.dataprovider.ScripData.ScripData')
+    def test_prep_data_prefetched(self, mock_api):
+        tick_data = read_file_df(name="fastBT/tick-data.csv")
+        base_data = read_file_df(name="fastBT/base-data.csv")
+        pred_data = read_file_df(name="fastBT/raw-pred-df.csv")
+
+        mock_api.get_tick_data.return_value = tick_data
+        mock_api.get_base_data.return_value = base_data
+        expected = self.fb.prep_data(self.scrip, strategy=self.strategy, raw_pred_df=pred_data.copy(), sd=mock_api)
+
+        # Prefetched batch data may start before the predictions
+        earlier = pd.DataFrame([{"time": int(tick_data.time.min()) - 86400, "open": 1.0, "high": 1.0, "low": 1.0,
+                                 "close": 1.0}])
+        ret_val = self.fb.prep_data(self.scrip, strategy=self.strategy, raw_pred_df=pred_data.copy(),
+                                    tick_data=pd.concat([earlier, tick_data], ignore_index=True),
+                                    base_data=pd.concat([earlier, base_data], ignore_index=True))
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), ret_val.reset_index(drop=True))
+
+    def test_cob_accuracy_first_date(self):
+        # 2023-11-15 00:30 IST is still 2023-11-14 in UTC
+        params = pd.DataFrame([{"scrip": self.scrip, "model": self.strategy, "entry_order_status": "ENTERED",
+                                "entry_ts": 1699988400, "target": 1.0, "signal": 1}])
+        sd = MagicMock()
+        sd.get_scrips_tick_data.side_effect = InterruptedError
+        with self.assertRaises(InterruptedError):
+            FastBT(scrip_data=sd).run_cob_accuracy(params)
+        self.assertEqual(datetime.date(2023, 11, 15), sd.get_scrips_tick_data.call_args.kwargs['from_date'])
+
 
 if __name__ == "__main__":
     setup_logging("test_fastBT.log")
@@ -0,0 +1,72 @@
+import tempfile
+import time
+from unittest.mock import patch
+
+from tests.Utils import *
+from commons.dataprovider import filereader
+
+
+class TestFileReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dirs = [os.path.join(self.tmp_dir.name, "a"), os.path.join(self.tmp_dir.name, "b")]
+        for path in self.dirs:
+            os.makedirs(path)
+        filereader._combined_cache.clear()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def write(path: str, name: str, times: list, close: float):
+        df = pd.DataFrame({"time": times, "open": close, "high": close, "low": close, "close": close})
+        df.to_csv(os.path.join(path, name), index=False)
+        # ctime decides precedence
+        time.sleep(0.01)
+
+    def test_combine_precedence(self):
+        self.write(self.dirs[0], "NSE_X, 1.csv", [1, 2, 3], 10.0)
+        self.write(self.dirs[1], "NSE_X, 1.csv", [3, 4], 20.0)
+        self.write(self.dirs[1], "NSE_XY, 1.csv", [1, 2], 30.0)
+        self.write(self.dirs[0], "NSE_X, 1D.csv", [0], 40.0)
+
+        res = filereader._file_combiner(self.dirs, "NSE_X")
+        self.assertEqual([0, 1, 2, 3, 4], res.time.tolist())
+        self.assertEqual([40.0, 10.0, 10.0, 10.0, 20.0], res.close.tolist())
+        self.assertEqual(["time", "open", "high", "low", "close"], list(res.columns))
+        self.assertEqual(5, len(filereader._file_combiner(self.dirs)))
+        self.assertIsNone(filereader._file_combiner(self.dirs, "NSE_Z"))
+
+    def test_cache_and_manifest(self):
+        self.write(self.dirs[0], "NSE_X, 1.csv", [1, 2], 10.0)
+        first = filereader._file_combiner(self.dirs, "NSE_X")
+        self.assertTrue(os.path.exists(os.path.join(self.dirs[0], filereader.MANIFEST_FILE_NAME)))
+
+        with patch.object(filereader, '_scan_dir') as scan_dir, \
+                patch.object(filereader, '_read_file') as read_file:
+            pd.testing.assert_frame_equal(first, filereader._file_combiner(self.dirs, "NSE_X"))
+            scan_dir.assert_not_called()
+            read_file.assert_not_called()
+
+        # Rewritten file invalidates the cached result; new file the manifest
+        self.write(self.dirs[0], "NSE_X, 1.csv", [1, 2, 5], 11.0)
+        self.assertEqual([11.0] * 3, filereader._file_combiner(self.dirs, "NSE_X").close.tolist())
+        self.write(self.dirs[1], "NSE_X, 1.csv", [6], 12.0)
+        self.assertEqual([1, 2, 5, 6], filereader._file_combiner(self.dirs, "NSE_X").time.tolist())
+
+    def test_cache_bounded(self):
+        for scrip in ["NSE_A", "NSE_B", "NSE_C"]:
+            self.write(self.dirs[0], f"{scrip}, 1.csv", [1, 2], 10.0)
+        with patch.object(filereader, 'CACHE_SIZE', 2):
+            filereader._file_combiner(self.dirs, "NSE_A")
+            filereader._file_combiner(self.dirs, "NSE_B")
+            filereader._file_combiner(self.dirs, "NSE_A")
+            filereader._file_combiner(self.dirs, "NSE_C")
+            # Least recently used is evicted
+            self.assertEqual([(tuple(self.dirs), "NSE_A"), (tuple(self.dirs), "NSE_C")],
+                             list(filereader._combined_cache.keys()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import tempfile
+import time
+from unittest.mock import patch
+
+from websocket import WebSocketTimeoutException
+
+from tests.Utils import *
+from commons.consts.consts import Interval
+from commons.dataprovider.TvDataset import TvDataset
+from commons.dataprovider.tvfeed import TvDatafeed, TvDownloader, get_gap_bars
+from commons.dataprovider.tvprotocol import create_message, split_frames, prepend_header, is_heartbeat
+
+
+class FakeSocket:
+    """
+    Answers create_series with bars whose close is the series' symbol no.; all replies of a batch arrive together.
+    NSE:BAD always fails, NSE:FLAKY fails on the 1st request & NSE:SLOW never completes
+    """
+    requests = {}
+    n_bars = {}
+    # Like websocket-client, recv raises once the timeout is up instead of returning nothing
+    raise_timeout = False
+
+    def __init__(self, *args, **kwargs):
+        self.connected = True
+        self.sent = []
+        self.symbols = {}
+        self.replies = [prepend_header("~h~1")]
+
+    def send(self, message):
+        for payload in split_frames(message):
+            if is_heartbeat(payload):
+                self.sent.append({"m": "heartbeat", "p": [payload]})
+                continue
+            msg = json.loads(payload)
+            self.sent.append(msg)
+            if msg["m"] == "resolve_symbol":
+                self.symbols[msg["p"][1]] = json.loads(msg["p"][2][1:])["symbol"]
+            elif msg["m"] == "create_series":
+                cs, series_id, _, symbol_id, _, n_bars = msg["p"]
+                symbol = self.symbols[symbol_id]
+                FakeSocket.requests[symbol] = FakeSocket.requests.get(symbol, 0) + 1
+                FakeSocket.n_bars[symbol] = n_bars
+                if symbol == "NSE:SLOW":
+                    continue
+                if symbol == "NSE:BAD" or (symbol == "NSE:FLAKY" and FakeSocket.requests[symbol] == 1):
+                    self.replies.append(create_message("symbol_error", [cs, symbol_id, "invalid symbol"]))
+                    continue
+                close = float(symbol_id.split("_")[1])
+                bars = [{"i": i, "v": [1700000000.0 + 60 * i, close, close, close, close]} for i in range(n_bars)]
+                self.replies.append(create_message("timescale_update", [cs, {series_id: {"s": bars[:1]}}]))
+                self.replies.append(create_message("timescale_update", [cs, {series_id: {"s": bars[1:]}}]))
+                self.replies.append(create_message("series_completed", [cs, series_id, "streaming"]))
+
+    def recv(self):
+        if FakeSocket.raise_timeout and len(self.replies) == 0:
+            raise WebSocketTimeoutException("Connection timed out")
+        message = "".join(self.replies)
+        self.replies = []
+        return message
+
+    def settimeout(self, timeout):
+        pass
+
+    def close(self):
+        self.connected = False
+
+
+class TestTvDatafeed(unittest.TestCase):
+
+    def setUp(self):
+        FakeSocket.requests = {}
+        FakeSocket.n_bars = {}
+        FakeSocket.raise_timeout = False
+        self.sockets = []
+        patcher = patch('commons.dataprovider.tvfeed.create_connection', side_effect=self.connect)
+        self.create_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tv = TvDatafeed()
+
+    def connect(self, *args, **kwargs):
+        self.sockets.append(FakeSocket())
+        return self.sockets[-1]
+
+    @property
+    def socket(self):
+        return self.sockets[0]
+
+    def test_get_hists(self):
+        res = self.tv.get_hists(["A", "B", "BAD", "NSE:C"], interval=Interval.in_1_minute, n_bars=3)
+        self.assertEqual(["A", "B", "BAD", "NSE:C"], list(res.keys()))
+        self.assertEqual([1.0] * 3, res["A"].close.tolist())
+        self.assertEqual([2.0] * 3, res["B"].close.tolist())
+        self.assertEqual(0, len(res["BAD"]))
+        self.assertEqual([4.0] * 3, res["NSE:C"].close.tolist())
+        self.assertEqual([0.0] * 3, res["A"].volume.tolist())
+        self.assertEqual("NSE:A", res["A"].symbol.iloc[0])
+
+        res = self.tv.get_hist("D", n_bars=2)
+        self.assertEqual([1700000000, 1700000060], res.index.tolist())
+
+        self.create_connection.assert_called_once()
+        funcs = [msg["m"] for msg in self.socket.sent]
+        self.assertEqual(1, funcs.count("set_auth_token"))
+        self.assertEqual(1, funcs.count("quote_set_fields"))
+        self.assertEqual(5, funcs.count("create_series"))
+        self.assertEqual(5, funcs.count("remove_series"))
+        self.assertIn({"m": "heartbeat", "p": ["~h~1"]}, self.socket.sent)
+
+    def test_retrieve_tv_data(self):
+        res = self.tv.retrieve_tv_data(["NSE_X", "NSE_Y_Z"], start=2, freq=Interval.in_1_minute)
+        self.assertEqual(["time", "open", "high", "low", "close"], list(res["NSE_Y_Z"].columns))
+        self.assertEqual([2.0, 2.0], res["NSE_Y_Z"].close.tolist())
+        self.assertIn("NSE:Y_Z", self.socket.symbols.values())
+        self.create_connection.assert_called_once()
+
+    def test_recv_timeout(self):
+        FakeSocket.raise_timeout = True
+        res = self.tv.get_hists(["A", "SLOW"], interval=Interval.in_1_minute, n_bars=2, timeout=0.2)
+        self.assertEqual([1.0] * 2, res["A"].close.tolist())
+        self.assertEqual(0, len(res["SLOW"]))
+        self.assertIn("timed out", self.tv.errors["SLOW"])
+        # The session is kept, only the series is removed
+        self.assertTrue(self.socket.connected)
+        self.assertIn("remove_series", [msg["m"] for msg in self.socket.sent])
+
+    def test_downloader(self):
+        symbols = [f"NSE_S{i}" for i in range(25)] + ["NSE_BAD", "NSE_FLAKY", "NSE_SLOW"]
+        downloader = TvDownloader(self.tv, workers=2, retries=2, backoff=0.01, timeout=0.2)
+        saved = []
+        res = downloader.download(symbols, n_bars=2, freq=Interval.in_1_minute,
+                                  callback=lambda symbol, df: saved.append(symbol))
+
+        self.assertEqual(sorted(symbols[:25] + ["NSE_FLAKY"]), sorted(res.data.keys()))
+        self.assertEqual(sorted(res.data.keys()), sorted(saved))
+        self.assertEqual(["NSE_BAD", "NSE_SLOW"], sorted(res.failed.keys()))
+        self.assertIn("symbol_error", res.failed["NSE_BAD"])
+        self.assertIn("not completed", res.failed["NSE_SLOW"])
+        self.assertEqual({"NSE:BAD": 3, "NSE:FLAKY": 2, "NSE:SLOW": 3, "NSE:S0": 1},
+                         {k: v for k, v in FakeSocket.requests.items() if k in ["NSE:BAD", "NSE:FLAKY", "NSE:SLOW",
+                                                                               "NSE:S0"]})
+        self.assertLessEqual(len(self.sockets), 2)
+        self.assertFalse(any(socket.connected for socket in self.sockets))
+        self.assertIsNone(self.tv.ws)
+
+    def test_backoff(self):
+        downloader = TvDownloader(self.tv, backoff=1, max_backoff=5)
+        for attempt, (low, high) in enumerate([(0.5, 1), (1, 2), (2, 4), (2.5, 5), (2.5, 5)], start=1):
+            self.assertTrue(low <= downloader.get_delay(attempt) <= high)
+
+    def test_gap_bars(self):
+        last = 1700000000
+        self.assertEqual(10, get_gap_bars(last, Interval.in_daily, now=last + 10 * 86400))
+        self.assertEqual(4 * 375, get_gap_bars(last, Interval.in_1_minute, now=last + 3 * 86400))
+        self.assertEqual(2, get_gap_bars(last, Interval.in_1_minute, now=last + 90))
+        self.assertEqual(0, get_gap_bars(last, Interval.in_5_minute, now=last))
+
+    def test_sync(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        csv_path = os.path.join(tmp_dir.name, "")
+        dataset = TvDataset(os.path.join(tmp_dir.name, "dataset"))
+        stored = pd.DataFrame({"time": [1699999880, int(time.time()) - 120], "open": 9.0, "high": 9.0, "low": 9.0,
+                               "close": 9.0})
+        stored.to_csv(os.path.join(tmp_dir.name, "NSE_A, 1.csv"), index=False)
+        dataset.append("NSE_A", Interval.in_1_minute, stored)
+
+        for tv, path in [(self.tv, csv_path), (TvDatafeed(dataset=dataset), None)]:
+            FakeSocket.n_bars = {}
+            failed = tv.sync_tv_data(["NSE_A", "NSE_B"], freq=Interval.in_1_minute, max_bars=3, overlap=5,
+                                     path=[path])
+            self.assertEqual({}, failed)
+            # 2 bars gap + 5 overlap rounded to 8, capped at max_bars for both
+            self.assertEqual({"NSE:A": 3, "NSE:B": 3}, FakeSocket.n_bars)
+
+            if path is None:
+                res = dataset.read("NSE_A", Interval.in_1_minute)
+            else:
+                res = pd.read_csv(os.path.join(tmp_dir.name, "NSE_A, 1.csv"))
+            self.assertEqual([1699999880, 1700000000, 1700000060, 1700000120, stored.time.iloc[1]], res.time.tolist())
+            self.assertEqual([9.0, 1.0, 1.0, 1.0, 9.0], res.close.tolist())
+
+        FakeSocket.n_bars = {}
+        self.tv.sync_tv_data(["NSE_A"], freq=Interval.in_1_minute, overlap=5, path=[csv_path])
+        self.assertEqual({"NSE:A": 8}, FakeSocket.n_bars)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+from tests.Utils import *
+from commons.dataprovider.tvprotocol import FrameParser, SeriesColumns, create_message, prepend_header, decode
+
+
+class TestTvProtocol(unittest.TestCase):
+
+    def test_frame_parser(self):
+        update = create_message("timescale_update", ["cs_1", {"s1": {"s": []}}])
+        text = prepend_header("~h~7") + create_message("qsd", ["qs_1", {}]) + update
+        parser = FrameParser()
+        # Frames split across websocket messages are completed by the next one
+        self.assertEqual(["~h~7"], parser.feed(text[:20]))
+        frames = parser.feed(text[20:len(text) - 5])
+        self.assertEqual(1, len(frames))
+        self.assertEqual("qsd", json.loads(frames[0])["m"])
+        frames += parser.feed(text[len(text) - 5:])
+        self.assertEqual(2, len(frames))
+
+        self.assertIsNone(decode(frames[0]))
+        self.assertEqual("timescale_update", decode(frames[1])["m"])
+        self.assertIsNone(decode('{"session_id":"x","timestamp":1}'))
+
+    def test_series_columns(self):
+        columns = SeriesColumns(2)
+        columns.add([{"i": 0, "v": [1700000000.0, 1, 2, 0.5, 1.5, 100]},
+                     {"i": 1, "v": [1700000060.0, 2, 3, 1.5, 2.5, 200]}])
+        # Re-sent last bar, a new one beyond the capacity & missing volume
+        columns.add([{"i": 1, "v": [1700000060.0, 2, 4, 1.5, 3.5]},
+                     {"i": 2, "v": [1700000120.0, 3, 3, 3, 3, None]}])
+        self.assertEqual(3, len(columns))
+
+        res = columns.to_df()
+        self.assertEqual(["time", "open", "high", "low", "close", "volume"], list(res.columns))
+        self.assertEqual([1700000000, 1700000060, 1700000120], res.time.tolist())
+        self.assertEqual([1.5, 3.5, 3.0], res.close.tolist())
+        self.assertEqual([100.0, 0.0, 0.0], res.volume.tolist())
+        self.assertEqual(0, len(SeriesColumns(10).to_df()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+
+import numpy as np
+
+from tests.Utils import *
+from commons.consts.consts import Interval
+from commons.dataprovider.TvDataset import TvDataset
+from commons.dataprovider.tvfeed import TvDatafeed, TvDownloader
+from commons.dataprovider.tvreplay import TvReplayServer
+
+
+class TestTvReplay(unittest.TestCase):
+    end_time = 1700042340
+
+    def setUp(self):
+        self.server = TvReplayServer(bars=1500, chunk_size=400, latency=0.01, missing=["NSE:BAD"],
+                                     end_time=self.end_time).start()
+        self.addCleanup(self.server.stop)
+        self.tv = TvDatafeed(ws_url=self.server.url)
+        self.addCleanup(self.tv.close)
+
+    def test_get_hists(self):
+        res = self.tv.get_hists(["A", "B", "BAD"], interval=Interval.in_1_minute, n_bars=2000)
+        self.assertEqual(1500, len(res["A"]))
+        self.assertEqual(self.end_time, res["A"].index[-1])
+        self.assertTrue((np.diff(res["A"].index) == 60).all())
+        self.assertFalse(res["A"].close.equals(res["B"].close))
+        self.assertEqual(0, len(res["BAD"]))
+        self.assertIn("symbol_error", self.tv.errors["BAD"])
+
+        # Same session, deterministic bars
+        res_a = self.tv.get_hist("A", interval=Interval.in_1_minute, n_bars=10)
+        pd.testing.assert_frame_equal(res["A"].tail(10), res_a)
+
+    def test_downloader(self):
+        symbols = [f"NSE_S{i}" for i in range(12)] + ["NSE_BAD"]
+        res = TvDownloader(self.tv, workers=2, retries=1, backoff=0.01).download(symbols, n_bars=100,
+                                                                                 freq=Interval.in_5_minute)
+        self.assertEqual(sorted(symbols[:12]), sorted(res.data.keys()))
+        self.assertEqual(["NSE_BAD"], list(res.failed.keys()))
+        self.assertEqual(100, len(res.data["NSE_S11"]))
+
+    def test_dataset_replay(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        dataset = TvDataset(tmp_dir.name)
+        stored = pd.DataFrame({"time": [1700000000, 1700086400], "open": 1.0, "high": 2.0, "low": 0.5,
+                               "close": 1.5})
+        dataset.append("NSE_X", Interval.in_daily, stored)
+        with TvReplayServer(dataset=dataset) as server:
+            tv = TvDatafeed(ws_url=server.url)
+            res = tv.retrieve_tv_data(["NSE_X"], start=10)
+            tv.close()
+        pd.testing.assert_frame_equal(stored, res["NSE_X"], check_dtype=False)
+
+
+if __name__ == "__main__":
+    unittest.main()